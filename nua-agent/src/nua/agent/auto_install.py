@@ -43,6 +43,36 @@ def auto_install() -> bool:
     return False
 
 
+def detect_and_install_dependencies(directory: str | Path | None) -> bool:
+    """Install the dependencies declared by the lock files found in directory.
+
+    Used by the 'dependencies' stage of layered builds, before the project code is
+    available.
+    """
+    if not detector_classes:
+        register_detectors()
+    path = Path(directory or ".").resolve()
+    with verbosity(2):
+        info("Detect and install dependencies in ", path)
+    with chdir(path):
+        return auto_install_dependencies()
+
+
+def auto_install_dependencies() -> bool:
+    installed = False
+    for auto_installer in sorted(detector_classes, key=attrgetter("priority")):
+        if auto_installer.detect_dependencies():
+            with verbosity(2):
+                msg = auto_installer.info()
+                show(f"{msg} dependencies detected")
+            auto_installer.install_dependencies_with_build_packages()
+            installed = True
+    if not installed:
+        with verbosity(2):
+            show("No dependency to install")
+    return installed
+
+
 def register_detectors():
     for dir in DETECTORS_DIRS:
         for file in rso.files(dir).iterdir():
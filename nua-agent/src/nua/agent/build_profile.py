@@ -0,0 +1,61 @@
+"""Timing of the stages of the build, reported in the image metadata.
+
+The report is a JSON file in /nua/metadata, collected by nua-build after the build.
+When the build is run stage by stage (layered Dockerfile), each app_builder
+process appends its stages to the report of the previous layers.
+"""
+
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from time import gmtime, perf_counter, strftime
+
+from nua.lib.constants import NUA_METADATA_PATH
+from nua.lib.elapsed import elapsed
+from nua.lib.panic import debug
+from nua.lib.tool.state import verbosity
+
+from .version import __version__
+
+BUILD_PROFILE_FILE = "build-profile.json"
+
+
+class BuildProfile:
+    """Record the duration of named stages of the build."""
+
+    def __init__(self, folder: str | Path = NUA_METADATA_PATH):
+        self.path = Path(folder) / BUILD_PROFILE_FILE
+
+    @contextmanager
+    def stage(self, name: str):
+        start = strftime("%Y-%m-%dT%H:%M:%S+00:00", gmtime())
+        t0 = perf_counter()
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            duration = perf_counter() - t0
+            with verbosity(2):
+                debug(f"Build stage '{name}': {elapsed(duration)}")
+            self.append(
+                {
+                    "name": name,
+                    "start": start,
+                    "duration": round(duration, 3),
+                    "success": success,
+                }
+            )
+
+    def load(self) -> dict:
+        if self.path.is_file():
+            return json.loads(self.path.read_text(encoding="utf8"))
+        return {"agent_version": __version__, "stages": []}
+
+    def append(self, stage: dict) -> None:
+        if not self.path.parent.is_dir():
+            # /nua/metadata is created by the first stage of the build
+            return
+        report = self.load()
+        report["stages"].append(stage)
+        self.path.write_text(json.dumps(report, indent=4), encoding="utf8")
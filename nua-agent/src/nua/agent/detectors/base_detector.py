@@ -1,6 +1,8 @@
 """Base class for detect and install project."""
 
 import abc
+from pathlib import Path
+from typing import ClassVar
 
 from nua.lib.actions import install_build_packages, installed_packages
 
@@ -11,12 +13,16 @@ class BaseDetector(abc.ABC):
     BaseDetector.priority: permits to sort the tests order (lower value is higher
     priority) of each detector upon a source directory. Thus testing dual installation
     (ie: python+node) before single ones.
+
+    BaseDetector.dependency_files: the lock files permitting to install the
+    dependencies of the project before its code, in a dedicated layer.
     """
 
     message: str = ""
     priority: int = 100
-    build_packages: list[str] = []
-    run_packages: list[str] = []  # currently not implemented
+    build_packages: ClassVar[list[str]] = []
+    run_packages: ClassVar[list[str]] = []  # currently not implemented
+    dependency_files: ClassVar[list[str]] = []
 
     @classmethod
     def info(cls) -> str:
@@ -26,6 +32,13 @@ class BaseDetector(abc.ABC):
     def detect(cls) -> bool:
         return False
 
+    @classmethod
+    def detect_dependencies(cls) -> bool:
+        if not cls.dependency_files:
+            return False
+        root = Path.cwd()
+        return all((root / name).exists() for name in cls.dependency_files)
+
     @classmethod
     def install_with_build_packages(cls) -> None:
         if cls.build_packages:
@@ -41,3 +54,19 @@ class BaseDetector(abc.ABC):
     @classmethod
     def install(cls) -> None:
         pass
+
+    @classmethod
+    def install_dependencies_with_build_packages(cls) -> None:
+        if cls.build_packages:
+            with install_build_packages(
+                cls.build_packages,
+                installed=installed_packages(),
+                keep_lists=True,
+            ):
+                cls.install_dependencies()
+        else:
+            cls.install_dependencies()
+
+    @classmethod
+    def install_dependencies(cls) -> None:
+        pass
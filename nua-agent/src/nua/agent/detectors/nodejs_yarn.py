@@ -1,6 +1,8 @@
 """Auto install Nodejs/Yarn."""
 
 from pathlib import Path
+from shutil import which
+from typing import ClassVar
 
 from nua.lib.shell import sh
 
@@ -11,7 +13,7 @@ from .base_detector import BaseDetector
 class NodejsYarn(BaseDetector):
     message: str = "Nodejs yarn"
     priority: int = 100
-    build_packages: list[str] = [
+    build_packages: ClassVar[list[str]] = [
         "build-essential",
         "python3-dev",
         "libsqlite3-dev",
@@ -20,12 +22,18 @@ class NodejsYarn(BaseDetector):
         "libssl-dev",
         "git",
     ]
+    dependency_files: ClassVar[list[str]] = ["package.json", "yarn.lock"]
 
     @classmethod
     def detect(cls) -> bool:
         root = Path(".").resolve()
         return (root / "yarn.lock").exists()
 
+    @classmethod
+    def detect_dependencies(cls) -> bool:
+        # yarn may be installed later by the build script of the app
+        return super().detect_dependencies() and bool(which("yarn"))
+
     @classmethod
     def install(cls) -> None:
         # We install nodejs globally, so if install as user nua we got
@@ -36,5 +44,9 @@ class NodejsYarn(BaseDetector):
         # sh("sudo -nu nua yarn install")
         sh("yarn install")
 
+    @classmethod
+    def install_dependencies(cls) -> None:
+        sh("yarn install --frozen-lockfile")
+
 
 register_detector(NodejsYarn)
@@ -1,8 +1,9 @@
 """Auto install Python project."""
 
 from pathlib import Path
+from typing import ClassVar
 
-from nua.lib.actions import build_python
+from nua.lib.actions import build_python, pip_install
 
 from ..auto_install import register_detector
 from .base_detector import BaseDetector
@@ -11,6 +12,7 @@ from .base_detector import BaseDetector
 class PythonSource(BaseDetector):
     message: str = "Python source project"
     priority: int = 100
+    dependency_files: ClassVar[list[str]] = ["requirements.txt"]
 
     @classmethod
     def detect(cls) -> bool:
@@ -22,5 +24,9 @@ class PythonSource(BaseDetector):
     def install(cls) -> None:
         build_python(Path("."), "nua")
 
+    @classmethod
+    def install_dependencies(cls) -> None:
+        pip_install(["-r", "requirements.txt"], user="nua")
+
 
 register_detector(PythonSource)
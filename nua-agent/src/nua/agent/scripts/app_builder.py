@@ -3,8 +3,13 @@
 - information come from a mandatory local file: "nua-config.toml|json|yaml|yml"
 - origin may be a source tar.gz or a git repository, python wheel
 - build locally if source is python package
+
+The build can run in a single pass (default), or stage by stage when invoked with
+the '--stage' option, so that each stage is executed in its own cacheable layer of
+a layered Dockerfile.
 """
 
+import argparse
 import json
 import logging
 import os
@@ -41,10 +46,14 @@ from nua.lib.tool.state import (
     verbosity_level,
 )
 
-from ..auto_install import detect_and_install
+from ..auto_install import detect_and_install, detect_and_install_dependencies
+from ..build_profile import BuildProfile
 
 logging.basicConfig(level=logging.INFO)
 
+# Stages of a layered build, from the less to the more frequently modified inputs:
+BUILD_STAGES = ("meta-packages", "packages", "dependencies", "build")
+
 
 class AppBuilder:
     """Class to hold config and other state information during build."""
@@ -59,25 +68,57 @@ class AppBuilder:
         chdir(self.build_dir)
         self.config = NuaConfig(self.build_dir)
         self.source = Path()
+        self.profile = BuildProfile()
 
     def build(self):
         self.make_dirs()
         with chdir(self.config.root_dir):
             self.pre_build()
+        self.build_project()
+
+    def build_stage(self, stage: str):
+        """Run only one stage of the build.
+
+        Stages are run in successive layers of the generated Dockerfile. Package
+        lists are not kept between stages, each layer removing its apt lists.
+        """
+        match stage:
+            case "meta-packages":
+                self.make_dirs()
+                with chdir(self.config.root_dir), self.profile.stage(stage):
+                    self.install_meta_packages(keep_lists=False)
+            case "packages":
+                with chdir(self.config.root_dir), self.profile.stage(stage):
+                    self.install_packages(keep_lists=False)
+            case "dependencies":
+                with chdir(self.config.root_dir), self.profile.stage(stage):
+                    self.install_dependencies()
+            case "build":
+                self.build_project()
+            case _:
+                raise Abort(f"Unknown build stage: '{stage}'")
+
+    def build_project(self):
+        """Install and build the project code, then finalize the image."""
+        with chdir(self.config.root_dir), self.profile.stage("build"):
             with verbosity(1):
                 info("******** Stage: build")
             with install_build_packages(
                 self.config.build_packages,
                 installed=installed_packages(),
             ):
-                code_installed = self.install_project_code()
-                chown_r("/nua/build", "nua")
-                built = self.run_build_script(code_installed)
+                with self.profile.stage("build/install-code"):
+                    code_installed = self.install_project_code()
+                    chown_r("/nua/build", "nua")
+                with self.profile.stage("build/build-script"):
+                    built = self.run_build_script(code_installed)
                 if (code_installed or built) and os.getuid() == 0:
                     chown_r("/nua/build", "nua")
 
-        self.post_build()
-        self.test_build()
+        with self.profile.stage("post-build"):
+            self.post_build()
+        with self.profile.stage("test"):
+            self.test_build()
         with verbosity(1):
             show("******** Build done.")
 
@@ -102,14 +143,41 @@ class AppBuilder:
         """Process installation of packages prior to running install script."""
         with verbosity(1):
             info("******** Stage: pre-build")
+        with self.profile.stage("meta-packages"):
+            self.install_meta_packages(keep_lists=True)
+        with self.profile.stage("packages"):
+            self.install_packages(keep_lists=True)
+
+    def install_meta_packages(self, keep_lists: bool):
         collection = self.collect_meta_packages()
         if collection:
-            install_meta_packages(collection, keep_lists=True)
+            install_meta_packages(collection, keep_lists=keep_lists)
+        chown_r("/nua/venv", "nua")
+
+    def install_packages(self, keep_lists: bool):
         collection = self.collect_packages()
         if collection:
             with verbosity(1):
                 vprint(f"Install packages:  {collection}")
-            install_packages(collection, keep_lists=True)
+            install_packages(collection, keep_lists=keep_lists)
+
+    def install_dependencies(self):
+        """Install the dependencies declared by the lock files of the project.
+
+        This stage only sees the lock files, so its layer is not invalidated by
+        changes of the code. Failure is not fatal: the dependencies are then
+        installed by the 'build' stage, as for a single pass build.
+        """
+        with verbosity(1):
+            info("******** Stage: dependencies")
+        try:
+            with install_build_packages(
+                self.config.build_packages,
+                installed=installed_packages(),
+            ):
+                detect_and_install_dependencies(".")
+        except SystemExit:
+            warning("Installation of dependencies failed, postponed to build stage")
         chown_r("/nua/venv", "nua")
 
     def make_dirs(self):
@@ -390,10 +458,22 @@ exec_as_nua({start_cmd},
 
 def main() -> None:
     """Setup app in Nua container."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--stage",
+        default="",
+        choices=BUILD_STAGES,
+        help="Run only one stage of the build (default: full build).",
+    )
+    args = parser.parse_args()
+
     if "nua_verbosity" in os.environ:
         set_verbosity(int(os.environ["nua_verbosity"]))
         with verbosity(3):
             info("verbosity:", verbosity_level())
 
     builder = AppBuilder()
-    builder.build()
+    if args.stage:
+        builder.build_stage(args.stage)
+    else:
+        builder.build()
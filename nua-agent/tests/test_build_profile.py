@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from nua.agent.build_profile import BUILD_PROFILE_FILE, BuildProfile
+
+
+def test_stages_appended(tmp_path):
+    profile = BuildProfile(tmp_path)
+
+    with profile.stage("packages"):
+        pass
+    # new process for next layer:
+    with BuildProfile(tmp_path).stage("build"):
+        pass
+
+    report = json.loads((tmp_path / BUILD_PROFILE_FILE).read_text())
+    assert [stage["name"] for stage in report["stages"]] == ["packages", "build"]
+    assert all(stage["success"] for stage in report["stages"])
+
+
+def test_failed_stage_recorded(tmp_path):
+    profile = BuildProfile(tmp_path)
+
+    with pytest.raises(SystemExit), profile.stage("build"):
+        raise SystemExit(1)
+
+    stages = profile.load()["stages"]
+    assert stages[0]["name"] == "build"
+    assert not stages[0]["success"]
+
+
+def test_no_metadata_folder(tmp_path):
+    profile = BuildProfile(tmp_path / "missing")
+
+    with profile.stage("packages"):
+        pass
+
+    assert not profile.path.exists()
@@ -14,6 +14,11 @@ from pathlib import Path
 from typing import Any
 
 from docker.models.images import Image
+from nua.lib.docker import (
+    docker_buildx_build,
+    docker_buildx_ensure_builder,
+    docker_stream_build,
+)
 from nua.lib.nua_config import NuaConfig
 from nua.lib.panic import info, show, title, vfprint, vprint, warning
 from nua.lib.tool.state import verbosity
@@ -22,9 +27,11 @@ from packaging.version import parse
 
 from .. import config as build_config
 from ..module_definitions import ModuleDefinitions
+from .build_report import BuildReport
 
 logging.basicConfig(level=logging.INFO)
 CLIENT_TIMEOUT = 600
+BUILD_BACKENDS = ("docker", "buildx")
 
 
 class BuilderError(Exception):
@@ -41,8 +48,19 @@ class Builder(abc.ABC):
     nua_base: str
 
     save_image: bool = True
+    use_cache: bool = True
+    profile: bool = False
+    slim: bool = False
+    report: BuildReport
 
-    def __init__(self, config: NuaConfig, save_image: bool = True):
+    def __init__(
+        self,
+        config: NuaConfig,
+        save_image: bool = True,
+        use_cache: bool = True,
+        profile: bool = False,
+        slim: bool | None = None,
+    ):
         assert isinstance(config, NuaConfig)
 
         self.config = config
@@ -50,11 +68,61 @@ class Builder(abc.ABC):
         self.build_dir = self.make_build_dir()
 
         self.save_image = save_image
+        self.use_cache = use_cache
+        self.profile = profile
+        # default from the nua-config
+        self.slim = config.slim if slim is None else slim
+        self.report = BuildReport(config.nua_tag)
 
     @abstractmethod
     def run(self):
         raise NotImplementedError()
 
+    @property
+    def build_backend(self) -> str:
+        backend = build_config.get("build", {}).get("backend") or "docker"
+        if backend not in BUILD_BACKENDS:
+            raise BuilderError(f"Unknown build backend: '{backend}'")
+        return backend
+
+    def docker_build(
+        self,
+        tag: str,
+        buildargs: dict[str, str],
+        labels: dict[str, str],
+        nocache: bool = True,
+        target: str = "",
+    ) -> str:
+        """Build the image from the current directory with the configured backend.
+
+        Return the image id.
+        """
+        if self.build_backend == "buildx":
+            conf = build_config.get("build", {})
+            builder = conf.get("buildx_builder", "")
+            if builder:
+                docker_buildx_ensure_builder(builder)
+            return docker_buildx_build(
+                ".",
+                tag,
+                buildargs,
+                labels,
+                nocache=nocache,
+                steps=self.report.docker_steps,
+                target=target,
+                builder=builder,
+                cache_dir=conf.get("buildx_cache_dir", ""),
+            )
+        return docker_stream_build(
+            ".",
+            tag,
+            buildargs,
+            labels,
+            nocache=nocache,
+            steps=self.report.docker_steps,
+            target=target,
+        )
+
     def post_build_notices(self):
         """Post build analysis and possible usefull information."""
         self._notice_local_volumes()
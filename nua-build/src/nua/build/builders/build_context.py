@@ -0,0 +1,244 @@
+"""Preparation of the Docker build context from the local code of the app.
+
+- exclusion rules are read from the '.dockerignore' and '.nuaignore' files of the
+  project (same syntax as '.dockerignore', '.nuaignore' rules are applied last),
+- files are hard linked (or reflinked, or copied as a last resort) into the build
+  directory instead of being copied,
+- the size of the resulting context and its largest contributors are reported.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import os
+import re
+from pathlib import Path
+from shutil import copy2
+
+from nua.lib.docker import image_size_repr, size_unit
+from nua.lib.panic import debug, info, vprint
+from nua.lib.tool.state import verbosity
+
+IGNORE_FILES = (".dockerignore", ".nuaignore")
+# ioctl to clone a file on copy-on-write file systems (btrfs, xfs, ...):
+FICLONE = 0x40049409
+LARGEST_CONTRIBUTORS = 5
+
+
+class IgnoreRules:
+    """Exclusion rules with '.dockerignore' semantics.
+
+    Patterns are relative to the root of the project, '*' and '?' do not match
+    '/', '**' matches any number of directories, a leading '!' re-includes paths
+    excluded by previous rules. The last rule matching the path or one of its
+    parents wins: excluding a directory excludes its content, unless a later
+    rule re-includes part of it.
+    """
+
+    def __init__(self, patterns: list[str] | None = None):
+        self.rules: list[tuple[re.Pattern, bool]] = []
+        # patterns of the '!' rules, to find the excluded directories to walk:
+        self.include_patterns: list[str] = []
+        for pattern in patterns or []:
+            self.add(pattern)
+
+    @classmethod
+    def from_project(cls, root_dir: Path) -> IgnoreRules:
+        patterns: list[str] = []
+        for name in IGNORE_FILES:
+            path = root_dir / name
+            if path.is_file():
+                patterns.extend(path.read_text(encoding="utf8").splitlines())
+        return cls(patterns)
+
+    def add(self, pattern: str) -> None:
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith("#"):
+            return
+        include = pattern.startswith("!")
+        if include:
+            pattern = pattern[1:].strip()
+        pattern = os.path.normpath(pattern.strip("/"))
+        if pattern == ".":
+            return
+        self.rules.append((re.compile(glob_to_regex(pattern)), include))
+        if include:
+            self.include_patterns.append(pattern)
+
+    def is_excluded(self, relative_path: str) -> bool:
+        """Test a posix path relative to the project root."""
+        parts = relative_path.split("/")
+        paths = ["/".join(parts[:index]) for index in range(1, len(parts) + 1)]
+        excluded = False
+        # a rule applies if the path itself or any of its parents matches:
+        for regex, include in self.rules:
+            if any(regex.fullmatch(path) for path in paths):
+                excluded = not include
+        return excluded
+
+    def may_include_content(self, relative_dir: str) -> bool:
+        """Test if a '!' rule may re-include a path inside an excluded directory
+        (the directory is a prefix of the rule, like Docker)."""
+        prefix = f"{relative_dir}/"
+        return any(
+            f"{pattern}/".startswith(prefix) for pattern in self.include_patterns
+        )
+
+    def is_pruned(self, relative_dir: str) -> bool:
+        """Test if the content of a directory can be skipped."""
+        return self.is_excluded(relative_dir) and not self.may_include_content(
+            relative_dir
+        )
+
+
+def glob_to_regex(pattern: str) -> str:
+    result = []
+    index = 0
+    length = len(pattern)
+    while index < length:
+        char = pattern[index]
+        if pattern.startswith("**/", index):
+            result.append("(?:.*/)?")
+            index += 3
+            continue
+        if pattern.startswith("**", index):
+            result.append(".*")
+            index += 2
+            continue
+        if char == "*":
+            result.append("[^/]*")
+        elif char == "?":
+            result.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", index + 1)
+            if end < 0:
+                result.append(re.escape(char))
+            else:
+                content = pattern[index + 1 : end]
+                if content.startswith("!"):
+                    content = "^" + content[1:]
+                result.append(f"[{content}]")
+                index = end
+        else:
+            result.append(re.escape(char))
+        index += 1
+    return "".join(result)
+
+
+def link_or_copy(source: Path, destination: Path) -> None:
+    """Hard link source to destination, or reflink it, or copy it."""
+    # never write through an existing destination, it may be a link to the project:
+    if destination.exists() or destination.is_symlink():
+        destination.unlink()
+    try:
+        os.link(source, destination)
+        return
+    except OSError:
+        pass
+    try:
+        _reflink(source, destination)
+        return
+    except OSError:
+        destination.unlink(missing_ok=True)
+    copy2(source, destination)
+
+
+def _reflink(source: Path, destination: Path) -> None:
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    os.utime(destination, ns=(source.stat().st_atime_ns, source.stat().st_mtime_ns))
+    destination.chmod(source.stat().st_mode & 0o7777)
+
+
+def populate_context(
+    paths: list[Path],
+    root_dir: Path,
+    dest_dir: Path,
+    rules: IgnoreRules,
+) -> None:
+    """Link the files of paths (relative to root_dir) into dest_dir, applying the
+    exclusion rules."""
+    for path in sorted(paths):
+        relative = path.relative_to(root_dir).as_posix()
+        if path.is_dir():
+            excluded = rules.is_pruned(relative)
+        else:
+            excluded = rules.is_excluded(relative)
+        if excluded:
+            with verbosity(2):
+                info(f"Excluded: {relative}")
+            continue
+        if path.is_file():
+            with verbosity(1):
+                info(f"Copying: {path.name}")
+            link_or_copy(path, dest_dir / path.name)
+        elif path.is_dir():
+            with verbosity(1):
+                info(f"Copying: {path.name}/")
+            _populate_dir(path, root_dir, dest_dir / path.name, rules)
+
+
+def _populate_dir(
+    directory: Path,
+    root_dir: Path,
+    dest_dir: Path,
+    rules: IgnoreRules,
+) -> None:
+    # an excluded directory is only walked for its re-included content, its
+    # folders are created for the kept files:
+    if not rules.is_excluded(directory.relative_to(root_dir).as_posix()):
+        dest_dir.mkdir(parents=True, exist_ok=True)
+    for current, dirs, files in os.walk(directory, followlinks=True):
+        current_path = Path(current)
+        relative_dir = current_path.relative_to(root_dir).as_posix()
+        target_dir = dest_dir / current_path.relative_to(directory)
+        kept_dirs = []
+        for name in sorted(dirs):
+            if rules.is_pruned(f"{relative_dir}/{name}"):
+                with verbosity(3):
+                    debug(f"Excluded: {relative_dir}/{name}/")
+                continue
+            if not rules.is_excluded(f"{relative_dir}/{name}"):
+                (target_dir / name).mkdir(parents=True, exist_ok=True)
+            kept_dirs.append(name)
+        dirs[:] = kept_dirs
+        for name in sorted(files):
+            if rules.is_excluded(f"{relative_dir}/{name}"):
+                with verbosity(3):
+                    debug(f"Excluded: {relative_dir}/{name}")
+                continue
+            target_dir.mkdir(parents=True, exist_ok=True)
+            link_or_copy(current_path / name, target_dir / name)
+
+
+def context_sizes(build_dir: Path) -> dict[str, int]:
+    """Return the size in bytes of each top level item of the build context."""
+    sizes: dict[str, int] = {}
+    for item in build_dir.iterdir():
+        if item.is_dir() and not item.is_symlink():
+            sizes[f"{item.name}/"] = sum(
+                path.lstat().st_size for path in item.rglob("*") if path.is_file()
+            )
+        else:
+            sizes[item.name] = item.lstat().st_size
+    return sizes
+
+
+def report_context_size(build_dir: Path) -> int:
+    """Display the build context size and its largest contributors."""
+    sizes = context_sizes(build_dir)
+    total = sum(sizes.values())
+    with verbosity(0):
+        info(f"Build context size: {size_repr(total)}")
+    largest = sorted(sizes.items(), key=lambda item: item[1], reverse=True)
+    with verbosity(1):
+        vprint("    largest contributors:")
+        for name, size in largest[:LARGEST_CONTRIBUTORS]:
+            vprint(f"    {size_repr(size):>10}  {name}")
+    return total
+
+
+def size_repr(size: int) -> str:
+    if size < 10**6:
+        return f"{size / 1000:.1f}kB"
+    return f"{image_size_repr(size)}{size_unit()}"
@@ -0,0 +1,156 @@
+"""Profiling report of a build.
+
+Collect the duration of the Docker steps, the duration of the app_builder stages
+(from the report written by nua-agent in /nua/metadata) and the size of the
+layers of the resulting image.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from time import gmtime, strftime
+from typing import Any
+
+import docker
+from nua.lib.constants import NUA_METADATA_PATH
+from nua.lib.docker import docker_image_file
+from nua.lib.elapsed import elapsed
+from nua.lib.panic import important, vprint
+from nua.lib.tool.state import verbosity
+
+from .build_context import size_repr
+
+# see nua.agent.build_profile
+BUILD_PROFILE_FILE = "build-profile.json"
+INSTRUCTION_WIDTH = 60
+
+
+@dataclass
+class BuildReport:
+    nua_tag: str
+    date: str = ""
+    duration: float = 0.0
+    context_size: int = 0
+    image_size: int = 0
+    docker_steps: list[dict[str, Any]] = field(default_factory=list)
+    agent_stages: list[dict[str, Any]] = field(default_factory=list)
+    layers: list[dict[str, Any]] = field(default_factory=list)
+    # for slim images, the image before the runtime stage:
+    full_image_size: int = 0
+    full_layers: list[dict[str, Any]] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        if not self.date:
+            self.date = strftime("%Y-%m-%dT%H:%M:%S+00:00", gmtime())
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    def collect_image(self, image_id: str, agent_report: bool = True) -> None:
+        """Collect layer sizes and (optionally) the app_builder stages."""
+        self.image_size, self.layers = image_layers(image_id)
+        if agent_report:
+            content = docker_image_file(
+                image_id, f"{NUA_METADATA_PATH}/{BUILD_PROFILE_FILE}"
+            )
+            if content:
+                self.agent_stages = json.loads(content).get("stages", [])
+
+    def collect_slim(self, full_image_id: str, image_id: str) -> None:
+        """Collect layer sizes of an image before and after its runtime stage."""
+        self.full_image_size, self.full_layers = image_layers(full_image_id)
+        self.image_size, self.layers = image_layers(image_id)
+
+    def display_slim(self) -> None:
+        with verbosity(0):
+            important(f"Slim image '{self.nua_tag}':")
+            vprint(
+                f"    before: {size_repr(self.full_image_size)} "
+                f"({len(self.full_layers)} layers), "
+                f"after: {size_repr(self.image_size)} ({len(self.layers)} layers)"
+            )
+        with verbosity(1):
+            vprint("  Layers before:")
+            _display_layers(self.full_layers)
+            vprint("  Layers after:")
+            _display_layers(self.layers)
+
+    def save(self, path: str | Path) -> Path:
+        """Write the report as JSON, if path is a folder use a dated file name."""
+        dest = Path(path)
+        if dest.is_dir():
+            stamp = self.date.replace(":", "").replace("-", "")[:15]
+            dest = dest / f"{self.nua_tag}-{stamp}.json"
+        dest.write_text(json.dumps(self.as_dict(), indent=4), encoding="utf8")
+        return dest
+
+    def display(self) -> None:
+        with verbosity(0):
+            important(f"Build profile of '{self.nua_tag}':")
+            vprint(f"    total time: {elapsed(self.duration)}")
+            vprint(f"    build context: {size_repr(self.context_size)}")
+            vprint(f"    image size: {size_repr(self.image_size)}")
+            self._display_docker_steps()
+            self._display_agent_stages()
+            self._display_layers()
+
+    def _display_docker_steps(self) -> None:
+        if not self.docker_steps:
+            return
+        vprint("  Docker steps:")
+        for step in self.docker_steps:
+            cached = " (cached)" if step.get("cached") else ""
+            vprint(
+                f"    {elapsed(step['duration']):>12}  "
+                f"{_short(step['instruction'])}{cached}"
+            )
+
+    def _display_agent_stages(self) -> None:
+        if not self.agent_stages:
+            return
+        vprint("  Build stages:")
+        for stage in self.agent_stages:
+            # sub stages are named "stage/sub-stage"
+            indent = "  " * stage["name"].count("/")
+            failed = "" if stage.get("success", True) else " (failed)"
+            vprint(
+                f"    {elapsed(stage['duration']):>12}  "
+                f"{indent}{stage['name']}{failed}"
+            )
+
+    def _display_layers(self) -> None:
+        if not self.layers:
+            return
+        vprint("  Image layers:")
+        _display_layers(self.layers)
+
+
+def image_layers(image_id: str) -> tuple[int, list[dict[str, Any]]]:
+    """Return the size of an image and the list of its layers (oldest first)."""
+    client = docker.from_env()
+    image = client.images.get(image_id)
+    layers = [
+        {
+            "id": layer["Id"],
+            "created_by": layer["CreatedBy"],
+            "size": layer["Size"],
+        }
+        for layer in reversed(image.history())
+    ]
+    return image.attrs["Size"], layers
+
+
+def _display_layers(layers: list[dict[str, Any]]) -> None:
+    for layer in layers:
+        if not layer["size"]:
+            continue
+        vprint(f"    {size_repr(layer['size']):>12}  {_short(layer['created_by'])}")
+
+
+def _short(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) > INSTRUCTION_WIDTH:
+        return text[: INSTRUCTION_WIDTH - 3] + "..."
+    return text
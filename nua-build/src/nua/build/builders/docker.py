@@ -3,10 +3,10 @@
 from __future__ import annotations
 
 import logging
-from contextlib import suppress
 from importlib import resources as rso
 from pathlib import Path
 from shutil import copy2, copytree
+from time import perf_counter, time
 
 import docker
 from nua.build.autobuild.nua_image_builder import NuaImageBuilder
@@ -16,15 +16,18 @@ from nua.lib.constants import NUA_BUILDER_TAG
 from nua.lib.docker import (
     display_docker_img,
     docker_build_log_error,
-    docker_stream_build,
+    docker_remove_locally,
 )
 from nua.lib.nua_config import hyphen_get, nua_config_names
-from nua.lib.panic import debug, info, vprint
+from nua.lib.panic import debug, info, vprint, warning
 from nua.lib.shell import rm_fr
 from nua.lib.tool.state import verbosity, verbosity_level
 
 from .. import __version__
+from .. import config as build_config
 from .base import Builder, BuilderError
+from .build_context import IgnoreRules, populate_context, report_context_size
+from .dockerfile import dependency_files, layered_dockerfile, merged_nua_folders
 
 logging.basicConfig(level=logging.INFO)
 CLIENT_TIMEOUT = 600
@@ -33,17 +36,20 @@ CLIENT_TIMEOUT = 600
 class DockerBuilder(Builder):
     # FIXME later
     container_type = "docker"
+    layered: bool = False
 
     def run(self):
         if not self.container_type == "docker":
             raise NotImplementedError(f"Container type '{self.container_type}'")
 
+        t0 = perf_counter()
         self.check_allowed_base_image()
         self.ensure_base_image_profile_availability()
         self.select_base_image()
         self.title_build()
         self.detect_nua_folder()
         self.build_docker_image()
+        self.report.duration = round(perf_counter() - t0, 3)
         self.post_build_notices()
 
     def check_allowed_base_image(self):
@@ -88,6 +94,15 @@ class DockerBuilder(Builder):
             self.nua_folder = self.config.root_dir
         with verbosity(3):
             debug(f"Detected Nua folder: {self.nua_folder}")
+        # A Dockerfile provided by the app is used as is:
+        self.layered = (
+            build_config.get("build", {}).get("layered", True)
+            and not (self.nua_folder / "Dockerfile").is_file()
+        )
+        if self.slim and not self.layered:
+            with verbosity(0):
+                warning("Slim image requires the layered Dockerfile, option ignored")
+            self.slim = False
 
     def build_docker_image(self):
         self.copy_project_files()
@@ -96,6 +111,9 @@ class DockerBuilder(Builder):
             info("Write Nua config file")
         self.config.dump_json(self.build_dir)
         # copy2(self.config.path, self.build_dir)
+        if self.layered:
+            self.write_layered_dockerfile()
+        self.report.context_size = report_context_size(self.build_dir)
         self.build_with_docker_stream()
         rm_fr(self.build_dir)
 
@@ -116,32 +134,94 @@ class DockerBuilder(Builder):
         self._copy_nua_folder()
         self._copy_default_files()
 
+    def write_layered_dockerfile(self):
+        """Replace the default Dockerfile by a layered one."""
+        dependencies = dependency_files(self.build_dir)
+        with verbosity(2):
+            info("Write layered Dockerfile")
+            if dependencies:
+                info(f"Dependencies layer from: {', '.join(dependencies)}")
+        content = layered_dockerfile(
+            dependencies,
+            cache_mounts=self.build_backend == "buildx",
+            runtime_paths=self.runtime_paths() if self.slim else None,
+        )
+        with verbosity(4):
+            vprint(content)
+        (self.build_dir / "nua" / "Dockerfile").write_text(content, encoding="utf8")
+
+    def runtime_paths(self) -> list[str]:
+        """Paths of the 'nua-app' stage kept in the runtime stage of a slim image,
+        in addition to the default RUNTIME_PATHS."""
+        paths = merged_nua_folders(self.build_dir)
+        document_root = hyphen_get(self.config.build, "document-root")
+        if document_root:
+            paths.append(document_root)
+        return paths + self.config.runtime_paths
+
+    def cache_bust(self) -> str:
+        """Value invalidating the cache of the build stage for remote sources.
+
+        The content of remote sources is not part of the build context, so the
+        cache of the build stage can only be used if their content is pinned by a
+        checksum.
+        """
+        if self.config.git_url:
+            return str(time())
+        if (
+            self.config.src_url or self.config.project
+        ) and not self.config.src_checksum:
+            return str(time())
+        return ""
+
     @docker_build_log_error
     def build_with_docker_stream(self):
         with chdir(self.build_dir):
-            with suppress(IOError):
-                copy2(
-                    self.build_dir / "nua" / "Dockerfile",
-                    self.build_dir,
-                )
+            dockerfile = self.build_dir / "nua" / "Dockerfile"
+            if dockerfile.is_file():
+                target = self.build_dir / "Dockerfile"
+                # the target may be a hard link to a file of the project:
+                target.unlink(missing_ok=True)
+                copy2(dockerfile, target)
             nua_tag = self.config.nua_tag
             buildargs = {
                 "nua_builder_tag": self.nua_base,
                 "nua_verbosity": str(verbosity_level()),
             }
+            if self.layered:
+                buildargs["nua_cache_bust"] = self.cache_bust()
             labels = {
                 "APP_ID": self.config.app_id,
                 "NUA_TAG": nua_tag,
                 "NUA_BUILD_VERSION": __version__,
             }
 
+            nocache = not (self.layered and self.use_cache)
+            full_image_id = ""
+            if self.slim:
+                with verbosity(0):
+                    info(f"Building image {nua_tag} (before runtime stage)")
+                # untagged and without labels, not seen as a Nua image:
+                full_image_id = self.docker_build(
+                    "", buildargs, {}, nocache=nocache, target="nua-app"
+                )
+                # the final build reuses the layers of the previous one:
+                nocache = False
+
             with verbosity(0):
                 info(f"Building image {nua_tag}")
-            image_id = docker_stream_build(".", nua_tag, buildargs, labels)
+            image_id = self.docker_build(nua_tag, buildargs, labels, nocache=nocache)
 
             with verbosity(1):
                 display_docker_img(nua_tag)
 
+        if self.profile:
+            self.report.collect_image(image_id)
+        if full_image_id:
+            self.report.collect_slim(full_image_id, image_id)
+            self.report.display_slim()
+            docker_remove_locally(full_image_id)
+
         if self.save_image:
             client = docker.from_env(timeout=CLIENT_TIMEOUT)
             image = client.images.get(image_id)
@@ -155,7 +235,7 @@ class DockerBuilder(Builder):
         with verbosity(4):
             debug("  copy_local_code()")
 
-        # TODO: more precise filtering based on .dockerignore
+        # more precise filtering from .dockerignore and .nuaignore rules below
         def keep(item):
             if item.name == ".dockerignore":
                 return True
@@ -169,7 +249,7 @@ class DockerBuilder(Builder):
         files = [item for item in self.config.root_dir.glob("*") if keep(item)]
         with verbosity(4):
             debug(f"  copy_local_code: {(str(f) for f in (files))}")
-        self._copy_items(files, self.build_dir)
+        self._link_items(files)
 
     def _copy_manifest_files(self):
         if not self.config.manifest:
@@ -177,7 +257,15 @@ class DockerBuilder(Builder):
         with verbosity(4):
             debug("  copy_manifest_files()")
         files = [self.config.root_dir / name for name in self.config.manifest]
-        self._copy_items(files, self.build_dir)
+        for path in files:
+            if not path.exists():
+                raise BuilderError(f"File not found: {path}")
+        self._link_items(files)
+
+    def _link_items(self, paths: list[Path]):
+        """Link items of the project in build_dir, skipping ignored files."""
+        rules = IgnoreRules.from_project(self.config.root_dir)
+        populate_context(paths, self.config.root_dir, self.build_dir, rules)
 
     def _copy_nua_folder(self):
         if not self.config.nua_dir_exists:
@@ -0,0 +1,157 @@
+"""Generation of the layered Dockerfile used by the Docker builder.
+
+The app_builder script is run stage by stage, each stage in its own layer, from
+the less to the more frequently modified inputs:
+
+- meta packages and apt packages only depend on the nua-config,
+- dependencies only depend on the lock files of the project,
+- the build stage depends on the full code of the project.
+
+So a change of the code only invalidates the last layer.
+
+For the BuildKit backend, the apt and pip caches are cache mounts shared between
+builds (not part of the image).
+
+For slim images, a last 'nua-runtime' stage starts again from the packages stage
+and only copies the installed application from the 'nua-app' stage (the Nua
+folders, the document root and the 'runtime-paths' of the nua-config, keeping
+their ownership), leaving behind the build packages, caches and intermediate
+layers.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from nua.lib.actions.constants import KEEP_APT_CACHE_ENV
+from nua.lib.constants import (
+    NUA_APP_PATH,
+    NUA_BUILD_PATH,
+    NUA_CONFIG_STEM,
+    NUA_METADATA_PATH,
+    NUA_SCRIPTS_PATH,
+)
+
+# Lock files copied in the 'dependencies' layer, see the 'dependency_files' of the
+# nua-agent detectors.
+DEPENDENCY_FILES = ("requirements.txt", "package.json", "yarn.lock")
+PIP_CACHE_PATH = "/var/cache/nua-pip"
+CACHE_MOUNTS = (
+    "--mount=type=cache,id=nua-apt,target=/var/cache/apt,sharing=locked "
+    f"--mount=type=cache,id=nua-pip,target={PIP_CACHE_PATH},mode=0777 "
+)
+# PIP_NO_CACHE_DIR is set in the Nua base images, any value disables the cache:
+CACHE_ENV = (
+    f"env -u PIP_NO_CACHE_DIR PIP_CACHE_DIR={PIP_CACHE_PATH} {KEEP_APT_CACHE_ENV}=1 "
+)
+# Paths copied from the 'nua-app' stage to the runtime stage of slim images:
+RUNTIME_PATHS = (NUA_APP_PATH, "/nua/venv", NUA_METADATA_PATH, NUA_SCRIPTS_PATH)
+# The hook of Ubuntu images removing the downloaded packages after install:
+APT_DOCKER_CLEAN = "/etc/apt/apt.conf.d/docker-clean"
+APT_DOCKER_CLEAN_DISABLED = "/etc/apt/docker-clean.disabled"
+
+
+def dependency_files(build_dir: Path) -> list[str]:
+    """Return the names of the lock files present at the root of build_dir."""
+    return [name for name in DEPENDENCY_FILES if (build_dir / name).is_file()]
+
+
+def merged_nua_folders(build_dir: Path) -> list[str]:
+    """Return the /nua folders filled from the nua folder of the project (like
+    /nua/templates), see the merge_files() step of the nua-agent app_builder."""
+    root = build_dir / "nua"
+    if not root.is_dir():
+        return []
+    return [
+        f"/nua/{item.name}"
+        for item in sorted(root.iterdir())
+        if item.is_dir()
+        and item.name != "nua"
+        and any(path.is_file() for path in item.rglob("*"))
+    ]
+
+
+def layered_dockerfile(
+    dependencies: list[str],
+    cache_mounts: bool = False,
+    runtime_paths: list[str] | None = None,
+) -> str:
+    """Return the content of a multi-stage Dockerfile running app_builder stages.
+
+    The 'dependencies' stage is omitted if there is no lock file to install. If
+    cache_mounts is set, the Dockerfile requires BuildKit. If runtime_paths is
+    not None, add a slim runtime stage containing these paths (in addition to
+    the RUNTIME_PATHS).
+    """
+
+    def run_stage(stage: str) -> str:
+        if cache_mounts:
+            return f"RUN {CACHE_MOUNTS}{CACHE_ENV}app_builder --stage {stage}"
+        return f"RUN app_builder --stage {stage}"
+
+    lines = []
+    if cache_mounts:
+        lines.append("# syntax=docker/dockerfile:1")
+    lines.extend(
+        [
+            "ARG nua_builder_tag",
+            "FROM ${nua_builder_tag} AS nua-packages",
+            "ARG nua_verbosity",
+        ]
+    )
+    if cache_mounts:
+        lines.append(
+            f"RUN [ ! -f {APT_DOCKER_CLEAN} ] "
+            f"|| mv {APT_DOCKER_CLEAN} {APT_DOCKER_CLEAN_DISABLED}"
+        )
+    lines.extend(
+        [
+            f"COPY {NUA_CONFIG_STEM}.json {NUA_BUILD_PATH}/",
+            run_stage("meta-packages"),
+            run_stage("packages"),
+            "",
+        ]
+    )
+    previous = "nua-packages"
+    if dependencies:
+        lines.extend(
+            [
+                f"FROM {previous} AS nua-dependencies",
+                "ARG nua_verbosity",
+                f"COPY {' '.join(dependencies)} {NUA_BUILD_PATH}/",
+                run_stage("dependencies"),
+                "",
+            ]
+        )
+        previous = "nua-dependencies"
+    lines.extend(
+        [
+            f"FROM {previous} AS nua-app",
+            "ARG nua_verbosity",
+            # changed for each build of remote sources not pinned by a checksum:
+            "ARG nua_cache_bust",
+            f"COPY . {NUA_BUILD_PATH}",
+            run_stage("build"),
+        ]
+    )
+    if runtime_paths is not None:
+        lines.extend(["", "FROM nua-packages AS nua-runtime"])
+        for path in _unique(RUNTIME_PATHS + tuple(runtime_paths)):
+            lines.append(f"COPY --from=nua-app {path} {path}")
+    if cache_mounts:
+        lines.append(
+            f"RUN [ ! -f {APT_DOCKER_CLEAN_DISABLED} ] "
+            f"|| mv {APT_DOCKER_CLEAN_DISABLED} {APT_DOCKER_CLEAN}"
+        )
+    lines.extend(
+        [
+            "",
+            'CMD ["python", "/nua/scripts/start.py"]',
+            "",
+        ]
+    )
+    return "\n".join(lines)
+
+
+def _unique(paths: tuple[str, ...]) -> list[str]:
+    return list(dict.fromkeys(path.rstrip("/") for path in paths if path))
@@ -3,14 +3,11 @@
 from __future__ import annotations
 
 import logging
+from time import perf_counter
 
 import docker
 from nua.lib.backports import chdir
-from nua.lib.docker import (
-    display_docker_img,
-    docker_build_log_error,
-    docker_stream_build,
-)
+from nua.lib.docker import display_docker_img, docker_build_log_error
 from nua.lib.panic import info
 from nua.lib.shell import rm_fr
 from nua.lib.tool.state import verbosity
@@ -24,6 +21,7 @@ CLIENT_TIMEOUT = 600
 
 class DockerWrapBuilder(Builder):
     def run(self):
+        t0 = perf_counter()
         self.title_build()
         # FIXME:
         # if self.container_type != "docker":
@@ -32,6 +30,7 @@ class DockerWrapBuilder(Builder):
         self.write_wrap_dockerfile()
         self.build_wrap_with_docker_stream()
         rm_fr(self.build_dir)
+        self.report.duration = round(perf_counter() - t0, 3)
         self.post_build_notices()
 
     def write_wrap_dockerfile(self):
@@ -68,11 +67,14 @@ class DockerWrapBuilder(Builder):
             }
             info(f"Building (wrap) image {nua_tag}")
             info(f"From image {self.config.wrap_image}")
-            image_id = docker_stream_build(".", nua_tag, buildargs, labels)
+            image_id = self.docker_build(nua_tag, buildargs, labels)
 
             with verbosity(1):
                 display_docker_img(nua_tag)
 
+        if self.profile:
+            self.report.collect_image(image_id, agent_report=False)
+
         if self.save_image:
             client = docker.from_env(timeout=CLIENT_TIMEOUT)
             image = client.images.get(image_id)
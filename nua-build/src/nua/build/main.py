@@ -24,6 +24,7 @@ from nua.lib.tool.state import set_color, set_verbosity, verbosity
 
 from . import __version__
 from .builders import BuilderError, get_builder
+from .builders.build_report import BuildReport
 
 snoop.install()
 
@@ -79,6 +80,24 @@ def app(argv: list | None = None):
         action=argparse.BooleanOptionalAction,
         help="Save image locally after the build.",
     )
+    parser.add_argument(
+        "--cache",
+        default=True,
+        action=argparse.BooleanOptionalAction,
+        help="Use the Docker cache for the layers of the build.",
+    )
+    parser.add_argument(
+        "--slim",
+        default=None,
+        action=argparse.BooleanOptionalAction,
+        help="Build a slim runtime image (default from the nua-config).",
+    )
+    parser.add_argument(
+        "--profile",
+        default="",
+        metavar="PATH",
+        help="Write a profiling report of the build (JSON) to file or directory.",
+    )
     parser.add_argument(
         "--validate",
         default=False,
@@ -97,6 +116,9 @@ def app(argv: list | None = None):
     config = parse_nua_config(args.config_file, args.validate)
     opts = {
         "save_image": args.save,
+        "use_cache": args.cache,
+        "slim": args.slim,
+        "profile": args.profile,
         "show_elapsed_time": args.time,
         "verbosity": args.verbose,
         "start_time": t0,
@@ -123,17 +145,35 @@ def parse_nua_config(config_file: str | None, validate_only: bool) -> NuaConfig:
 
 def build_app(config: NuaConfig, opts: dict[str, Any]):
     save = opts["save_image"]
+    use_cache = opts.get("use_cache", True)
+    slim = opts.get("slim")
+    profile_path = opts.get("profile", "")
+    profile = bool(profile_path) or opts["show_elapsed_time"]
     for provider in config.providers:
         if provider.get("type") == "app":
-            build_sub_app(config, provider, save_image=save)
-    build_main_app(config, save_image=save)
+            build_sub_app(config, provider, save_image=save, use_cache=use_cache)
+    report = build_main_app(
+        config, save_image=save, use_cache=use_cache, profile=profile, slim=slim
+    )
+    if profile:
+        report.display()
+    if profile_path:
+        dest = report.save(profile_path)
+        show(f"Build profile saved: {dest}")
     if opts["show_elapsed_time"] or opts["verbosity"] >= 1:
         t1 = perf_counter()
         print(f"Build time (clock): {elapsed(t1-opts['start_time'])}")
 
 
-def build_sub_app(config: NuaConfig, provider: dict[str, Any], save_image: bool):
-    builder = get_builder(config, provider=provider, save_image=save_image)
+def build_sub_app(
+    config: NuaConfig,
+    provider: dict[str, Any],
+    save_image: bool,
+    use_cache: bool = True,
+):
+    builder = get_builder(
+        config, provider=provider, save_image=save_image, use_cache=use_cache
+    )
     try:
         print("WIP building sub app...")
         print(builder)
@@ -143,8 +183,20 @@ def build_sub_app(config: NuaConfig, provider: dict[str, Any], save_image: bool)
         raise Abort from e
 
 
-def build_main_app(config: NuaConfig, save_image: bool):
-    builder = get_builder(config, save_image=save_image)
+def build_main_app(
+    config: NuaConfig,
+    save_image: bool,
+    use_cache: bool = True,
+    profile: bool = False,
+    slim: bool | None = None,
+) -> BuildReport:
+    builder = get_builder(
+        config,
+        save_image=save_image,
+        use_cache=use_cache,
+        profile=profile,
+        slim=slim,
+    )
     with verbosity(2):
         info(f"Using builder: {builder.__class__.__name__}")
     try:
@@ -153,6 +205,7 @@ def build_main_app(config: NuaConfig, save_image: bool):
         # FIXME: not for production
         traceback.print_exc(file=sys.stderr)
         raise Abort from e
+    return builder.report
 
 
 def main():
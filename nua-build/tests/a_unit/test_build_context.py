@@ -0,0 +1,97 @@
+import pytest
+
+from nua.build.builders.build_context import (
+    IgnoreRules,
+    context_sizes,
+    populate_context,
+)
+
+EXCLUSIONS = (
+    (["node_modules"], "node_modules", True),
+    (["node_modules"], "node_modules/foo/index.js", True),
+    (["node_modules"], "src/node_modules", False),
+    (["**/node_modules"], "src/node_modules/foo.js", True),
+    (["*.pyc"], "foo.pyc", True),
+    (["*.pyc"], "src/foo.pyc", False),
+    (["**/*.pyc"], "src/foo.pyc", True),
+    (["/build/"], "build/lib/a.so", True),
+    (["data/*.csv", "!data/small.csv"], "data/big.csv", True),
+    (["data/*.csv", "!data/small.csv"], "data/small.csv", False),
+    (["test?"], "test1", True),
+    (["test?"], "test12", False),
+    (["# comment", ""], "comment", False),
+    # the last rule matching the path or a parent wins, as in Docker:
+    (["!a/b", "a"], "a/b", True),
+    (["a", "!a/b"], "a/b/c.txt", False),
+    (["data", "!data/keep.txt"], "data/keep.txt", False),
+)
+
+
+@pytest.mark.parametrize("param", EXCLUSIONS)
+def test_is_excluded(param):
+    patterns, path, expected = param
+    rules = IgnoreRules(patterns)
+
+    result = rules.is_excluded(path)
+
+    assert result == expected
+
+
+def test_nuaignore_applied_after_dockerignore(tmp_path):
+    (tmp_path / ".dockerignore").write_text("*.log\n")
+    (tmp_path / ".nuaignore").write_text("!keep.log\n")
+
+    rules = IgnoreRules.from_project(tmp_path)
+
+    assert rules.is_excluded("debug.log")
+    assert not rules.is_excluded("keep.log")
+
+
+def test_populate_context(tmp_path):
+    root = tmp_path / "project"
+    (root / "src" / "node_modules").mkdir(parents=True)
+    (root / "src" / "app.py").write_text("print(1)\n")
+    (root / "src" / "node_modules" / "big.js").write_text("x" * 1000)
+    (root / "README").write_text("readme\n")
+    dest = tmp_path / "build"
+    dest.mkdir()
+    rules = IgnoreRules(["**/node_modules"])
+
+    populate_context(list(root.glob("*")), root, dest, rules)
+
+    assert (dest / "src" / "app.py").read_text() == "print(1)\n"
+    assert (dest / "README").is_file()
+    assert not (dest / "src" / "node_modules").exists()
+    assert context_sizes(dest) == {"README": 7, "src/": 9}
+
+
+def test_populate_context_reinclude_in_excluded_dir(tmp_path):
+    root = tmp_path / "project"
+    (root / "data" / "sub").mkdir(parents=True)
+    (root / "data" / "big.bin").write_text("x" * 1000)
+    (root / "data" / "sub" / "keep.txt").write_text("keep\n")
+    (root / "cache").mkdir()
+    (root / "cache" / "file").write_text("x")
+    dest = tmp_path / "build"
+    dest.mkdir()
+    rules = IgnoreRules(["data", "cache", "!data/sub/keep.txt"])
+
+    populate_context(list(root.glob("*")), root, dest, rules)
+
+    assert (dest / "data" / "sub" / "keep.txt").read_text() == "keep\n"
+    assert not (dest / "data" / "big.bin").exists()
+    assert not (dest / "cache").exists()
+
+
+def test_populate_context_does_not_modify_project(tmp_path):
+    root = tmp_path / "project"
+    root.mkdir()
+    (root / "Dockerfile").write_text("FROM scratch\n")
+    dest = tmp_path / "build"
+    dest.mkdir()
+    (dest / "Dockerfile").write_text("previous\n")
+
+    populate_context([root / "Dockerfile"], root, dest, IgnoreRules())
+
+    assert (dest / "Dockerfile").read_text() == "FROM scratch\n"
+    assert (root / "Dockerfile").read_text() == "FROM scratch\n"
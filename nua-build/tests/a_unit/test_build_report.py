@@ -0,0 +1,30 @@
+import json
+
+from nua.build.builders.build_report import BuildReport
+
+
+def test_save_in_directory(tmp_path):
+    report = BuildReport("nua-foo:1.0-1", date="2023-10-01T12:30:00+00:00")
+    report.docker_steps.append(
+        {"instruction": "RUN app_builder", "duration": 1.5, "cached": False}
+    )
+
+    dest = report.save(tmp_path)
+
+    assert dest.name == "nua-foo:1.0-1-20231001T123000.json"
+    content = json.loads(dest.read_text())
+    assert content["docker_steps"][0]["duration"] == 1.5
+
+
+def test_display(capsys):
+    report = BuildReport("nua-foo:1.0-1", duration=12.0)
+    report.agent_stages = [
+        {"name": "build", "duration": 10.0},
+        {"name": "build/build-script", "duration": 8.0, "success": False},
+    ]
+
+    report.display()
+
+    output = capsys.readouterr().out
+    assert "Build profile of 'nua-foo:1.0-1'" in output
+    assert "  build/build-script (failed)" in output
@@ -0,0 +1,76 @@
+from nua.build.builders.dockerfile import (
+    dependency_files,
+    layered_dockerfile,
+    merged_nua_folders,
+)
+
+
+def test_dependency_files(tmp_path):
+    (tmp_path / "yarn.lock").write_text("")
+    (tmp_path / "requirements.txt").write_text("flask\n")
+    (tmp_path / "app.py").write_text("")
+
+    result = dependency_files(tmp_path)
+
+    assert result == ["requirements.txt", "yarn.lock"]
+
+
+def test_layered_dockerfile_stages_order():
+    content = layered_dockerfile(["requirements.txt"])
+
+    stages = [line for line in content.splitlines() if line.startswith("RUN ")]
+    assert stages == [
+        "RUN app_builder --stage meta-packages",
+        "RUN app_builder --stage packages",
+        "RUN app_builder --stage dependencies",
+        "RUN app_builder --stage build",
+    ]
+    assert "COPY requirements.txt /nua/build/" in content
+    # the code is copied after the installation of dependencies:
+    assert content.index("COPY . /nua/build") > content.index("--stage dependencies")
+
+
+def test_layered_dockerfile_no_dependencies():
+    content = layered_dockerfile([])
+
+    assert "--stage dependencies" not in content
+    assert "FROM nua-packages AS nua-app" in content
+
+
+def test_layered_dockerfile_cache_mounts():
+    content = layered_dockerfile([], cache_mounts=True)
+
+    lines = content.splitlines()
+    assert lines[0] == "# syntax=docker/dockerfile:1"
+    runs = [line for line in lines if "app_builder" in line]
+    assert len(runs) == 3
+    assert all("--mount=type=cache" in line for line in runs)
+    assert all("env -u PIP_NO_CACHE_DIR" in line for line in runs)
+
+
+def test_layered_dockerfile_runtime_stage():
+    content = layered_dockerfile([], runtime_paths=["/var/lib/app/", "/nua/app"])
+
+    runtime = content[content.index("FROM nua-packages AS nua-runtime") :]
+    copies = [line for line in runtime.splitlines() if line.startswith("COPY")]
+    assert "COPY --from=nua-app /nua/venv /nua/venv" in copies
+    assert "COPY --from=nua-app /var/lib/app /var/lib/app" in copies
+    # the ownership of the files of the nua-app stage is kept:
+    assert not any("--chown" in line for line in copies)
+    # no duplicate path:
+    assert len(copies) == len(set(copies))
+    assert content.rstrip().endswith('CMD ["python", "/nua/scripts/start.py"]')
+
+
+def test_merged_nua_folders(tmp_path):
+    nua = tmp_path / "nua"
+    (nua / "templates" / "conf").mkdir(parents=True)
+    (nua / "templates" / "conf" / "app.ini.j2").write_text("")
+    (nua / "empty").mkdir()
+    (nua / "nua").mkdir()
+    (nua / "nua" / "file").write_text("")
+    (nua / "Dockerfile").write_text("")
+
+    result = merged_nua_folders(tmp_path)
+
+    assert result == ["/nua/templates"]
@@ -56,7 +56,7 @@ class Client:
     # Higher level API
     #
     def get_app_info(self, app_id: str) -> dict:
-        result = self.call("list")
+        result = self.call("list", app_id=app_id, view="full")
 
         app_info = None
         for instance in result:
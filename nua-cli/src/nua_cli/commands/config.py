@@ -29,13 +29,13 @@ class ShowCommand(Command):
     ]
 
     def run(self, app_id: str):
-        result = client.call("list")
-
         if not app_id:
             app_id = get_current_app_id()
         if not app_id:
             raise CommandError("No app_id specified")
 
+        result = client.call("list", app_id=app_id, view="full")
+
         for instance in result:
             if instance["app_id"] == app_id:
                 pp(instance)
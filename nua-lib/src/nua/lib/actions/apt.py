@@ -5,7 +5,7 @@ from contextlib import contextmanager
 from ..panic import show, warning
 from ..shell import sh
 from ..tool.state import packages_updated, set_packages_updated, verbosity
-from .constants import LONG_TIMEOUT, SHORT_TIMEOUT
+from .constants import KEEP_APT_CACHE_ENV, LONG_TIMEOUT, SHORT_TIMEOUT
 
 
 @contextmanager
@@ -63,7 +63,11 @@ def apt_update():
 def apt_final_clean():
     environ = os.environ.copy()
     environ["DEBIAN_FRONTEND"] = "noninteractive"
-    cmd = "apt-get autoremove -y; apt-get clean"
+    if environ.get(KEEP_APT_CACHE_ENV):
+        # the apt cache is a build cache mount, not part of the image
+        cmd = "apt-get autoremove -y"
+    else:
+        cmd = "apt-get autoremove -y; apt-get clean"
     sh(cmd, env=environ, timeout=SHORT_TIMEOUT)
 
 
@@ -1,2 +1,5 @@
 LONG_TIMEOUT = 1800
 SHORT_TIMEOUT = 300
+
+# If set, do not clean the apt cache (when it is a cache mount of BuildKit):
+KEEP_APT_CACHE_ENV = "NUA_KEEP_APT_CACHE"
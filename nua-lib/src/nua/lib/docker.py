@@ -1,14 +1,21 @@
 """Docker scripting utils."""
 
 # pyright: reportOptionalMemberAccess=false
+import io
 import re
 import string
+import tarfile
+import tempfile
+from contextlib import suppress
 from datetime import datetime
 from functools import wraps
+from pathlib import Path
+from subprocess import PIPE, STDOUT, Popen, run
+from time import perf_counter
 
 import docker
 from docker import DockerClient
-from docker.errors import APIError, BuildError, ImageNotFound
+from docker.errors import APIError, BuildError, ImageNotFound, NotFound
 from docker.models.images import Image
 from docker.utils.json_stream import json_stream
 
@@ -17,6 +24,10 @@ from nua.lib.tool.state import verbosity, verbosity_level
 
 LOCAL_CONFIG = {"size_unit_MiB": False}
 RE_SUCCESS = re.compile(r"(^Successfully built |sha256:)([0-9a-f]+)$")
+RE_STEP = re.compile(r"^Step \d+/\d+ : (.*)$")
+# BuildKit plain progress output:
+RE_BUILDKIT_STEP = re.compile(r"^#(\d+) \[[^\]]+\] (.*)$")
+RE_BUILDKIT_DONE = re.compile(r"^#(\d+) (DONE \S+|CACHED|ERROR.*)$")
 
 
 # def vprint_log_stream(docker_log: list):
@@ -187,6 +198,7 @@ def _docker_stream_chunk(
     chunk: dict,
     messages_buffer: list[str],
     result: dict,
+    steps: list[dict] | None = None,
 ) -> None:
     if "error" in chunk:
         _print_buffer_log(messages_buffer)
@@ -196,6 +208,8 @@ def _docker_stream_chunk(
     if message:
         if match := RE_SUCCESS.search(message):
             result["image_id"] = match.group(2)
+        if steps is not None:
+            _record_step(message, steps)
         with verbosity(2):
             print_stream(message)
         if verbosity_level() < 2:
@@ -208,24 +222,176 @@ def docker_stream_build(
     tag: str,
     buildargs: dict,
     labels: dict,
+    nocache: bool = True,
+    steps: list[dict] | None = None,
+    target: str = "",
 ) -> str:
+    """Build an image, return its id.
+
+    If a 'steps' list is provided, it is filled with the instructions of the
+    Dockerfile, their duration and cache status. If tag is empty, the image is
+    not tagged. If target is set, build only up to this stage of the Dockerfile.
+    """
     messages_buffer: list[str] = []
     client = docker.from_env()
     resp = client.api.build(
         path=path,
-        tag=tag,
+        tag=tag or None,
+        target=target or None,
         rm=True,
         forcerm=True,
         buildargs=buildargs,
         labels=labels,
-        nocache=True,
+        nocache=nocache,
         timeout=1800,
     )
     stream = json_stream(resp)
     result: dict[str, str] = {}
     for chunk in stream:
-        _docker_stream_chunk(chunk, messages_buffer, result)
+        _docker_stream_chunk(chunk, messages_buffer, result, steps)
+    if steps:
+        _close_step(steps[-1])
     if "image_id" not in result:
         _print_buffer_log(messages_buffer)
         raise BuildError(result.get("last_event", "Unknown"), "")
     return result["image_id"]
+
+
+def _record_step(message: str, steps: list[dict]) -> None:
+    message = message.strip()
+    if match := RE_STEP.match(message):
+        if steps:
+            _close_step(steps[-1])
+        steps.append(
+            {
+                "instruction": match.group(1),
+                "start": perf_counter(),
+                "duration": 0.0,
+                "cached": False,
+            }
+        )
+    elif steps and message == "---> Using cache":
+        steps[-1]["cached"] = True
+
+
+def _close_step(step: dict) -> None:
+    if "start" in step:
+        step["duration"] = round(perf_counter() - step.pop("start"), 3)
+
+
+def docker_image_file(image_id: str, path: str) -> bytes | None:
+    """Return the content of a file of an image, or None if not found.
+
+    The file is read from a created (not started) container.
+    """
+    client = docker.from_env()
+    container = client.containers.create(image_id)
+    try:
+        bits, _stat = container.get_archive(path)
+        with tarfile.open(fileobj=io.BytesIO(b"".join(bits))) as archive:
+            member = archive.next()
+            if member is None or not member.isfile():
+                return None
+            content = archive.extractfile(member)
+            return content.read() if content else None
+    except NotFound:
+        return None
+    finally:
+        container.remove(force=True)
+
+
+def docker_buildx_build(
+    path: str,
+    tag: str,
+    buildargs: dict,
+    labels: dict,
+    nocache: bool = True,
+    steps: list[dict] | None = None,
+    target: str = "",
+    builder: str = "",
+    cache_dir: str = "",
+) -> str:
+    """Build an image with BuildKit ('docker buildx build'), return its id.
+
+    The image is loaded in the local Docker daemon. If cache_dir is set, the
+    build cache is imported from and exported to this local directory (requires
+    a builder instance using the 'docker-container' driver).
+    """
+    messages_buffer: list[str] = []
+    cmd = ["docker", "buildx", "build", "--progress=plain", "--load"]
+    if tag:
+        cmd.extend(["-t", tag])
+    if target:
+        cmd.extend(["--target", target])
+    if builder:
+        cmd.extend(["--builder", builder])
+    if nocache:
+        cmd.append("--no-cache")
+    if cache_dir:
+        cmd.extend(["--cache-from", f"type=local,src={cache_dir}"])
+        cmd.extend(["--cache-to", f"type=local,dest={cache_dir},mode=max"])
+    for key, value in buildargs.items():
+        cmd.extend(["--build-arg", f"{key}={value}"])
+    for key, value in labels.items():
+        cmd.extend(["--label", f"{key}={value}"])
+    with tempfile.TemporaryDirectory() as tmp:
+        iidfile = Path(tmp) / "iid"
+        cmd.extend(["--iidfile", str(iidfile), path])
+        with Popen(cmd, stdout=PIPE, stderr=STDOUT, text=True) as proc:
+            for message in proc.stdout:  # type: ignore
+                with verbosity(2):
+                    print_stream(message)
+                if verbosity_level() < 2:
+                    messages_buffer.append(message)
+                if steps is not None:
+                    _record_buildkit_step(message, steps)
+        if proc.returncode != 0 or not iidfile.is_file():
+            _print_buffer_log(messages_buffer)
+            raise BuildError(f"docker buildx build exited with {proc.returncode}", "")
+        return iidfile.read_text().strip().split(":")[-1]
+
+
+def _record_buildkit_step(message: str, steps: list[dict]) -> None:
+    message = message.strip()
+    if match := RE_BUILDKIT_STEP.match(message):
+        if any(step.get("vertex") == match.group(1) for step in steps):
+            return
+        steps.append(
+            {
+                "vertex": match.group(1),
+                "instruction": match.group(2),
+                "start": perf_counter(),
+                "duration": 0.0,
+                "cached": False,
+            }
+        )
+    elif match := RE_BUILDKIT_DONE.match(message):
+        status = match.group(2)
+        for step in steps:
+            if step.get("vertex") != match.group(1):
+                continue
+            step["cached"] = status == "CACHED"
+            _close_step(step)
+            if status.startswith("DONE ") and status.endswith("s"):
+                # prefer the duration measured by BuildKit
+                with suppress(ValueError):
+                    step["duration"] = float(status[5:-1])
+
+
+def docker_buildx_ensure_builder(name: str) -> None:
+    """Create a BuildKit builder instance (docker-container driver) if missing."""
+    inspect = run(
+        ["docker", "buildx", "inspect", name], capture_output=True, check=False
+    )
+    if inspect.returncode == 0:
+        return
+    with verbosity(1):
+        vprint(f"Create BuildKit builder instance '{name}'")
+    created = run(
+        ["docker", "buildx", "create", "--name", name, "--driver", "docker-container"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if created.returncode != 0:
+        raise BuildError(f"Failed to create buildx builder: {created.stderr}", "")
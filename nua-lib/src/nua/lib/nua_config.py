@@ -348,6 +348,16 @@ class NuaConfig:
     def pip_install(self) -> list:
         return force_list(hyphen_get(self.build, "pip-install", []))
 
+    @property
+    def slim(self) -> bool:
+        """Finish the image with a runtime stage without build residues."""
+        return bool(self.build.get("slim"))
+
+    @property
+    def runtime_paths(self) -> list:
+        """Additional paths to keep in the runtime stage of a slim image."""
+        return force_list(hyphen_get(self.build, "runtime-paths") or "")
+
     @property
     def build_method(self) -> str:
         """Build method (or default build method).
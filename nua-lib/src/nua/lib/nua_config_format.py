@@ -35,6 +35,8 @@ class Build(BaseModel):
     before_build: str | list[str] | None
     pip_install: str | list[str] | None
     project: str | None
+    slim: bool | None
+    runtime_paths: str | list[str] | None
 
     # Obsolete, relaced by 'build':
     # build_command: str | list[str] | None  # add
@@ -45,6 +47,7 @@ class Run(BaseModel):
     before_run: str | list[str] | None
     start: str | list[str] | None
     post_run: str | list[str] | None
+    post_run_parallel: bool | None
     post_run_status: str | None
 
     # Should the '[env]' section be here or at the root ?
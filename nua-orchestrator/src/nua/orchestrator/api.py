@@ -1,16 +1,18 @@
-"""API to access orchestrator commands."""
+"""API to access orchestrator commands.
+
+The modules needed by a method are imported on its first call: the read-only
+methods used by nua-cli and nua-server ("list", "settings") do not load the
+deployment and Docker machinery.
+"""
 
 from pathlib import Path
 from typing import Any
 
 from nua.lib.tool.state import set_verbosity
 
-from .cli.commands.deploy_remove import deploy_merge_one_nua_app_config
-from .cli.commands.status import StatusCommand
 from .db import store
 from .db.store import list_all_settings
 from .init import initialization
-from .search_cmd import search_nua
 
 
 class API:
@@ -24,21 +26,35 @@ class API:
         return getattr(self, method)(**kwargs)
 
     @staticmethod
-    def status() -> dict[str, Any]:
-        """Return status information about local orchestrator as a dict."""
+    def status(
+        fields: list[str] | None = None,
+        app_id: str = "",
+        label: str = "",
+        state: str = "",
+        offset: int = 0,
+        limit: int = 0,
+    ) -> dict[str, Any]:
+        """Return status information about local orchestrator as a dict.
+
+        The apps can be filtered by app_id, label and running state, paginated
+        (offset, limit) and their records restricted to some fields.
+        """
+        from .cli.commands.status import StatusCommand
+
         status = StatusCommand()
-        status.read()
-        return status.as_dict()
+        status.read(app_id=app_id, label=label, state=state, offset=offset, limit=limit)
+        return status.as_dict(fields)
 
     @staticmethod
-    def search(app_name: str) -> list[Path]:
+    def search(app_name: str) -> list[Path | str]:
         """Search Nua image from the registries.
 
-        (local registry for now).
-
         Return:
-            list of path of local Nua archives sorted by version.
+            list of path of local Nua archives or url of registry images,
+            sorted by version.
         """
+        from .search_cmd import search_nua
+
         return search_nua(app_name)
 
     @staticmethod
@@ -50,6 +66,8 @@ class API:
         **kwargs: Any,
     ) -> None:
         """Deploy one Nua applications."""
+        from .cli.commands.deploy_remove import deploy_merge_one_nua_app_config
+
         app_config = kwargs
         app_config.update({"image": image, "domain": domain, "label": label})
         if env is not None:
@@ -58,13 +76,47 @@ class API:
 
     # wip ###################################################################
 
-    def list(self):
-        instances = store.list_instances_all()
-        return [instance.to_dict() for instance in instances]
+    def list(
+        self,
+        fields: list[str] | None = None,
+        view: str = "compact",
+        app_id: str = "",
+        label: str = "",
+        state: str = "",
+        offset: int = 0,
+        limit: int = 0,
+    ) -> list[dict[str, Any]]:
+        """List the deployed instances.
+
+        fields: columns or dotted paths of 'site_config' to return, by default
+            the fields of the view ("compact" or "full").
+        app_id, label, state: filters.
+        offset, limit: pagination.
+        """
+        if not fields:
+            if view == "full":
+                fields = list(store.INSTANCE_COLUMNS)
+            else:
+                fields = list(store.COMPACT_INSTANCE_FIELDS)
+        return store.list_instances_fields(
+            fields,
+            app_id=app_id,
+            label_id=label,
+            state=state,
+            offset=offset,
+            limit=limit,
+        )
 
     def settings(self):
         return list_all_settings()
 
+    @staticmethod
+    def metrics(containers: bool = True) -> str:
+        """Return the metrics in the Prometheus text format."""
+        from .metrics import metrics_text
+
+        return metrics_text(with_containers=containers)
+
     def server_log(self):
         # FIXME: hardcoded for now (and not working because logfile not created)
         # with Path("/home/nua/log/nua_orchestrator.log").open() as f:
@@ -39,11 +39,11 @@ from .deploy_utils import (
     deactivate_all_instances,
     deactivate_app,
     extra_host_gateway,
-    load_install_image,
+    install_app_images,
     mount_provider_volumes,
     pause_one_app_containers,
     port_allocator,
-    pull_provider_container,
+    pull_providers_containers,
     remove_container_private_network,
     remove_volume_by_source,
     restart_one_app_containers,
@@ -54,14 +54,24 @@ from .deploy_utils import (
     unpause_one_app_containers,
     unused_volumes,
 )
-from .docker_utils import docker_container_status, docker_container_status_record
+from .docker_utils import (
+    docker_container_of_name,
+    docker_container_status,
+    docker_container_status_record,
+    docker_remove_container,
+    docker_remove_container_previous,
+)
 from .domain_split import DomainSplit
 from .healthcheck import HealthCheck
 from .local_services import LocalServices
+from .metrics import deploy_phase
 from .nginx.commands import nginx_reload, nginx_restart
 from .nginx.render_default import chown_r_nua_nginx, clean_nua_nginx_default_site
 from .nginx.render_site import configure_nginx_host, remove_nginx_host_configuration
 from .provider import Provider
+from .readiness import wait_ready
+from .resource_planner import ResourcePlan, plan_apps, planner_enabled, report
+from .tracing import span
 from .utils import parse_any_format
 from .volume import Volume
 
@@ -70,12 +80,38 @@ from .volume import Volume
 # parameters passed as a dict to docker run
 RUN_BASE: dict[str, Any] = {}  # see also nua_config
 RUN_BASE_PROVIDER: dict[str, Any] = {"restart_policy": {"name": "always"}}
+# update strategies of a deployed app:
+UPDATE_STOP_FIRST = "stop-first"
+UPDATE_BLUE_GREEN = "blue-green"
+UPDATE_STRATEGIES = (UPDATE_STOP_FIRST, UPDATE_BLUE_GREEN)
+# suffix of the container name of the new version, during a blue/green update:
+NEXT_CONTAINER_SUFFIX = "-next"
 
 
 def known_strings(current: list[str], new: list[str]) -> list[str]:
     return [s for s in new if s in set(current)]
 
 
+def share_image_nua_configs(apps: list[AppInstance]) -> None:
+    """Make the instances of the same image use a single image_nua_config dict.
+
+    The nua-config of an image is the largest part of the deployed state of an
+    instance. Only for deployed states: the parts of the nua-config used by an
+    instance (providers, env, ports, volumes, backup) are copied, the shared
+    dict is not modified.
+    """
+    shared: dict[str, dict] = {}
+    for app in apps:
+        key = app.get("image_id") or app.get("image", "")
+        if not key or "image_nua_config" not in app:
+            continue
+        config_dict = shared.setdefault(key, app.image_nua_config)
+        if config_dict is not app.image_nua_config and config_dict == (
+            app.image_nua_config
+        ):
+            app.image_nua_config = config_dict
+
+
 class AppDeployer:
     """Deployment of a list of app instance/nua-image.
 
@@ -105,6 +141,7 @@ class AppDeployer:
         self.required_services = set()
         self.available_services = {}
         self.orig_mounted_volumes = []
+        self.resource_plan: ResourcePlan | None = None
         self.previous_config_id = 0
         self._mounted_before_removing = []  # internal use when removing app instance
         # self.future_config_id = 0
@@ -122,6 +159,7 @@ class AppDeployer:
         filtered = [app for app in apps if app.get("domain", "") != domain]
         self.loaded_config["site"] = filtered
 
+    @deploy_phase
     def local_services_inventory(self):
         """Initialization step: inventory of available providers available on
         the host, like local databases."""
@@ -148,6 +186,7 @@ class AppDeployer:
         self.loaded_config = {"site": [app_config]}
         self._load_deploy_config()
 
+    @deploy_phase
     def load_deploy_config(self, deploy_config: str):
         config_path = Path(deploy_config).expanduser().resolve()
         with verbosity(0):
@@ -157,6 +196,7 @@ class AppDeployer:
         with verbosity(3):
             self.print_host_list()
 
+    @deploy_phase
     def merge(self, additional: AppDeployer, option: str = "add"):
         """Merge a deployment configuration into the current deployed configuration.
 
@@ -171,6 +211,7 @@ class AppDeployer:
             return self.merge_add(additional)
         raise RuntimeError("Merge option not implemented")
 
+    @deploy_phase
     def merge_sequential(self, additional: AppDeployer):
         """Merge a deployment configuration sequentially.
 
@@ -258,6 +299,7 @@ class AppDeployer:
                     # another app on another domain
                     return "deploy_reuse_label"
 
+    @deploy_phase
     def deploy_new_app(self, app: AppInstance):
         """Deploy new label and app on new domain."""
         important(f"Deploy '{app.label}': a new {app.app_id} on '{app.domain}'")
@@ -304,7 +346,7 @@ class AppDeployer:
             app.set_persistent_full_dict(persistent)
         self.evaluate_dynamic_values(app)
 
-    def _deploy_new_app_step2(self, app: AppInstance):
+    def _deploy_new_app_step2(self, app: AppInstance, reserved: set | None = None):
         """Deploy an app.
 
         - step 2 - ports
@@ -314,6 +356,7 @@ class AppDeployer:
         allocated_ports = self.configured_ports()
         ports_instances_domains = store.ports_instances_domains()
         allocated_ports.update(ports_instances_domains)
+        allocated_ports.update(reserved or set())
         allocator = port_allocator(start_ports, end_ports, allocated_ports)
         app.allocate_auto_ports(allocator)
         for provider in app.providers:
@@ -349,6 +392,7 @@ class AppDeployer:
         self.deployed_labels = sorted(a.label_id for a in self.apps)
         self._start_apps([app], deactivate=False)
 
+    @deploy_phase
     def deploy_update_app(self, merged_app: AppInstance):
         """Deploy same app on on same domain."""
         important(
@@ -360,9 +404,19 @@ class AppDeployer:
         )
         if same_label_app is not None:
             persistent_data = same_label_app.persistent_full_dict()
+            if self.update_strategy(merged_app) == UPDATE_BLUE_GREEN:
+                self._deploy_new_app_step1(merged_app, persistent_data)
+                if self._blue_green_possible(merged_app, same_label_app):
+                    self.deploy_blue_green(merged_app, same_label_app)
+                    return
+                self._remove_per_label(same_label_app, remove_volumes=False)
+                self._deploy_new_app_step2(merged_app)
+                self._deploy_new_app_step3(merged_app)
+                return
             self._remove_per_label(same_label_app, remove_volumes=False)
             self._deploy_new_app(merged_app, persistent=persistent_data)
 
+    @deploy_phase
     def deploy_replace_app(self, merged_app: AppInstance):
         """Deploy another app on same domain."""
         same_label_app = next(
@@ -372,9 +426,210 @@ class AppDeployer:
             f"Deploy '{merged_app.label}': replace {same_label_app.app_id} "
             f"by {merged_app.app_id} on '{merged_app.domain}'"
         )
+        if self.update_strategy(merged_app) == UPDATE_BLUE_GREEN:
+            self._deploy_new_app_step1(merged_app)
+            if self._blue_green_possible(merged_app, same_label_app):
+                self.deploy_blue_green(merged_app, same_label_app)
+                return
+            self._remove_per_label(merged_app, remove_volumes=True)
+            self._deploy_new_app_step2(merged_app)
+            self._deploy_new_app_step3(merged_app)
+            return
         self._remove_per_label(merged_app, remove_volumes=True)
         self._deploy_new_app(merged_app)
 
+    @staticmethod
+    def update_strategy(app: AppInstance) -> str:
+        """Return the update strategy of the app (deploy config or settings)."""
+        strategy = (
+            app.get("update")
+            or config.read("nua", "deploy", "update")
+            or UPDATE_STOP_FIRST
+        )
+        if strategy not in UPDATE_STRATEGIES:
+            raise Abort(
+                f"Unknown update strategy '{strategy}', "
+                f"expected one of: {', '.join(UPDATE_STRATEGIES)}"
+            )
+        return strategy
+
+    @staticmethod
+    def _providers_signature(app: AppInstance) -> set[tuple[str, str]]:
+        return {(p.container_name, p.image) for p in app.providers}
+
+    def _blue_green_possible(
+        self,
+        new_app: AppInstance,
+        current_app: AppInstance,
+    ) -> bool:
+        """Check that both versions of the app can run at the same time.
+
+        - no fixed host port (the new version uses new auto ports),
+        - same app: same providers, they are kept running and shared,
+        - another app: no provider container name in common.
+        """
+        reason = ""
+        if any(port.get("host") is not None for port in new_app.port_list):
+            reason = "the app uses a fixed host port"
+        elif new_app.app_id == current_app.app_id:
+            if self._providers_signature(new_app) != self._providers_signature(
+                current_app
+            ):
+                reason = "the providers of the app are modified"
+        else:
+            new_names = {p.container_name for p in new_app.providers}
+            if new_names & {p.container_name for p in current_app.providers}:
+                reason = "the new app uses the same provider containers"
+        if reason:
+            with verbosity(0):
+                warning(f"Blue/green update not possible, {reason}")
+            return False
+        return True
+
+    @deploy_phase
+    def deploy_blue_green(self, new_app: AppInstance, current_app: AppInstance):
+        """Start the new version beside the running one, switch Nginx to it once
+        ready, then stop the previous version.
+
+        If the new version fails to start or does not become ready, it is removed
+        (with its new providers and network) and the running version is left
+        untouched.
+        """
+        with verbosity(0):
+            info(f"Blue/green update of '{new_app.label}'")
+        same_app = new_app.app_id == current_app.app_id
+        # new auto ports, distinct from the ports of the running version:
+        reserved = {
+            port["host_use"]
+            for port in current_app.port_list
+            if port.get("host_use") is not None
+        }
+        self._deploy_new_app_step2(new_app, reserved=reserved)
+        new_app.parse_healthcheck()
+        new_app.parse_backup()
+        for service in new_app.local_services:
+            handler = self.available_services[service]
+            if not handler.check_site_configuration(new_app):
+                raise Abort(
+                    f"Required service '{service}' not configured for "
+                    f"app {new_app.domain}"
+                )
+        next_name = f"{new_app.container_name}{NEXT_CONTAINER_SUFFIX}"
+
+        self.plan_resources([new_app])
+        self.required_services.update(new_app.local_services)
+        # restarting local services:
+        self.restart_local_services()
+        try:
+            self._start_blue_green(new_app, current_app, next_name, same_app)
+        except BaseException:
+            self._rollback_blue_green(new_app, next_name, same_app)
+            raise
+
+        self._switch_blue_green(new_app, current_app)
+        drain_delay = config.read("nua", "deploy", "drain_delay")
+        time.sleep(2 if drain_delay is None else drain_delay)
+        self._retire_blue_green(new_app, current_app, same_app)
+
+        # the new version takes the name of the instance:
+        container = docker_container_of_name(next_name)
+        if container is not None:
+            container.rename(new_app.container_name)
+        run_params = new_app.run_params
+        run_params["name"] = new_app.container_name
+        new_app.run_params = run_params
+        new_app.running_status = RUNNING
+        self.store_container_instance(new_app)
+
+    def _start_blue_green(
+        self,
+        new_app: AppInstance,
+        current_app: AppInstance,
+        next_name: str,
+        same_app: bool,
+    ):
+        """Start the new version under next_name and wait until it is ready."""
+        self.start_network(new_app)
+        self.evaluate_container_params(new_app)
+        if same_app:
+            self._reuse_providers(new_app, current_app)
+        else:
+            self.start_providers_containers(new_app)
+        run_params = new_app.run_params
+        run_params["name"] = next_name
+        new_app.run_params = run_params
+        self.start_main_app_container(new_app)
+
+        timeout = config.read("nua", "deploy", "readiness_timeout") or 120
+        if not wait_ready(
+            new_app, next_name, timeout, new_app.get("readiness_path", "")
+        ):
+            raise Abort(
+                f"New version of '{new_app.label}' not ready, update rolled back"
+            )
+
+    @staticmethod
+    def _reuse_providers(new_app: AppInstance, current_app: AppInstance):
+        """Keep the running providers of the current version.
+
+        The running containers keep their host ports: the ports allocated for
+        the new version are released.
+        """
+        running = {p.container_name: p for p in current_app.providers}
+        for provider in new_app.providers:
+            previous = running[provider.container_name]
+            provider.container_id = previous.container_id
+            provider.run_params = previous.run_params
+            provider.port_list = deepcopy(previous.port_list)
+
+    def _rollback_blue_green(
+        self,
+        new_app: AppInstance,
+        next_name: str,
+        same_app: bool,
+    ):
+        with verbosity(0):
+            important(f"Roll back the update of '{new_app.label}'")
+        docker_remove_container(next_name, force=True)
+        if not same_app:
+            for provider in new_app.providers:
+                docker_remove_container_previous(provider.container_name, False)
+            remove_container_private_network(new_app.network_name)
+
+    def _switch_blue_green(self, new_app: AppInstance, current_app: AppInstance):
+        """Route the domain to the new version."""
+        self.apps = [app for app in self.apps if app is not current_app]
+        self.remove_domain_from_config(current_app.domain)
+        self.apps.append(new_app)
+        self.sort_apps_per_name_domain()
+        self.deployed_domains = sorted(
+            {apps_dom["hostname"] for apps_dom in self.apps_per_domain}
+        )
+        self.deployed_labels = sorted(a.label_id for a in self.apps)
+        if current_app.domain != new_app.domain:
+            self.remove_nginx_configuration(current_app.domain)
+        chown_r_nua_nginx()
+        self.reconfigure_nginx_domain(new_app.domain)
+
+    def _retire_blue_green(
+        self,
+        new_app: AppInstance,
+        current_app: AppInstance,
+        same_app: bool,
+    ):
+        """Stop and remove the previous version."""
+        with verbosity(0):
+            info(f"Stop previous version of '{current_app.label_id}'")
+        docker_remove_container_previous(current_app.container_name, False)
+        if same_app:
+            return
+        for provider in current_app.providers:
+            docker_remove_container_previous(provider.container_name, False)
+        remove_container_private_network(current_app.network_name)
+        for source in _local_volume_names(current_app) - _local_volume_names(new_app):
+            remove_volume_by_source(source)
+
+    @deploy_phase
     def deploy_move_domain(self, merged_app: AppInstance):
         """Deploy same app on another domain."""
         same_label_app = next(
@@ -390,6 +645,7 @@ class AppDeployer:
         self._remove_per_label(same_label_app, remove_volumes=False)
         self._deploy_new_app(merged_app, persistent=persistent_data)
 
+    @deploy_phase
     def deploy_reuse_label(self, merged_app: AppInstance):
         """Deploy another app on another domain."""
         same_label_app = next(
@@ -469,8 +725,16 @@ class AppDeployer:
                 return app
         raise Abort(f"No instance found for label_id '{label_id}'")
 
-    def load_deployed_state(self, deployed: dict[str, Any]) -> None:
-        """Load last successful deployment configuration."""
+    @deploy_phase
+    def load_deployed_state(
+        self, deployed: dict[str, Any], partial: bool = False
+    ) -> None:
+        """Load last successful deployment configuration.
+
+        If 'partial', deployed only contains some apps of the state (see
+        StateJournal.deployed_state()): no cleaning of volumes and instances
+        of the other apps.
+        """
         if deployed["state_id"] <= 0:
             with verbosity(1):
                 show("No previous deployed configuration found")
@@ -480,26 +744,31 @@ class AppDeployer:
             return
         self.loaded_config = deployed["requested"]
         self.apps = [AppInstance.from_dict(data) for data in deployed["apps"]]
+        share_image_nua_configs(self.apps)
         self.sort_apps_per_name_domain()
         self.deployed_domains = sorted(
             {apps_dom["hostname"] for apps_dom in self.apps_per_domain}
         )
-        self.erase_unused_local_managed_volumes()
-        self.delete_removed_instances()
+        if not partial:
+            self.erase_unused_local_managed_volumes()
+            self.delete_removed_instances()
         with verbosity(1):
             info(f"Loaded deployement state number: {deployed['state_id']}")
 
+    @deploy_phase
     def gather_requirements(self, parse_providers: bool = True):
         self.install_required_images()
         if parse_providers:
             self.apps_parse_providers()
         self.install_required_providers()
 
+    @deploy_phase
     def configure_apps(self):
         self.configure_apps_step1()
         self.configure_apps_step2()
         self.configure_apps_step3()
 
+    @deploy_phase
     def configure_apps_step1(self):
         """ "First part of app configuration: data local to app."""
         self.apps_set_network_name()
@@ -511,10 +780,12 @@ class AppDeployer:
         self.apps_retrieve_persistent()
         self.apps_evaluate_dynamic_values()
 
+    @deploy_phase
     def configure_apps_step2(self):
         """ "Second part of app configuration: common data (ports)."""
         self.apps_generate_ports()
 
+    @deploy_phase
     def configure_apps_step3(self):
         """ "Last part of app configuration: requiring ports."""
         self.apps_parse_healthcheck()
@@ -530,6 +801,7 @@ class AppDeployer:
         """Read the initial volumes to display that information after operations."""
         self.orig_mounted_volumes = store.list_instances_container_active_volumes()
 
+    @deploy_phase
     def deactivate_previous_apps(self):
         deactivate_all_instances()
 
@@ -542,6 +814,7 @@ class AppDeployer:
         self.orig_mounted_volumes = store.list_instances_container_active_volumes()
         deactivate_all_instances()
 
+    @deploy_phase
     def apply_nginx_configuration(self):
         """Apply configuration to Nginx, especially configurations that can not be
         deployed before all previous apps are stopped."""
@@ -549,11 +822,13 @@ class AppDeployer:
         # registering https apps with certbot requires that the base nginx config is
         # deployed.
         # register_certbot_domains(self.apps)
-        register_certbot_domains_per_domain(self.apps_per_domain)
+        with span("register_certbot_domains"):
+            register_certbot_domains_per_domain(self.apps_per_domain)
         with verbosity(3):
             bold_debug("AppDeployment .apps:")
             debug(pformat(self.apps))
 
+    @deploy_phase
     def merge_nginx_configuration(self):
         """Apply configuration to Nginx, for new apps and existing ones."""
         if not self.already_deployed_domains:
@@ -573,7 +848,8 @@ class AppDeployer:
         # registering https apps with certbot requires that the base nginx config is
         # deployed.
         # register_certbot_domains(self.apps)
-        register_certbot_domains_per_domain(self.apps_per_domain)
+        with span("register_certbot_domains"):
+            register_certbot_domains_per_domain(self.apps_per_domain)
         with verbosity(3):
             bold_debug("AppDeployment .apps:")
             debug(self.apps)
@@ -606,6 +882,7 @@ class AppDeployer:
         if not self.already_deployed_domains:
             # easy, either first deployment or all apps removed, start from zero:
             return self.start_apps()
+        self.plan_resources(new_apps)
         # restarting local services:
         self.restart_local_services()
         for app in new_apps:
@@ -621,8 +898,10 @@ class AppDeployer:
         chown_r_nua_nginx()
         nginx_reload()
 
+    @deploy_phase
     def start_apps(self):
         """Start all apps to deploy."""
+        self.plan_resources()
         # restarting local services:
         self.restart_local_services()
         for app in self.apps:
@@ -653,6 +932,7 @@ class AppDeployer:
         self.remove_managed_volumes(apps)
         self.remove_deployed_instance(apps)
 
+    @deploy_phase
     def stop_deployed_apps(self, apps: list[AppInstance]):
         """Stop deployed app instances."""
         with verbosity(0):
@@ -705,6 +985,7 @@ class AppDeployer:
             app.running_status = RUNNING
             self.store_container_instance(app)
 
+    @deploy_phase
     def remove_container_and_network(self, apps: list[AppInstance]):
         """Remove stopped app: container, network, but not volumes."""
         with verbosity(3):
@@ -890,6 +1171,7 @@ class AppDeployer:
                 apps_list.append(app)
         self.apps = apps_list
 
+    @deploy_phase
     def install_required_images(self) -> None:
         # first: check that all Nua images are available:
         self.find_all_apps_images()
@@ -908,30 +1190,24 @@ class AppDeployer:
                     info(f"Image found: '{app.image}'")
 
     def install_images(self) -> None:
+        """Install the distinct images of the apps, in parallel."""
         start_container_engine()
-        installed = {}
         for app in self.apps:
             if not app.find_registry_path(cached=True):
                 raise Abort(f"No image found for '{app.image}'")
-
-            registry_path = app.registry_path
-            if registry_path in installed:
-                image_id = installed[registry_path][0]
-                image_nua_config = deepcopy(installed[registry_path][1])
-            else:
-                image_id, image_nua_config = load_install_image(registry_path)
-                installed[registry_path] = (image_id, image_nua_config)
+        installed = install_app_images(app.registry_path for app in self.apps)
+        for app in self.apps:
+            image_id, image_nua_config = installed[app.registry_path]
+            # each instance may update its copy of the image configuration:
             app.image_id = image_id
-            app.image_nua_config = image_nua_config
+            app.image_nua_config = deepcopy(image_nua_config)
 
+    @deploy_phase
     def install_required_providers(self) -> None:
-        if not all(self._pull_providers_images(app) for app in self.apps):
+        providers = [provider for app in self.apps for provider in app.providers]
+        if not pull_providers_containers(providers):
             raise Abort("Missing Docker images")
 
-    @staticmethod
-    def _pull_providers_images(app: AppInstance) -> bool:
-        return all(pull_provider_container(provider) for provider in app.providers)
-
     def apps_check_local_service_available(self):
         self.required_services = {s for site in self.apps for s in site.local_services}
         with verbosity(3):
@@ -1010,6 +1286,7 @@ class AppDeployer:
             handler = self.available_services[service]
             handler.restart()
 
+    @deploy_phase
     def configure_nginx(self):
         clean_nua_nginx_default_site()
         for host in self.apps_per_domain:
@@ -1062,19 +1339,46 @@ class AppDeployer:
             for provider in app.providers:
                 provider.allocate_auto_ports(allocator)
 
+    def plan_resources(self, new_apps: list[AppInstance] | None = None):
+        """Compute the resource limits of all the containers of the host (the
+        new apps replacing the deployed ones of same container name), and report
+        overcommit before any container is started."""
+        if not planner_enabled():
+            self.resource_plan = None
+            return
+        apps = {app.container_name: app for app in self.apps}
+        apps.update((app.container_name, app) for app in new_apps or [])
+        self.resource_plan = plan_apps(list(apps.values()))
+        report(self.resource_plan)
+
+    def resource_params(self, site: Provider) -> dict[str, Any]:
+        """Docker run parameters of the resource plan for the container."""
+        if self.resource_plan is None:
+            return {}
+        allocation = self.resource_plan.allocation(site.container_name)
+        if allocation is None:
+            return {}
+        return allocation.as_docker_params()
+
     def evaluate_container_params(self, app: AppInstance):
         """Compute site run environment parameters except those requiring late
         evaluation (i.e. host names of started containers)."""
+        if self.resource_plan is None or not self.resource_plan.allocation(
+            app.container_name
+        ):
+            self.plan_resources([app])
         self.generate_app_container_run_parameters(app)
         for provider in app.providers:
             self.generate_provider_container_run_parameters(provider)
 
     def apps_retrieve_persistent(self):
+        previous = store.instances_persistent([app.label_id for app in self.apps])
         for app in self.apps:
-            self.retrieve_persistent(app)
+            self.retrieve_persistent(app, previous.get(app.label_id))
 
-    def retrieve_persistent(self, app: AppInstance):
-        previous = store.instance_persistent(app.label_id)
+    def retrieve_persistent(self, app: AppInstance, previous: dict | None = None):
+        if previous is None:
+            previous = store.instance_persistent(app.label_id)
         with verbosity(4):
             debug(f"persistent previous: {previous=}")
         previous.update(app.persistent_full_dict())
@@ -1120,6 +1424,7 @@ class AppDeployer:
         if app.network_name:
             create_container_private_network(app.network_name)
 
+    @deploy_phase
     def start_providers_containers(self, app: AppInstance):
         for provider in app.providers:
             if provider.is_docker_type():
@@ -1132,6 +1437,7 @@ class AppDeployer:
     #     for provider in app.providers:
     #         provider.setup_db()
 
+    @deploy_phase
     def start_main_app_container(self, app: AppInstance):
         # volumes need to be mounted before beeing passed as arguments to
         # docker.run()
@@ -1162,6 +1468,8 @@ class AppDeployer:
         run_params = deepcopy(RUN_BASE)
         nua_docker_default_run = config.read("nua", "docker_default_run") or {}
         run_params.update(nua_docker_default_run)
+        # limits computed from the host capacity, unless set explicitly below:
+        run_params.update(self.resource_params(app))
         # run parameters defined in the image configuration, without the "env"
         # sections:
         nua_conf_docker = deepcopy(app.image_nua_config.get("docker") or {})
@@ -1186,6 +1494,7 @@ class AppDeployer:
     ):
         """Return suitable parameters for the docker.run() command (for Provider)."""
         run_params = deepcopy(RUN_BASE_PROVIDER)
+        run_params.update(self.resource_params(provider))
         run_params.update(provider.docker)
         self.add_host_gateway_to_extra_hosts(run_params)
         run_params["name"] = provider.container_name
@@ -1230,6 +1539,7 @@ class AppDeployer:
             "apps": deepcopy(self.apps),
         }
 
+    @deploy_phase
     def post_deployment(self):
         self.display_deployment_status()
 
@@ -1384,6 +1694,19 @@ class AppDeployer:
         debug(pformat(self.apps_per_domain))
 
 
+def _local_volume_names(app: AppInstance) -> set[str]:
+    """Names of the local managed volumes of the app and its providers."""
+    definitions = list(app.volumes)
+    for provider in app.providers:
+        definitions.extend(provider.volumes)
+    names = set()
+    for definition in definitions:
+        volume = Volume.parse(definition)
+        if volume.is_managed and volume.is_local:
+            names.add(volume.full_name)
+    return names
+
+
 def _verify_located(host: dict):
     """host format:
 
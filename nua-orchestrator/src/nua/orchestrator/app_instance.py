@@ -172,12 +172,12 @@ class AppInstance(Provider):
     def persistent(self, name: str) -> Persistent:
         """Return Persistent instance for provider of name 'name'.
 
-        Use name = '' for main site.
+        Use name = '' for main site. The Persistent instance is a view on the
+        instance data: changes are stored without calling set_persistent().
         """
         if "persistent" not in self:
             self["persistent"] = {}
-        content = self["persistent"].get(name, {})
-        return Persistent.from_name_dict(name, content)
+        return Persistent(name, self["persistent"].setdefault(name, {}))
 
     def set_persistent(self, persistent: Persistent):
         if "persistent" not in self:
@@ -322,7 +322,8 @@ class AppInstance(Provider):
                     pformat(provider_config),
                 )
                 return None
-        provider = Provider(provider_config)
+        # the nua-config of the image may be shared with other instances:
+        provider = Provider(deepcopy(provider_config))
         # debug backup print(declaration)
         provider.provider_name = provider_config["name"]
         provider.check_valid()
@@ -43,9 +43,9 @@ def instance_key_evaluator(
     result = {}
     if provider is None:
         provider = app
-        persistent = app.persistent("")
+        name = ""
     else:
-        persistent = app.persistent(provider.provider_name)
+        name = provider.provider_name
     if port is None:
         dynamics = {k: v for k, v in provider.env.items() if isinstance(v, dict)}
     else:
@@ -54,6 +54,8 @@ def instance_key_evaluator(
         debug(f"instance_key_evaluator ({late_evaluation=}):\n    {pformat(dynamics)}")
     if not dynamics:
         return {}
+    # view on the app persistent data, shared by all the keys of the provider:
+    persistent = app.persistent(name)
     for destination_key, requirement in dynamics.items():
         evaluate_requirement(
             provider,
@@ -63,7 +65,6 @@ def instance_key_evaluator(
             result,
             late_evaluation,
         )
-    app.set_persistent(persistent)
     return result
 
 
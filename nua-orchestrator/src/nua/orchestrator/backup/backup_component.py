@@ -23,6 +23,8 @@ class BackupComponent:
     date: str = ""
     provider_info: dict[str, Any] | None = None
     volume_info: dict[str, Any] | None = None
+    # plugin specific information (format, timings, ...):
+    metadata: dict[str, Any] | None = None
 
     def info_list(self) -> list[str]:
         text = [
@@ -55,6 +57,7 @@ class BackupComponent:
         date: str,
         provider_info: dict[str, Any] | None,
         volume_info: dict[str, Any] | None,
+        metadata: dict[str, Any] | None = None,
     ) -> BackupComponent:
         component = BackupComponent(
             folder=folder,
@@ -63,6 +66,7 @@ class BackupComponent:
             date=date,
             provider_info=provider_info,
             volume_info=volume_info,
+            metadata=metadata,
         )
         component.save()
         return component
@@ -76,6 +80,7 @@ class BackupComponent:
             date=item["date"],
             provider_info=item["provider_info"],
             volume_info=item["volume_info"],
+            metadata=item.get("metadata"),
         )
 
     @classmethod
@@ -1,4 +1,22 @@
-"""Class to backup a database."""
+"""Class to backup a database.
+
+Two formats are available (option "format" of the backup section):
+
+- "plain" (default): SQL script from pg_dump, restored by psql,
+- "directory": pg_dump -Fd, compressed and dumped in parallel ("jobs" option) by a
+  sidecar container of the same Postgres image, writing directly into the backup
+  folder. Restored by pg_restore, also in parallel.
+"""
+
+import os
+import re
+import shlex
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import docker
+from docker.models.containers import Container
 
 from ...docker_utils import (
     docker_container_of_name,
@@ -9,6 +27,46 @@ from ..backup_component import BackupComponent
 from ..backup_registry import register_plugin
 from .plugin_base_class import BackupErrorException, PluginBaseClass
 
+FORMATS = ("plain", "directory")
+MAX_DEFAULT_JOBS = 4
+# Verbose messages of pg_dump and pg_restore about table data:
+RE_TABLE_START = re.compile(
+    r'dumping contents of table "(?:[^"]+\.)?([^"]+)"'
+    r"|(?:processing|launching) item \d+ TABLE DATA (\S+)"
+)
+RE_TABLE_END = re.compile(r"finished item \d+ TABLE DATA (\S+)")
+
+
+def default_jobs() -> int:
+    return max(1, min(MAX_DEFAULT_JOBS, os.cpu_count() or 1))
+
+
+def table_timings(lines: list[tuple[float, str]]) -> dict[str, float]:
+    """Return the duration of the dump (or restore) of each table.
+
+    lines are the (time, message) of the verbose output of pg_dump or
+    pg_restore. Without the "finished item" messages (no parallel jobs), a table
+    ends when the next one starts.
+    """
+    started: dict[str, float] = {}
+    timings: dict[str, float] = {}
+    current = ""
+    for when, line in lines:
+        if match := RE_TABLE_START.search(line):
+            table = match.group(1) or match.group(2)
+            if current and current not in timings and current in started:
+                # sequential dump, the previous table is done:
+                timings[current] = round(when - started[current], 3)
+            started[table] = when
+            current = table
+        elif match := RE_TABLE_END.search(line):
+            table = match.group(1)
+            if table in started:
+                timings[table] = round(when - started[table], 3)
+    if current and current not in timings and lines:
+        timings[current] = round(lines[-1][0] - started[current], 3)
+    return timings
+
 
 class BckPostgresDump(PluginBaseClass):
     """Backup plugin for Postgres Docker continaer using pg_dumpall.
@@ -24,20 +82,40 @@ class BckPostgresDump(PluginBaseClass):
             return
         raise BackupErrorException("WIP: Only local backup is currently implemented")
 
+    def backup_format(self) -> str:
+        fmt = self.options.get("format", "plain")
+        if fmt not in FORMATS:
+            raise BackupErrorException(f"Error: Unknown pg_dump format '{fmt}'")
+        return fmt
+
+    def jobs(self) -> int:
+        try:
+            return max(1, int(self.options.get("jobs") or default_jobs()))
+        except ValueError as e:
+            raise BackupErrorException(f"Error: Wrong 'jobs' option: {e}") from e
+
     def do_backup(self) -> None:
-        """Backup the Provider with pg_dumpall.
+        """Backup the Provider with pg_dump.
 
         Provider is expected to be a Postgres database.
         """
         self.check_local_destination()
-
-        self.file_name = f"{self.date}-{self.node}.sql"
-        dest_file = self.folder / self.file_name
-
         container = docker_container_of_name(self.node)
         if container is None:
             raise BackupErrorException(f"Error: No container found for {self.node}")
 
+        if self.backup_format() == "directory":
+            self.do_backup_directory(container)
+        else:
+            self.do_backup_plain(container)
+        self.finalize_component()
+        self.report.success = True
+        self.reports.append(self.report)
+
+    def do_backup_plain(self, container: Container) -> None:
+        self.file_name = f"{self.date}-{self.node}.sql"
+        dest_file = self.folder / self.file_name
+
         cmd = "/usr/bin/pg_dump -U ${POSTGRES_USER} -d ${POSTGRES_DB}  --clean"
 
         print(f"Start backup: {dest_file}")
@@ -48,14 +126,39 @@ class BckPostgresDump(PluginBaseClass):
                 output,
             )
             output.flush()
-        self.finalize_component()
-        self.report.success = True
-        self.reports.append(self.report)
+
+    def do_backup_directory(self, container: Container) -> None:
+        self.file_name = f"{self.date}-{self.node}.pgdir"
+        dest_dir = self.folder / self.file_name
+        jobs = self.jobs()
+        cmd = [
+            "pg_dump",
+            "--verbose",
+            "--format=directory",
+            f"--jobs={jobs}",
+            f"--file={self.nua_backup_dir}/{self.file_name}",
+        ]
+        if "compress" in self.options:
+            cmd.append(f"--compress={self.options['compress']}")
+
+        print(f"Start backup: {dest_dir}")
+        t0 = perf_counter()
+        lines = self.run_sidecar(container, cmd, str(self.folder))
+        self.metadata = {
+            "format": "directory",
+            "jobs": jobs,
+            "duration": round(perf_counter() - t0, 3),
+            "tables": table_timings(lines),
+        }
 
     def restore(self, component: BackupComponent) -> str:
         """Restore the Provider."""
         container = docker_container_of_name(self.node)
+        if container is None:
+            raise RuntimeError(f"Error: No container found for {self.node}")
         bck_file = self.backup_file(component)
+        if bck_file.is_dir():
+            return self.restore_directory(container, bck_file)
         bash_cmd = (
             r"PGOPTIONS='--client-min-messages=warning' /usr/bin/psql -q "
             "-U '${POSTGRES_USER}' -d '${POSTGRES_DB}'"
@@ -65,5 +168,79 @@ class BckPostgresDump(PluginBaseClass):
         result = docker_exec_stdin(container, cmd, bck_file).strip()
         return result or "    done"
 
+    def restore_directory(self, container: Container, bck_dir: Path) -> str:
+        jobs = self.jobs()
+        cmd = [
+            "pg_restore",
+            "--verbose",
+            "--clean",
+            "--if-exists",
+            "--no-owner",
+            f"--jobs={jobs}",
+            f"--dbname={_container_env(container).get('POSTGRES_DB', '')}",
+            f"{self.nua_backup_dir}/{bck_dir.name}",
+        ]
+        print(f"Restore: {bck_dir}")
+        t0 = perf_counter()
+        try:
+            lines = self.run_sidecar(container, cmd, str(bck_dir.parent))
+        except BackupErrorException as e:
+            raise RuntimeError(str(e)) from e
+        timings = table_timings(lines)
+        return (
+            f"    done in {perf_counter() - t0:.1f}s, "
+            f"{len(timings)} tables, {jobs} jobs"
+        )
+
+    def run_sidecar(
+        self,
+        container: Container,
+        cmd: list[str],
+        folder: str,
+    ) -> list[tuple[float, str]]:
+        """Run a Postgres client in a container of the same image, sharing the
+        network of the database container and mounting the backup folder.
+
+        Return the timed lines of its output.
+        """
+        env = _container_env(container)
+        environment = {
+            "PGHOST": "localhost",
+            "PGPORT": env.get("PGPORT", "5432"),
+            "PGUSER": env.get("POSTGRES_USER", "postgres"),
+            "PGPASSWORD": env.get("POSTGRES_PASSWORD", ""),
+            "PGDATABASE": env.get("POSTGRES_DB", ""),
+        }
+        client = docker.DockerClient.from_env()
+        sidecar = client.containers.run(
+            container.image.id,
+            command=cmd,
+            entrypoint=[],
+            environment=environment,
+            network_mode=f"container:{container.id}",
+            volumes={folder: {"bind": self.nua_backup_dir, "mode": "rw"}},
+            detach=True,
+        )
+        lines: list[tuple[float, str]] = []
+        try:
+            for raw in sidecar.logs(stream=True, follow=True):
+                when = perf_counter()
+                for line in raw.decode("utf8", "replace").splitlines():
+                    lines.append((when, line))
+            status = sidecar.wait().get("StatusCode", 1)
+        finally:
+            sidecar.remove(force=True)
+        if status != 0:
+            tail = "\n".join(line for _when, line in lines[-10:])
+            raise BackupErrorException(
+                f"Error: {cmd[0]} exit code {status}: {shlex.join(cmd)}\n{tail}"
+            )
+        return lines
+
+
+def _container_env(container: Container) -> dict[str, Any]:
+    env_list = container.attrs.get("Config", {}).get("Env") or []
+    return dict(item.split("=", 1) for item in env_list if "=" in item)
+
 
 register_plugin(BckPostgresDump)
@@ -8,6 +8,7 @@ import docker
 from nua.lib.dates import backup_date
 from nua.lib.docker import docker_require
 
+from ...metrics import observe, timed
 from ...provider import Provider
 from ...volume import Volume
 from ..backup_component import BackupComponent
@@ -51,6 +52,7 @@ class PluginBaseClass(abc.ABC):
         self.reports: list[BackupReport] = []
         self.folder: Path = Path()
         self.file_name: str = ""
+        self.metadata: dict[str, Any] | None = None
 
     def restore(self, component: BackupComponent) -> str:
         """Restore the Provider and or Volume.
@@ -116,6 +118,7 @@ class PluginBaseClass(abc.ABC):
                 # "domain": self.provider.domain,
             },
             volume_info=self.volume_info,
+            metadata=self.metadata,
         )
 
     def backup_file(self, component: BackupComponent) -> Path:
@@ -124,12 +127,32 @@ class PluginBaseClass(abc.ABC):
             raise RuntimeError(f"Warning: No backup file {bck_file}")
         return bck_file
 
+    def backup_size(self) -> int:
+        """Size of the backup file (or directory), in bytes."""
+        if not self.file_name:
+            return 0
+        path = self.folder / self.file_name
+        if path.is_dir():
+            return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+        if path.is_file():
+            return path.stat().st_size
+        return 0
+
+    def _timed_backup(self) -> None:
+        with timed(
+            "nua_backup_seconds",
+            "nua_backup_errors_total",
+            plugin=self.identifier,
+        ):
+            self.do_backup()
+        observe("nua_backup_bytes", self.backup_size(), plugin=self.identifier)
+
     def run(self) -> BackupReport:
         """Backup the Provider or Volume."""
         self.set_date()
         self.make_nua_local_folder()
         try:
-            self.do_backup()
+            self._timed_backup()
         except (BackupErrorException, RuntimeError) as e:
             self.report.message = f"Backup failed: {e}"
         else:
@@ -145,7 +168,7 @@ class PluginBaseClass(abc.ABC):
         self.make_nua_local_folder()
         self.reports = []
         try:
-            self.do_backup()
+            self._timed_backup()
         except (BackupErrorException, RuntimeError) as e:
             self.report.message = f"Backup failed: {e}"
             self.reports.append(self.report)
@@ -4,6 +4,7 @@ from typing import Any
 
 from nua.orchestrator.app_deployer import AppDeployer
 from nua.orchestrator.state_journal import StateJournal, restore_if_fail
+from nua.orchestrator.tracing import span
 
 
 @restore_if_fail
@@ -13,11 +14,13 @@ def deploy_nua_apps(deploy_config: str, state_journal: StateJournal):
     deployer.load_deploy_config(deploy_config)
     deployer.gather_requirements()
     deployer.configure_apps()
-    _deactivate_installed_apps(state_journal)
+    with span("deactivate_installed_apps"):
+        _deactivate_installed_apps(state_journal)
     deployer.apply_nginx_configuration()
     deployer.start_apps()
-    deployed = deployer.deployed_configuration()
-    state_journal.store_deployed_state(deployed)
+    with span("store_deployed_state"):
+        deployed = deployer.deployed_configuration()
+        state_journal.store_deployed_state(deployed)
     deployer.display_deployment_status()
 
 
@@ -71,8 +74,9 @@ def deploy_merge_nua_app(merge_config: str, state_journal: StateJournal):
     additional.load_deploy_config(merge_config)
     additional.gather_requirements()
     deployer.merge_sequential(additional)
-    deployed = deployer.deployed_configuration()
-    state_journal.store_deployed_state(deployed)
+    with span("store_deployed_state"):
+        deployed = deployer.deployed_configuration()
+        state_journal.store_deployed_state(deployed)
     deployer.display_deployment_status()
 
 
@@ -89,6 +93,7 @@ def deploy_merge_one_nua_app_config(
     additional.load_one_app_config(app_config)
     additional.gather_requirements()
     deployer.merge_sequential(additional)
-    deployed = deployer.deployed_configuration()
-    state_journal.store_deployed_state(deployed)
+    with span("store_deployed_state"):
+        deployed = deployer.deployed_configuration()
+        state_journal.store_deployed_state(deployed)
     deployer.display_deployment_status()
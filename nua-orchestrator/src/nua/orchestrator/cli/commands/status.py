@@ -12,6 +12,7 @@ class StatusCommand:
     def __init__(self):
         self._registries: list[dict] = []
         self._deploy_status: dict[str, Any] = {}
+        self._filters: dict[str, Any] = {}
 
     def display(self) -> None:
         """Directly print the current orchestrator status for CLI."""
@@ -24,8 +25,25 @@ class StatusCommand:
         deployer.load_deployed_state(state.deployed_state())
         deployer.display_deployment_status()
 
-    def read(self) -> None:
-        """Read Orchestrator registries and deployment statuses."""
+    def read(
+        self,
+        app_id: str = "",
+        label: str = "",
+        state: str = "",
+        offset: int = 0,
+        limit: int = 0,
+    ) -> None:
+        """Read Orchestrator registries and deployment statuses.
+
+        Only the apps matching the filters (and the requested page) are read.
+        """
+        self._filters = {
+            "app_id": app_id,
+            "label": label,
+            "state": state,
+            "offset": offset,
+            "limit": limit,
+        }
         self._read_registries()
         self._read_deployed()
 
@@ -34,18 +52,41 @@ class StatusCommand:
         self._registries = config.read("nua", "registry") or []  # type: ignore
 
     def _read_deployed(self) -> None:
-        """Read Orchestrator deployed apps status."""
+        """Read Orchestrator deployed apps status.
+
+        The filters and the page are applied by the DB query, only the
+        selected apps are loaded.
+        """
         state = StateJournal()
-        state.read_current_state()
+        state.read_current_state(with_apps=False)
         deployer = AppDeployer()
-        deployer.load_deployed_state(state.deployed_state())
+        filters = self._filters
+        if any(filters.values()):
+            deployed = state.deployed_state(
+                labels=[filters["label"]] if filters["label"] else None,
+                app_id=filters["app_id"],
+                running_status=filters["state"],
+                offset=filters["offset"],
+                limit=filters["limit"],
+            )
+            deployer.load_deployed_state(deployed, partial=True)
+        else:
+            deployer.load_deployed_state(state.deployed_state())
         self._deploy_status = deployer.deployment_status_records()
 
-    def as_dict(self) -> dict[str, Any]:
-        """Return orichestrator status as a dict."""
+    def as_dict(self, fields: list[str] | None = None) -> dict[str, Any]:
+        """Return orichestrator status as a dict.
+
+        If fields is set, the records of the apps only contain these keys.
+        """
         result: dict[str, Any] = {"version": __version__}
         result["registries"] = self._registries
         result.update(self._deploy_status)
+        if fields and "apps" in result:
+            result["apps"] = [
+                {key: record[key] for key in fields if key in record}
+                for record in result["apps"]
+            ]
         return result
 
     def _configured_registries(self) -> str:
@@ -6,10 +6,6 @@ from pathlib import Path
 import typer
 
 from .. import config
-from ..db.store import installed_nua_settings, set_nua_settings
-from ..init import initialization
-from ..util.deep_update import deep_update
-from ..utils import parse_any_format
 
 ALLOW_SUFFIX = {".json", ".toml", ".yaml", ".yml"}
 
@@ -22,6 +18,9 @@ def export_nua_config(
     config_file: str = arg_config,
 ):
     """Export current Nua orchestrator config (JSON) to file or stdout."""
+    from ..db.store import installed_nua_settings
+    from ..init import initialization
+
     initialization()
     content = installed_nua_settings()
     config_text = json.dumps(content, ensure_ascii=False, indent=4, sort_keys=True)
@@ -36,6 +35,9 @@ def update_nua_config(
     config_file: str = arg_config,
 ):
     """Update Nua orchestrator config from JSON or TOML file."""
+    from ..init import initialization
+    from ..utils import parse_any_format
+
     initialization()
     content = parse_any_format(Path(config_file))
     config_update(content)
@@ -47,6 +49,9 @@ def main():
 
 
 def config_update(updates: dict):
+    from ..db.store import installed_nua_settings, set_nua_settings
+    from ..util.deep_update import deep_update
+
     content = installed_nua_settings()
     deep_update(content, updates)
     config.set("nua", content)
@@ -5,10 +5,6 @@ from pprint import pformat
 import typer
 from nua.lib.tool.state import set_color, set_verbosity
 
-from ..app_manager import AppManager
-from ..db.store import installed_nua_settings, list_all_settings
-from ..init import initialization
-
 ALLOW_SUFFIX = {".json", ".toml", ".yaml", ".yml"}
 
 app = typer.Typer()
@@ -26,6 +22,9 @@ def deployed_config(
     colorize: bool = option_color,
 ):
     """Debug: show current active configuration."""
+    from ..app_manager import AppManager
+    from ..init import initialization
+
     set_verbosity(verbose)
     set_color(colorize)
     initialization()
@@ -37,6 +36,9 @@ def deployed_config(
 @app.command("db-settings")
 def db_settings():
     """Debug: show settings in db."""
+    from ..db.store import list_all_settings
+    from ..init import initialization
+
     initialization()
     print(pformat(list_all_settings()))
 
@@ -44,10 +46,40 @@ def db_settings():
 @app.command("nua-settings")
 def nua_settings():
     """Debug: show Nua orchestrator settings in db."""
+    from ..db.store import installed_nua_settings
+    from ..init import initialization
+
     initialization()
     print(pformat(installed_nua_settings()))
 
 
+@app.command("trace")
+def trace(
+    state_id: int = typer.Argument(
+        0, help="Id of the deployment state (default: last one)."
+    ),
+):
+    """Debug: show the timing trace of a deployment."""
+    from ..db.store import deploy_config_last_one, deploy_config_per_id
+    from ..init import initialization
+    from ..tracing import render_trace
+
+    initialization()
+    if state_id:
+        record = deploy_config_per_id(state_id)
+    else:
+        record = deploy_config_last_one()
+    if not record:
+        print(f"No deployment state of id {state_id}")
+        raise typer.Exit(1)
+    content = (record.get("deployed") or {}).get("trace")
+    if not content:
+        print(f"No trace for the deployment state {record['id']}")
+        raise typer.Exit(1)
+    print(f"State Id: {record['id']}  created: {record['created']}")
+    print("\n".join(render_trace(content)))
+
+
 @app.callback()
 def main():
     """Debug commands."""
@@ -1,4 +1,8 @@
-"""Script main entry point for Nua local."""
+"""Script main entry point for Nua local.
+
+Only the command line parsing is imported at startup: each command imports the
+modules it needs (and initializes the DB), so "--version" or "--help" stay fast.
+"""
 
 import json
 import sys
@@ -6,34 +10,11 @@ from pathlib import Path
 from typing import Optional
 
 import typer
-from nua.lib.panic import warning
 from nua.lib.tool.state import set_color, set_verbosity
 
 from .. import __version__
-from ..api import API
-from ..init import initialization
-from ..search_cmd import search_nua_print
 from . import configuration as config_cmd
 from . import debug
-from .commands.backup_restore import (
-    backup_all_apps,
-    backup_one_app,
-    restore_last_backup,
-    restore_list_backups,
-)
-from .commands.deploy_remove import (
-    deploy_merge_nua_app,
-    deploy_nua_apps,
-    remove_nua_domain,
-    remove_nua_label,
-)
-from .commands.restore_deployed import restore_active_state
-from .commands.start_stop import (
-    restart_nua_instance,
-    start_nua_instance,
-    stop_nua_instance,
-)
-from .commands.status import StatusCommand
 
 ALLOW_SUFFIX = {".json", ".toml", ".yaml", ".yml"}
 
@@ -90,6 +71,9 @@ def usage():
 @app.command("status")
 def status_local() -> None:
     """Status of orchestrator."""
+    from ..init import initialization
+    from .commands.status import StatusCommand
+
     initialization()
     set_verbosity(0)
     status = StatusCommand()
@@ -99,6 +83,8 @@ def status_local() -> None:
 @app.command("reload")
 def reload_local():
     """Rebuild config and restart apps."""
+    from ..init import initialization
+
     print("Not implemented yet.")
     initialization()
     # TODO (not implemented yet)
@@ -108,6 +94,9 @@ def reload_local():
 @app.command("search")
 def search_local(app: str = arg_search_app):
     """Search Nua image."""
+    from ..init import initialization
+    from ..search_cmd import search_nua_print
+
     initialization()
     search_nua_print(app)
 
@@ -119,6 +108,11 @@ def deploy_local(
     colorize: bool = option_color,
 ):
     """Deploy one or several Nua applications."""
+    from nua.lib.panic import warning
+
+    from ..init import initialization
+    from .commands.deploy_remove import deploy_merge_nua_app
+
     set_verbosity(verbose)
     set_color(colorize)
     initialization()
@@ -137,6 +131,11 @@ def deploy_replace_local(
     colorize: bool = option_color,
 ):
     """Replace all deployed instances by new deployment list."""
+    from nua.lib.panic import warning
+
+    from ..init import initialization
+    from .commands.deploy_remove import deploy_nua_apps
+
     set_verbosity(verbose)
     set_color(colorize)
     initialization()
@@ -156,6 +155,9 @@ def remove_local(
     domain: str = option_domain,
 ):
     """Remove a deployed instance and all its data."""
+    from ..init import initialization
+    from .commands.deploy_remove import remove_nua_domain, remove_nua_label
+
     set_verbosity(verbose)
     set_color(colorize)
     initialization()
@@ -173,6 +175,9 @@ def restore_local(
     colorize: bool = option_color,
 ):
     """Restore last successful deployment."""
+    from ..init import initialization
+    from .commands.restore_deployed import restore_active_state
+
     set_verbosity(verbose)
     set_color(colorize)
     initialization()
@@ -187,6 +192,9 @@ def stop_local(
     domain: str = option_domain,
 ):
     """Stop a deployed instance."""
+    from ..init import initialization
+    from .commands.start_stop import stop_nua_instance
+
     set_verbosity(verbose)
     set_color(colorize)
     initialization()
@@ -206,6 +214,9 @@ def start_local(
     domain: str = option_domain,
 ):
     """Start a deployed instance."""
+    from ..init import initialization
+    from .commands.start_stop import start_nua_instance
+
     set_verbosity(verbose)
     set_color(colorize)
     initialization()
@@ -225,6 +236,9 @@ def restart_local(
     domain: str = option_domain,
 ):
     """Restart a deployed instance."""
+    from ..init import initialization
+    from .commands.start_stop import restart_nua_instance
+
     set_verbosity(verbose)
     set_color(colorize)
     initialization()
@@ -245,6 +259,9 @@ def backup_cmd(
     domain: str = option_domain,
 ):
     """Backup app instance(s) having a backup rules."""
+    from ..init import initialization
+    from .commands.backup_restore import backup_all_apps, backup_one_app
+
     set_verbosity(verbose)
     set_color(colorize)
     initialization()
@@ -266,6 +283,12 @@ def restore_last_backup_cmd(
     last_flag: bool = option_last_backup,
 ):
     """Restore backuped data for the app instance."""
+    from ..init import initialization
+    from .commands.backup_restore import (
+        restore_last_backup,
+        restore_list_backups,
+    )
+
     set_verbosity(verbose)
     set_color(colorize)
     initialization()
@@ -276,10 +299,70 @@ def restore_last_backup_cmd(
     print("WIP: currently a label or domain must be provided.")
 
 
+@app.command("metrics")
+def metrics_cmd(
+    serve: bool = typer.Option(
+        False, "--serve", help="Serve the metrics on HTTP (until interrupted)."
+    ),
+    host: str = typer.Option("", "--host", help="Listening address (with --serve)."),
+    port: int = typer.Option(0, "--port", help="Listening port (with --serve)."),
+    containers: bool = typer.Option(
+        True, "--containers/--no-containers", help="Sample the containers stats."
+    ),
+):
+    """Show orchestrator metrics (Prometheus text format)."""
+    from ..init import initialization
+    from ..metrics import metrics_text, serve_metrics
+
+    initialization()
+    if serve:
+        serve_metrics(host, port)
+    else:
+        print(metrics_text(with_containers=containers), end="")
+
+
+@app.command("gc")
+def gc_cmd(
+    delete: bool = typer.Option(
+        False, "--delete", help="Remove the candidates (default: only report them)."
+    ),
+    keep: int = typer.Option(
+        -1,
+        "--keep",
+        help="Number of versions of each app image to keep (default: setting).",
+        show_default=False,
+    ),
+    images: bool = typer.Option(True, "--images/--no-images", help="Collect images."),
+    volumes: bool = typer.Option(
+        True, "--volumes/--no-volumes", help="Collect volumes."
+    ),
+    json_output: bool = option_json,
+    verbose: int = opt_verbose,
+):
+    """Remove the unused Nua images and volumes (dry run by default)."""
+    from ..garbage_collector import collect, display_report
+    from ..init import initialization
+
+    set_verbosity(verbose)
+    initialization()
+    report = collect(
+        dry_run=not delete,
+        keep_versions=keep if keep >= 0 else None,
+        images=images,
+        volumes=volumes,
+    )
+    if json_output:
+        print(json.dumps(report.as_dict(), ensure_ascii=False, indent=2))
+    else:
+        display_report(report)
+
+
 @app.command("rpc", hidden=True)
 def rpc(method: str, raw: bool = option_raw):
     """RPC call (used by nua-cli)."""
-    initialization()
+    from ..api import API
+
+    # API() initializes the orchestrator:
     api = API()
     args_str = sys.stdin.read()
     if not args_str:
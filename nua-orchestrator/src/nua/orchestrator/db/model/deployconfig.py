@@ -48,7 +48,11 @@ class DeployConfig(Base, SerializerMixin):
             "domain": "test1.example.com",
             ...
           }
-        ]
+        ],
+        "trace": {   # timing of the deployment, see tracing.py
+            "started": 1690000000.0,
+            "root": {"name": "deploy_nua_apps", "start": 0.0, "end": 12.3, ...}
+        }
       }
     """
 
@@ -56,7 +60,7 @@ class DeployConfig(Base, SerializerMixin):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     previous = Column(Integer)
-    state = Column(String(16), default=INACTIVE)
+    state = Column(String(16), default=INACTIVE, index=True)
     created = Column(String(40))
     modified = Column(String(40))
     deployed = Column(JSON)
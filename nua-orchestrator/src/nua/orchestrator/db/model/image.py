@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import JSON, Column, Integer, String
 from sqlalchemy_serializer import SerializerMixin
 
 from .base import Base
@@ -29,3 +29,29 @@ class Image(Base, SerializerMixin):
 
     def __repr__(self) -> str:
         return f"Image(sha={self.id_sha[7:13]}, tag={self.nua_tag}"
+
+
+class CatalogImage(Base, SerializerMixin):
+    """A Docker image known to be present in the local Docker daemon.
+
+    Catalog of the image references used by Nua (provider images like
+    "postgres:15", Nua tags), kept across orchestrator runs.
+        reference: normalized Docker reference: "postgres:15"
+        image_id: docker id of image, "sha256:abc123..."
+        digest: repository digest if any, "sha256:def456..."
+        size: size in bytes
+        labels: labels of the image
+        verified: last check in the Docker daemon, iso format UTC
+    """
+
+    __tablename__ = "image_catalog"
+
+    reference = Column(String(255), primary_key=True)
+    image_id = Column(String(80), index=True)
+    digest = Column(String(80), default="")
+    size = Column(Integer, default=0)
+    labels = Column(JSON)
+    verified = Column(String(40))
+
+    def __repr__(self) -> str:
+        return f"CatalogImage(reference={self.reference}, id={self.image_id[7:19]})"
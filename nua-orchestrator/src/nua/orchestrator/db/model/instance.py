@@ -1,4 +1,4 @@
-from sqlalchemy import JSON, Column, Integer, String
+from sqlalchemy import JSON, Boolean, Column, ForeignKey, Integer, String
 from sqlalchemy_serializer import SerializerMixin
 
 from .base import Base
@@ -19,6 +19,7 @@ class Instance(Base, SerializerMixin):
     - domain: domain serving the app
     - container: name of the deployed contaner if image started (or "")
     - image: name of the docker image (if docker deployed)
+    - image_id: id of the docker image, "sha256:abc123..." (or "")
     - state: one of "running" "stopped"
     - site_config: JSON data representation of actual deployment config
       values, including the instance nginx domain.
@@ -76,13 +77,14 @@ class Instance(Base, SerializerMixin):
     __tablename__ = "instance"
 
     id = Column(Integer, primary_key=True)
-    app_id = Column(String(80))
-    label_id = Column(String(80))
+    app_id = Column(String(80), index=True)
+    label_id = Column(String(80), index=True)
     nua_tag = Column(String(160))
-    domain = Column(String(160))
-    container = Column(String(160), default="")
+    domain = Column(String(160), index=True)
+    container = Column(String(160), default="", index=True)
     image = Column(String(160), default="")
-    state = Column(String(16), default=STOPPED)
+    image_id = Column(String(80), default="", index=True)
+    state = Column(String(16), default=STOPPED, index=True)
     created = Column(String(40))
     site_config = Column(JSON)
     #  broken for sqlite: instance = index_property("data", "instance", default="")
@@ -92,3 +94,52 @@ class Instance(Base, SerializerMixin):
             f"Instance(label_id={self.label_id}, app_id={self.app_id}, "
             f"container='{self.container}', tag={self.nua_tag})"
         )
+
+
+class InstancePort(Base, SerializerMixin):
+    """A host port allocated to a deployed instance.
+
+    Copy of the 'port' entries of Instance.site_config, written with the
+    instance, for indexed queries.
+
+    - instance_id: id of the Instance record (deleted with it)
+    - name: key of the port in the configuration (ex: "web")
+    - host_use: port on the host
+    """
+
+    __tablename__ = "instance_port"
+
+    id = Column(Integer, primary_key=True)
+    instance_id = Column(
+        Integer, ForeignKey("instance.id", ondelete="CASCADE"), index=True
+    )
+    name = Column(String(80), default="")
+    host_use = Column(Integer, index=True)
+
+
+class InstanceVolume(Base, SerializerMixin):
+    """A volume mounted by a deployed instance (the app or one of its providers).
+
+    Copy of the 'volume' entries of Instance.site_config, written with the
+    instance, for indexed queries.
+
+    - instance_id: id of the Instance record (deleted with it)
+    - provider: name of the provider using the volume, "" for the app itself
+    - source: full name of the volume (or local directory)
+    - type: type of the volume ("managed", "directory", "tmpfs"...)
+    - managed, local: properties of the volume (see Volume)
+    - definition: the volume definition (dict)
+    """
+
+    __tablename__ = "instance_volume"
+
+    id = Column(Integer, primary_key=True)
+    instance_id = Column(
+        Integer, ForeignKey("instance.id", ondelete="CASCADE"), index=True
+    )
+    provider = Column(String(80), default="")
+    source = Column(String(255), index=True)
+    type = Column(String(16), default="")
+    managed = Column(Boolean, default=False)
+    local = Column(Boolean, default=False)
+    definition = Column(JSON)
@@ -1,4 +1,4 @@
-from sqlalchemy import JSON, Column, Integer, String
+from sqlalchemy import JSON, Column, Index, Integer, String
 from sqlalchemy_serializer import SerializerMixin
 
 from .base import Base
@@ -35,5 +35,7 @@ class Setting(Base, SerializerMixin):
     data = Column(JSON)
     #  broken for sqlite: instance = index_property("data", "instance", default="")
 
+    __table_args__ = (Index("ix_setting_app_id_instance", "app_id", "instance"),)
+
     def __repr__(self) -> str:
         return f"Setting(app_id={self.app_id}, instance='{self.instance}', tag={self.nua_tag})"
@@ -1,20 +1,160 @@
-from sqlalchemy import create_engine
+"""Sessions of the orchestrator DB.
+
+- Session: read/write transactions,
+- ReadSession: read-only transactions (for SQLite, on connections with
+  "query_only" set, so a read never takes the write lock).
+
+The orchestrator DB is shared by concurrent processes (CLI commands, RPC calls
+from nua-server, backup cron). For SQLite, connections use the WAL journal
+(readers don't block the writer), wait for locks (busy timeout) and are pooled.
+Write functions are wrapped by retry_on_lock(), which retries a transaction
+failing on a transient lock error.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from collections.abc import Callable
+from functools import wraps
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from .. import config
 
-# later maybe add for other than sqlite things like:
-# pool_size= ...
-# pool_recycle= ...
+SQLITE_PRAGMAS = {
+    "synchronous": "normal",
+    # milliseconds:
+    "busy_timeout": 15000,
+    # bytes:
+    "mmap_size": 64 * 1024 * 1024,
+    # negative value: size in KiB
+    "cache_size": -16000,
+}
+JOURNAL_MODE = "wal"
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+LOCK_RETRIES = 6
+# seconds, doubled at each retry:
+LOCK_RETRY_DELAY = 0.05
+# milliseconds:
+CHECKPOINT_TIMEOUT = 1000
+LOCK_ERRORS = ("database is locked", "database is busy", "database table is locked")
 
 Session = scoped_session(sessionmaker())
+ReadSession = scoped_session(sessionmaker())
+_engines: list[Engine] = []
+
+
+def is_file_sqlite(url: str) -> bool:
+    return url.startswith("sqlite:///") and ":memory:" not in url
+
+
+def _set_sqlite_pragmas(engine: Engine, read_only: bool) -> None:
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {key}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        else:
+            # persistent mode of the DB file, may fail if another process
+            # is currently using the DB in another mode:
+            try:
+                cursor.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+            except dbapi_connection.OperationalError:
+                pass
+        cursor.close()
+
+
+def make_engine(url: str, read_only: bool = False) -> Engine:
+    """Return an engine for the DB url, tuned and pooled for SQLite files."""
+    if not is_file_sqlite(url):
+        return create_engine(url)
+    engine = create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000,
+        },
+    )
+    _set_sqlite_pragmas(engine, read_only)
+    return engine
 
 
 def configure_session():
     # print("DB url in Session:", config.nua.db.url)
     Session.remove()
-    engine = create_engine(
-        config.read("nua", "db", "url"),
-        # echo=config.nua.db.echo or False,
-    )
+    ReadSession.remove()
+    while _engines:
+        _engines.pop().dispose()
+    url = config.read("nua", "db", "url")
+    engine = make_engine(url)
+    if is_file_sqlite(url):
+        read_engine = make_engine(url, read_only=True)
+    else:
+        # an in-memory DB is only visible from its own engine
+        read_engine = engine
     Session.configure(bind=engine)
+    ReadSession.configure(bind=read_engine)
+    _engines.extend({engine, read_engine})
+
+
+def checkpoint_wal() -> bool:
+    """Copy the content of the write-ahead log into the SQLite DB file and
+    truncate the log.
+
+    Returns: True if the log is now empty (False if another process is still
+    reading it, or not a SQLite file DB).
+    """
+    url = config.read("nua", "db", "url") or ""
+    if not is_file_sqlite(url):
+        return False
+    with Session.get_bind().connect() as connection:
+        # do not wait for the readers of other processes:
+        connection.exec_driver_sql(f"PRAGMA busy_timeout={CHECKPOINT_TIMEOUT}")
+        try:
+            busy, _, _ = connection.exec_driver_sql(
+                "PRAGMA wal_checkpoint(TRUNCATE)"
+            ).fetchone()
+        except OperationalError:
+            busy = 1
+        finally:
+            connection.exec_driver_sql(
+                f"PRAGMA busy_timeout={SQLITE_PRAGMAS['busy_timeout']}"
+            )
+    return busy == 0
+
+
+def is_lock_error(error: OperationalError) -> bool:
+    message = str(error.orig).lower()
+    return any(text in message for text in LOCK_ERRORS)
+
+
+def retry_on_lock(func: Callable) -> Callable:
+    """Retry the transaction when the DB is locked by another process, with an
+    exponential backoff (and jitter, so concurrent writers don't retry in
+    step)."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = LOCK_RETRY_DELAY
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == LOCK_RETRIES or not is_lock_error(e):
+                    raise
+                Session.remove()
+                time.sleep(delay * (1 + random.random()))
+                delay *= 2
+
+    return wrapper
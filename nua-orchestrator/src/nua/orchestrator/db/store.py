@@ -4,15 +4,23 @@ Requests are full transactions, and mask the actual DB implementation to the
 application.
 """
 
+import json
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
 from copy import deepcopy
 from datetime import datetime, timezone
+from functools import wraps
 from typing import Any
 
 from nua.lib.panic import warning
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import defer
 
 from .. import __version__ as nua_version
 from .. import config
-from ..app_instance import AppInstance
 from ..constants import NUA_ORCH_ID, NUA_ORCHESTRATOR_TAG
 from ..utils import image_size_repr, size_unit
 from ..volume import Volume
@@ -24,25 +32,159 @@ from .model.deployconfig import (
     DEPlOY_VALID_STATUS,
     DeployConfig,
 )
-from .model.image import Image
-from .model.instance import RUNNING, STOPPED, Instance
+from .model.image import CatalogImage, Image
+from .model.instance import (
+    RUNNING,
+    STOPPED,
+    Instance,
+    InstancePort,
+    InstanceVolume,
+)
 from .model.setting import Setting
 from .model.user_count import UserCount
-from .session import Session
+from .session import ReadSession, Session, retry_on_lock
 
 # from pprint import pformat
 
+INSTANCE_COLUMNS = (
+    "id",
+    "app_id",
+    "label_id",
+    "nua_tag",
+    "domain",
+    "container",
+    "image",
+    "image_id",
+    "state",
+    "created",
+    "site_config",
+)
+# Default fields of the listings of instances:
+COMPACT_INSTANCE_FIELDS = (
+    "app_id",
+    "label_id",
+    "nua_tag",
+    "domain",
+    "container",
+    "state",
+    "created",
+    "site_config.domain",
+    "site_config.hostname",
+    "site_config.container_id",
+    "site_config.image_nua_config.metadata.title",
+    "site_config.image_nua_config.metadata.tagline",
+    "site_config.image_nua_config.metadata.tags",
+)
+# "INSERT ... ON CONFLICT DO UPDATE" statements per dialect:
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+class UnitOfWork:
+    """Instance, image and setting writes of an operation, committed together
+    in one transaction (see unit_of_work()).
+
+    For each record (instance label_id, image tag, setting key) only the last
+    written values are kept.
+    """
+
+    def __init__(self):
+        self.instances: dict[str, tuple[dict[str, Any], dict]] = {}
+        self.images: dict[str, dict[str, Any]] = {}
+        self.settings: dict[tuple[str, str], dict[str, Any]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.instances or self.images or self.settings)
+
+    def add_setting(self, setting: dict[str, Any]) -> None:
+        instance = setting["instance"] or (setting["setting_dict"] or {}).get(
+            "instance", ""
+        )
+        self.settings[(setting["app_id"], instance)] = setting
+
+    def commit(self) -> None:
+        if not self:
+            return
+        _commit_unit_of_work(self)
+        self.instances.clear()
+        self.images.clear()
+        self.settings.clear()
+
+
+@retry_on_lock
+def _commit_unit_of_work(work: UnitOfWork) -> None:
+    with Session() as session:
+        for fields in work.images.values():
+            _upsert_image(session, fields)
+        for setting in work.settings.values():
+            _set_app_settings(session, **setting)
+        for fields, site_config in work.instances.values():
+            _upsert_instance(session, fields, site_config)
+        session.commit()
+
+
+_unit_of_work_state = threading.local()
+
+
+def current_unit_of_work() -> UnitOfWork | None:
+    return getattr(_unit_of_work_state, "current", None)
+
+
+@contextmanager
+def unit_of_work() -> Iterator[UnitOfWork]:
+    """Collect the writes of store_instance(), store_image() and
+    set_app_settings() and commit them in one transaction at the end of the
+    block.
+
+    The pending writes are also committed before any read of the store (so
+    reads see them), and when the block fails: the DB must reflect the
+    containers actually started or stopped. Nested blocks share the outer
+    unit of work.
+    """
+    current = current_unit_of_work()
+    if current is not None:
+        yield current
+        return
+    work = UnitOfWork()
+    _unit_of_work_state.current = work
+    try:
+        yield work
+    finally:
+        _unit_of_work_state.current = None
+        work.commit()
+
+
+def flush_unit_of_work() -> None:
+    """Commit the pending writes of the current unit of work."""
+    work = current_unit_of_work()
+    if work:
+        work.commit()
+
+
+def _after_pending_writes(func: Callable) -> Callable:
+    """Commit the pending writes of the unit of work before the decorated
+    read, or write not handled by the unit of work (to keep the order of the
+    writes)."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        flush_unit_of_work()
+        return func(*args, **kwargs)
+
+    return wrapper
+
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
+@_after_pending_writes
 def get_image_by_nua_tag(tag):
     """Find a Nua image in the local DB by Nua id."""
-    with Session() as session:
+    with ReadSession() as session:
         return session.query(Image).filter_by(nua_tag=tag).first()
 
 
+@retry_on_lock
 def store_image(
     id_sha="",
     app_id="",
@@ -57,41 +199,55 @@ def store_image(
 
     Also set the initial settings of the image in the 'setting' table.
     """
-    new_image = Image(
-        id_sha=id_sha,
-        app_id=app_id,
-        nua_tag=nua_tag,
-        created=created,
-        size=size,
-        nua_version=nua_version,
-    )
+    fields = {
+        "id_sha": id_sha,
+        "app_id": app_id,
+        "nua_tag": nua_tag,
+        "created": created,
+        "size": size,
+        "nua_version": nua_version,
+    }
+    setting = {
+        "app_id": app_id,
+        "nua_tag": nua_tag,
+        "instance": instance,
+        "activation": "docker",
+        "setting_dict": deepcopy(data),
+    }
+    work = current_unit_of_work()
+    if work is not None:
+        work.images[nua_tag] = fields
+        work.add_setting(setting)
+        return
     with Session() as session:
-        # Image:
-        # enforce unicity
-        existing = session.query(Image).filter_by(nua_tag=nua_tag).first()
-        if existing:
-            session.delete(existing)
-        existing = session.query(Image).filter_by(id_sha=id_sha).first()
-        if existing:
-            session.delete(existing)
-        session.flush()
-        session.add(new_image)
-        # Setting:
-        _set_app_settings(
-            session,
-            app_id,
-            nua_tag,
-            instance,
-            activation="docker",
-            # active=False,
-            # container="",
-            setting_dict=data,
-        )
+        _upsert_image(session, fields)
+        _set_app_settings(session, **setting)
         session.commit()
 
 
+def _upsert_image(session, fields: dict[str, Any]) -> None:
+    # enforce unicity of both nua_tag and id_sha
+    existing = (
+        session.query(Image)
+        .filter(
+            (Image.nua_tag == fields["nua_tag"]) | (Image.id_sha == fields["id_sha"])
+        )
+        .all()
+    )
+    for image in existing:
+        if image.nua_tag == fields["nua_tag"] and image.id_sha == fields["id_sha"]:
+            for key, value in fields.items():
+                setattr(image, key, value)
+            return
+    for image in existing:
+        session.delete(image)
+    session.flush()
+    session.add(Image(**fields))
+
+
+@_after_pending_writes
 def list_images_raw():
-    with Session() as session:
+    with ReadSession() as session:
         return session.query(Image).all()
 
 
@@ -110,33 +266,93 @@ def list_images():
     return images_list
 
 
+@_after_pending_writes
 def list_available_images():
     """Docker images ready to be mounted by Nua."""
     internals = {"nua-python", "nua-builder"}
-    with Session() as session:
+    with ReadSession() as session:
         images = session.query(Image).all()
         return [i for i in images if i.app_id not in internals]
 
 
+@_after_pending_writes
+@retry_on_lock
 def remove_ids(ids_list):
     with Session() as session:
         session.query(Image).filter(Image.id_sha.in_(ids_list)).delete()
         session.commit()
 
 
-def images_id_per_app_id(app_id):
+@_after_pending_writes
+def catalog_images() -> list[dict[str, Any]]:
+    """Return the records of the image catalog."""
+    with ReadSession() as session:
+        return [image.to_dict() for image in session.query(CatalogImage)]
+
+
+@_after_pending_writes
+def catalog_image(reference: str) -> dict[str, Any]:
+    with ReadSession() as session:
+        image = session.query(CatalogImage).filter_by(reference=reference).first()
+        return image.to_dict() if image else {}
+
+
+@_after_pending_writes
+@retry_on_lock
+def catalog_store_images(records: list[dict[str, Any]]) -> None:
+    """Insert or update records of the image catalog (key: reference).
+
+    A single upsert statement: concurrent writers (image fetch threads, other
+    commands) may store the same references.
+    """
+    if not records:
+        return
     with Session() as session:
+        dialect = session.get_bind().dialect.name
+        if dialect not in UPSERT_INSERTS:
+            for record in records:
+                session.merge(CatalogImage(**record))
+            session.commit()
+            return
+        table = CatalogImage.__table__
+        statement = UPSERT_INSERTS[dialect](table).values(records)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.reference],
+            set_={
+                column.name: statement.excluded[column.name]
+                for column in table.columns
+                if column.name != "reference"
+            },
+        )
+        session.execute(statement)
+        session.commit()
+
+
+@_after_pending_writes
+@retry_on_lock
+def catalog_remove_images(references: list[str]) -> None:
+    with Session() as session:
+        session.query(CatalogImage).filter(
+            CatalogImage.reference.in_(references)
+        ).delete(synchronize_session=False)
+        session.commit()
+
+
+@_after_pending_writes
+def images_id_per_app_id(app_id):
+    with ReadSession() as session:
         images = session.query(Image).filter_by(app_id=app_id).all()
         return [img.id_sha for img in images]
 
 
+@_after_pending_writes
 def installed_nua_settings() -> dict:
     """Return the dictionnary of settings of the nua-orchestrator.
 
     nua-orchestrator is not actually an app, but we use the settings facility to store
     its configuration in the DB with the app_id 'nua- orchestrator' (NUA_ORCH_ID).
     """
-    with Session() as session:
+    with ReadSession() as session:
         setting = (
             session.query(Setting).filter_by(app_id=NUA_ORCH_ID, instance="").first()
         )
@@ -156,9 +372,10 @@ def set_nua_settings(setting_dict):
     set_app_settings(NUA_ORCH_ID, NUA_ORCHESTRATOR_TAG, "", setting_dict)
 
 
+@_after_pending_writes
 def installed_nua_version():
     """Return the version of 'nua-orchestrator' stored in the DB settings."""
-    with Session() as session:
+    with ReadSession() as session:
         setting = (
             session.query(Setting).filter_by(app_id=NUA_ORCH_ID, instance="").first()
         )
@@ -167,8 +384,9 @@ def installed_nua_version():
         return setting.data.get("nua_version", "")
 
 
+@_after_pending_writes
 def list_all_settings() -> list[dict]:
-    with Session() as session:
+    with ReadSession() as session:
         settings = session.query(Setting).all()
         return [s.to_dict() for s in settings]
 
@@ -187,39 +405,54 @@ def _set_app_settings(
     # we cant be sure of situation or backend, let's be rough
     setting_dict = setting_dict or {}
     instance = instance or setting_dict.get("instance", "")
-    session.query(Setting).filter(
-        Setting.app_id == app_id, Setting.instance == instance
-    ).delete()
-    session.flush()
-    new_setting = Setting(
-        app_id=app_id,
-        nua_tag=nua_tag,
-        instance=instance,
-        activation=activation,
-        # active=active,
-        # container=container,
-        data=setting_dict,
+    existing = (
+        session.query(Setting)
+        .filter(Setting.app_id == app_id, Setting.instance == instance)
+        .all()
     )
-    session.add(new_setting)
+    if existing:
+        setting = existing[0]
+        for duplicate in existing[1:]:
+            session.delete(duplicate)
+    else:
+        setting = Setting(app_id=app_id, instance=instance)
+        session.add(setting)
+    setting.nua_tag = nua_tag
+    setting.activation = activation
+    # active=active,
+    # container=container,
+    setting.data = setting_dict
 
 
+@retry_on_lock
 def set_app_settings(app_id, nua_tag, instance, setting_dict):
+    setting = {
+        "app_id": app_id,
+        "nua_tag": nua_tag,
+        "instance": instance,
+        "activation": "docker",
+        "setting_dict": deepcopy(setting_dict),
+    }
+    work = current_unit_of_work()
+    if work is not None:
+        work.add_setting(setting)
+        return
     with Session() as session:
-        _set_app_settings(
-            session, app_id, nua_tag, instance, "docker", setting_dict=setting_dict
-        )
+        _set_app_settings(session, **setting)
         session.commit()
 
 
+@_after_pending_writes
 def stored_user_data(username: str):
     """Return the dictionnary "data" of the user."""
-    with Session() as session:
+    with ReadSession() as session:
         user = session.query(User).filter(User.username == username).first()
         if not user:
             return None
         return deepcopy(user.data)
 
 
+@retry_on_lock
 def store_instance(
     app_id: str = "",
     label_id: str = "",
@@ -230,35 +463,186 @@ def store_instance(
     state: str = STOPPED,
     site_config: dict | None = None,
 ) -> None:
-    """Store a Nua instance in the local DB (table 'instance')."""
-
-    new_instance = Instance(
-        app_id=app_id,
-        label_id=label_id,
-        nua_tag=nua_tag,
-        domain=domain,
-        container=container,
-        image=image,
-        state=state,
-        created=now_iso(),
-        site_config=site_config or {},
+    """Store a Nua instance in the local DB (table 'instance'), and its ports
+    and volumes (tables 'instance_port', 'instance_volume')."""
+    site_config = site_config or {}
+    fields = {
+        "app_id": app_id,
+        "label_id": label_id,
+        "nua_tag": nua_tag,
+        "domain": domain,
+        "container": container,
+        "image": image,
+        "image_id": site_config.get("image_id") or "",
+        "state": state,
+        "created": now_iso(),
+    }
+    work = current_unit_of_work()
+    if work is not None:
+        # the caller may modify the site_config before the commit
+        work.instances[label_id] = (fields, deepcopy(site_config))
+        return
+    with Session() as session:
+        _upsert_instance(session, fields, site_config)
+        session.commit()
+
+
+def _upsert_instance(session, fields: dict[str, Any], site_config: dict) -> None:
+    """Update the instance of same label_id (unique) or add a new instance."""
+    existing = session.query(Instance).filter_by(label_id=fields["label_id"]).all()
+    if existing:
+        instance = existing[0]
+        for duplicate in existing[1:]:
+            _delete_instance_side_rows(session, [duplicate.id])
+            session.delete(duplicate)
+        _delete_instance_side_rows(session, [instance.id])
+    else:
+        instance = Instance()
+        session.add(instance)
+    for key, value in fields.items():
+        setattr(instance, key, value)
+    instance.site_config = site_config
+    session.flush()
+    session.add_all(_instance_side_rows(instance.id, site_config))
+
+
+def _instance_side_rows(instance_id: int, site_config: dict) -> list:
+    """Return the InstancePort and InstanceVolume records of the instance."""
+    rows: list = [
+        InstancePort(instance_id=instance_id, name=name, host_use=port["host_use"])
+        for name, port in (site_config.get("port") or {}).items()
+    ]
+    users = [("", site_config)]
+    users.extend(
+        (provider.get("provider_name") or "", provider)
+        for provider in site_config.get("providers") or []
+    )
+    for provider_name, config_dict in users:
+        for definition in config_dict.get("volume") or []:
+            volume = Volume.parse(definition)
+            rows.append(
+                InstanceVolume(
+                    instance_id=instance_id,
+                    provider=provider_name,
+                    source=volume.full_name,
+                    type=volume.type,
+                    managed=volume.is_managed,
+                    local=volume.is_local,
+                    definition=volume.as_dict(),
+                )
+            )
+    return rows
+
+
+def _delete_instances(session, query) -> None:
+    instance_ids = [instance_id for (instance_id,) in query.with_entities(Instance.id)]
+    if not instance_ids:
+        return
+    _delete_instance_side_rows(session, instance_ids)
+    session.query(Instance).filter(Instance.id.in_(instance_ids)).delete(
+        synchronize_session=False
     )
+
+
+def _delete_instance_side_rows(session, instance_ids: list[int]) -> None:
+    """Delete the ports and volumes of the instances (also done by the DB
+    cascade when foreign keys are enforced)."""
+    for model in (InstancePort, InstanceVolume):
+        session.query(model).filter(model.instance_id.in_(instance_ids)).delete(
+            synchronize_session=False
+        )
+
+
+@_after_pending_writes
+@retry_on_lock
+def rebuild_instance_side_tables() -> int:
+    """Fill the ports and volumes tables from the site_config of all the
+    instances (migration of a DB created before these tables).
+
+    Return the number of instances.
+    """
     with Session() as session:
-        # Image:
-        # enforce unicity
-        existing = session.query(Instance).filter_by(label_id=label_id).first()
-        if existing:
-            session.delete(existing)
-        session.flush()
-        session.add(new_instance)
+        session.query(InstancePort).delete()
+        session.query(InstanceVolume).delete()
+        instances = session.query(Instance).all()
+        for instance in instances:
+            site_config = instance.site_config or {}
+            instance.image_id = site_config.get("image_id") or ""
+            session.add_all(_instance_side_rows(instance.id, site_config))
         session.commit()
+        return len(instances)
 
 
+@_after_pending_writes
 def list_instances_all() -> list[Instance]:
-    with Session() as session:
+    with ReadSession() as session:
         return session.query(Instance).all()
 
 
+def _instance_field_column(field: str):
+    """Return the column (or JSON path of site_config) of a projected field."""
+    name, _, path = field.partition(".")
+    if name not in INSTANCE_COLUMNS:
+        raise ValueError(f"Unknown instance field '{field}'")
+    column = getattr(Instance, name)
+    if name == "site_config" and path:
+        # extracted by the DB, without loading the whole JSON document:
+        return column[tuple(path.split("."))]
+    return column
+
+
+def _set_nested(record: dict, field: str, value: Any) -> None:
+    *parents, key = field.split(".")
+    for parent in parents:
+        record = record.setdefault(parent, {})
+    record[key] = value
+
+
+@_after_pending_writes
+def list_instances_fields(
+    fields: list[str] | tuple[str, ...] = COMPACT_INSTANCE_FIELDS,
+    app_id: str = "",
+    label_id: str = "",
+    state: str = "",
+    offset: int = 0,
+    limit: int = 0,
+) -> list[dict[str, Any]]:
+    """Return the requested fields of the instances, with optional filters
+    and pagination.
+
+    Fields are column names or dotted paths inside 'site_config' (like
+    "site_config.image_nua_config.metadata.title"), the records keep the
+    nesting of the full instance dict. Paths missing from 'site_config' are
+    omitted.
+    """
+    columns = [_instance_field_column(field) for field in fields]
+    with ReadSession() as session:
+        query = session.query(*columns)
+        if app_id:
+            query = query.filter(Instance.app_id == app_id)
+        if label_id:
+            query = query.filter(Instance.label_id == label_id)
+        if state:
+            query = query.filter(Instance.state == state)
+        query = query.order_by(Instance.id)
+        if offset:
+            query = query.offset(offset)
+        if limit:
+            query = query.limit(limit)
+        rows = query.all()
+    result = []
+    for row in rows:
+        record: dict[str, Any] = {}
+        for field, value in zip(fields, row):
+            if value is None and field.startswith("site_config."):
+                # path missing from the JSON document: no key, as in site_config
+                record.setdefault("site_config", {})
+                continue
+            _set_nested(record, field, value)
+        result.append(record)
+    return result
+
+
 def list_instances_all_short() -> list[str]:
     result: list[str] = []
     for instance in list_instances_all():
@@ -286,6 +670,19 @@ def list_instances_container_running():
     return [inst.container for inst in list_instances_all() if inst.state == RUNNING]
 
 
+def _active_volumes(session, *filters) -> list[tuple[dict, str]]:
+    """Return the (definition, domain) of the volumes of the active instances,
+    in the order of the instances."""
+    return (
+        session.query(InstanceVolume.definition, Instance.domain)
+        .join(Instance, InstanceVolume.instance_id == Instance.id)
+        .filter(Instance.state.in_((RUNNING, STOPPED)), *filters)
+        .order_by(Instance.id, InstanceVolume.id)
+        .all()
+    )
+
+
+@_after_pending_writes
 def list_instances_container_local_active_volumes() -> list[Volume]:
     """Return list of local mounted volumes.
 
@@ -294,19 +691,21 @@ def list_instances_container_local_active_volumes() -> list[Volume]:
     - locally mounted ('docker' driver), 'managed' type)
     - unique per 'source' key.
     """
+    with ReadSession() as session:
+        rows = _active_volumes(
+            session,
+            InstanceVolume.provider == "",
+            InstanceVolume.managed.is_(True),
+            InstanceVolume.local.is_(True),
+        )
     volumes_dict = {}
-    for instance in list_instances_all_active():
-        # for volume in volumes_merge_config(instance.site_config):
-        app = AppInstance(instance.site_config)
-
-        # for volume in site.rebased_volumes_upon_nua_conf():
-        for volume_definition in app.volumes:
-            volume = Volume.parse(volume_definition)
-            if volume.is_managed and volume.is_local:
-                volumes_dict[volume.full_name] = volume
+    for definition, _domain in rows:
+        volume = Volume.parse(definition)
+        volumes_dict[volume.full_name] = volume
     return list(volumes_dict.values())
 
 
+@_after_pending_writes
 def list_instances_container_active_volumes() -> list[Volume]:
     """Return list of mounted volumes or mounted local directories.
 
@@ -314,51 +713,37 @@ def list_instances_container_active_volumes() -> list[Volume]:
     - required by active instances,
     - unique per 'full_name' key.
     """
+    with ReadSession() as session:
+        rows = _active_volumes(session, InstanceVolume.type != "tmpfs")
     volumes_dict = {}
-    containers_dict = {}
-    for instance in list_instances_all_active():
-        # for volume in volumes_merge_config(instance.site_config):
-        app = AppInstance.from_dict(instance.site_config)
-        for volume_definition in app.volumes:
-            volume = Volume.parse(volume_definition)
-            if volume.type == "tmpfs":
-                continue
-            source = volume.full_name
-            volumes_dict[source] = volume
-            domains = containers_dict.get(source, [])
-            domains.append(instance.domain)
-            containers_dict[source] = domains
-        for provider in app.providers:
-            for volume_definition in provider.volumes:
-                volume = Volume.parse(volume_definition)
-                if volume.type == "tmpfs":
-                    continue
-                source = volume.full_name
-                volumes_dict[source] = volume
-                domains = containers_dict.get(source, [])
-                domains.append(instance.domain)
-                containers_dict[source] = domains
-
+    containers_dict: dict[str, list[str]] = {}
+    for definition, domain in rows:
+        volume = Volume.parse(definition)
+        source = volume.full_name
+        volumes_dict[source] = volume
+        containers_dict.setdefault(source, []).append(domain)
     for source, volume in volumes_dict.items():
         volume.domains = containers_dict[source]
     return list(volumes_dict.values())
 
 
+@_after_pending_writes
 def ports_instances_domains() -> dict[int, str]:
     """Return dict(port:domain) configured in instance, wether the instance is running
     or not."""
-    used_domain_ports = {}
-    for inst in list_instances_all():
-        site_config = inst.site_config
-        ports = site_config.get("port")  # a dict or None
-        if ports:
-            for port in ports.values():
-                used_domain_ports[port["host_use"]] = site_config["domain"]
-    return used_domain_ports
+    with ReadSession() as session:
+        rows = (
+            session.query(InstancePort.host_use, Instance.domain)
+            .join(Instance, InstancePort.instance_id == Instance.id)
+            .order_by(Instance.id, InstancePort.id)
+            .all()
+        )
+    return dict(rows)
 
 
+@_after_pending_writes
 def instance_container(domain: str) -> str:
-    with Session() as session:
+    with ReadSession() as session:
         existing = session.query(Instance).filter_by(domain=domain).first()
         if existing:
             container = existing.container
@@ -367,27 +752,39 @@ def instance_container(domain: str) -> str:
         return container
 
 
+@_after_pending_writes
+@retry_on_lock
 def instance_delete_by_domain(domain: str):
     with Session() as session:
-        session.query(Instance).filter_by(domain=domain).delete()
+        _delete_instances(session, session.query(Instance).filter_by(domain=domain))
         session.commit()
 
 
+@_after_pending_writes
+@retry_on_lock
 def instance_delete_by_container(container: str):
     with Session() as session:
-        session.query(Instance).filter_by(container=container).delete()
+        _delete_instances(
+            session, session.query(Instance).filter_by(container=container)
+        )
         session.commit()
 
 
+@_after_pending_writes
+@retry_on_lock
 def instance_delete_by_label(label_id: str):
     with Session() as session:
-        session.query(Instance).filter_by(label_id=label_id).delete()
+        _delete_instances(session, session.query(Instance).filter_by(label_id=label_id))
         session.commit()
 
 
+@_after_pending_writes
+@retry_on_lock
 def instance_delete_no_in_labels(labels: list[str]):
     with Session() as session:
-        session.query(Instance).filter(Instance.label_id.not_in(labels)).delete()
+        _delete_instances(
+            session, session.query(Instance).filter(Instance.label_id.not_in(labels))
+        )
         session.commit()
 
 
@@ -402,12 +799,13 @@ def _fetch_instance_port_site(site_config: dict) -> int | None:
     return None
 
 
+@_after_pending_writes
 def instance_port(domain: str) -> int | None:
     """Return the (main?) instance port. Dubious.
 
     remarq: currently this function is unused
     """
-    with Session() as session:
+    with ReadSession() as session:
         existing = session.query(Instance).filter_by(domain=domain).first()
         if existing:
             site_config = existing.site_config
@@ -419,6 +817,8 @@ def instance_port(domain: str) -> int | None:
         return port
 
 
+@_after_pending_writes
+@retry_on_lock
 def set_instance_container_state(domain: str, state: str):
     with Session() as session:
         existing = session.query(Instance).filter_by(domain=domain).first()
@@ -427,10 +827,11 @@ def set_instance_container_state(domain: str, state: str):
             session.commit()
 
 
+@_after_pending_writes
 def instance_persistent(label_id: str) -> dict:
     """Return the persistent dictionary if (or an empty dict if not found)."""
     persistent = {}
-    with Session() as session:
+    with ReadSession() as session:
         existing = (
             session.query(Instance)
             .filter_by(
@@ -444,6 +845,25 @@ def instance_persistent(label_id: str) -> dict:
     return persistent
 
 
+@_after_pending_writes
+def instances_persistent(label_ids: list[str]) -> dict[str, dict]:
+    """Return the persistent dictionaries of the instances, per label_id, in one
+    query extracting only the 'persistent' part of site_config."""
+    if not label_ids:
+        return {}
+    persistent_column = _instance_field_column("site_config.persistent")
+    with ReadSession() as session:
+        rows = (
+            session.query(Instance.label_id, persistent_column)
+            .filter(Instance.label_id.in_(label_ids))
+            .all()
+        )
+    result = {label_id: {} for label_id in label_ids}
+    for label_id, persistent in rows:
+        result[label_id] = persistent or {}
+    return result
+
+
 def valid_deploy_config_state(state: str) -> str:
     if state in DEPlOY_VALID_STATUS:
         return state
@@ -451,6 +871,8 @@ def valid_deploy_config_state(state: str) -> str:
     return INACTIVE
 
 
+@_after_pending_writes
+@retry_on_lock
 def deploy_config_add_config(
     deploy_config: dict[str, Any],
     previous_id: int,
@@ -476,6 +898,8 @@ def deploy_config_add_config(
         return record.to_dict()
 
 
+@_after_pending_writes
+@retry_on_lock
 def deploy_config_update_state(record_id: int, new_state: str):
     state = valid_deploy_config_state(new_state)
     now = now_iso()
@@ -487,74 +911,250 @@ def deploy_config_update_state(record_id: int, new_state: str):
             session.commit()
 
 
-def deploy_config_last_status(status: str, limit: int = 2) -> list:
+@_after_pending_writes
+@retry_on_lock
+def deploy_config_set_trace(record_id: int, trace: dict[str, Any]):
+    """Attach the timing trace of the deployment to the record."""
+    with Session() as session:
+        existing = session.query(DeployConfig).filter_by(id=record_id).first()
+        if existing:
+            deployed = dict(existing.deployed or {})
+            deployed["trace"] = trace
+            existing.deployed = deployed
+            session.commit()
+
+
+def deploy_config_last_status(
+    status: str, limit: int = 2, with_deployed: bool = True
+) -> list:
     """Retrieve the config with "active" state.
 
     It should be only one.
+
+    If not 'with_deployed', the records don't contain the (large) 'deployed'
+    content, see deploy_config_apps().
     """
     if status and status in DEPlOY_VALID_STATUS:
-        return _deploy_config_last_status(status, limit)
+        return _deploy_config_last_status(status, limit, with_deployed)
     else:
-        return _deploy_config_last_any(limit)
+        return _deploy_config_last_any(limit, with_deployed)
 
 
-def _deploy_config_last_status(status: str, limit: int) -> list:
-    with Session() as session:
+def _deploy_config_query(session, with_deployed: bool):
+    query = session.query(DeployConfig)
+    if not with_deployed:
+        query = query.options(defer(DeployConfig.deployed))
+    return query
+
+
+def _deploy_config_dicts(records, with_deployed: bool) -> list[dict[str, Any]]:
+    if with_deployed:
+        return [rec.to_dict() for rec in records]
+    return [rec.to_dict(rules=("-deployed",)) for rec in records]
+
+
+@_after_pending_writes
+def _deploy_config_last_status(
+    status: str, limit: int, with_deployed: bool = True
+) -> list:
+    with ReadSession() as session:
         records = (
-            session.query(DeployConfig)
+            _deploy_config_query(session, with_deployed)
             .filter_by(state=status)
             .order_by(DeployConfig.id.desc())
             .limit(limit)
         )
-        if records:
-            return [rec.to_dict() for rec in records]
-        return []
+        return _deploy_config_dicts(records, with_deployed)
 
 
-def _deploy_config_last_any(limit: int) -> list:
-    with Session() as session:
+@_after_pending_writes
+def _deploy_config_last_any(limit: int, with_deployed: bool = True) -> list:
+    with ReadSession() as session:
         records = (
-            session.query(DeployConfig).order_by(DeployConfig.id.desc()).limit(limit)
+            _deploy_config_query(session, with_deployed)
+            .order_by(DeployConfig.id.desc())
+            .limit(limit)
         )
-        if records:
-            return [rec.to_dict() for rec in records]
-        return []
+        return _deploy_config_dicts(records, with_deployed)
 
 
-def deploy_config_active() -> dict[str, Any]:
+def deploy_config_active(with_deployed: bool = True) -> dict[str, Any]:
     """Retrieve the config with "active" state.
 
     It should be only one.
     """
-    items = deploy_config_last_status(ACTIVE, 1)
+    items = deploy_config_last_status(ACTIVE, 1, with_deployed)
     if items:
         return items[0]
     return {}
 
 
+@_after_pending_writes
 def deploy_config_per_id(idt: int) -> dict[str, Any]:
     """Retrieve the config with Id "idt"."""
-    with Session() as session:
+    with ReadSession() as session:
         record = session.query(DeployConfig).filter_by(id=idt).first()
         if record:
             return record.to_dict()
         return {}
 
 
-def deploy_config_previous() -> dict:
+@_after_pending_writes
+def deploy_config_requested(idt: int) -> dict[str, Any]:
+    """Return the requested configuration of the deployment "idt"."""
+    with ReadSession() as session:
+        requested = (
+            session.query(DeployConfig.deployed["requested"])
+            .filter(DeployConfig.id == idt)
+            .scalar()
+        )
+    return requested or {}
+
+
+@_after_pending_writes
+def deploy_config_apps(
+    idt: int,
+    label_ids: Iterable[str] | None = None,
+    app_id: str = "",
+    running_status: str = "",
+    offset: int = 0,
+    limit: int = 0,
+) -> list[dict[str, Any]]:
+    """Return the apps of the deployment "idt" matching the filters (and the
+    requested page).
+
+    With SQLite, the apps are selected by the DB (JSON functions): only the
+    selected apps are parsed, not the whole record.
+    """
+    label_ids = list(label_ids) if label_ids is not None else None
+    with ReadSession() as session:
+        if session.get_bind().dialect.name != "sqlite":
+            record = session.query(DeployConfig).filter_by(id=idt).first()
+            apps = ((record and record.deployed) or {}).get("apps") or []
+            return _filtered_apps(
+                apps, label_ids, app_id, running_status, offset, limit
+            )
+        conditions = ["deployconfig.id = :idt"]
+        params: dict[str, Any] = {"idt": idt}
+        if label_ids is not None:
+            conditions.append("json_extract(apps.value, '$.label_id') IN :label_ids")
+            params["label_ids"] = label_ids
+        if app_id:
+            conditions.append(
+                "json_extract(apps.value, '$.image_nua_config.metadata.id') = :app_id"
+            )
+            params["app_id"] = app_id
+        if running_status:
+            conditions.append(
+                "coalesce(json_extract(apps.value, '$.running_status'), "
+                f"'{STOPPED}') = :running_status"
+            )
+            params["running_status"] = running_status
+        query = (
+            "SELECT apps.value FROM deployconfig, "
+            "json_each(deployconfig.deployed, '$.apps') AS apps "
+            f"WHERE {' AND '.join(conditions)} ORDER BY apps.key"
+        )
+        if limit or offset:
+            query += " LIMIT :limit OFFSET :offset"
+            params.update(limit=limit or -1, offset=offset)
+        statement = text(query)
+        if label_ids is not None:
+            statement = statement.bindparams(bindparam("label_ids", expanding=True))
+        rows = session.execute(statement, params).scalars().all()
+    return [json.loads(row) for row in rows]
+
+
+def _filtered_apps(
+    apps: list[dict[str, Any]],
+    label_ids: list[str] | None,
+    app_id: str,
+    running_status: str,
+    offset: int,
+    limit: int,
+) -> list[dict[str, Any]]:
+    selected = [
+        app
+        for app in apps
+        if (label_ids is None or app.get("label_id") in label_ids)
+        and (
+            not app_id
+            or ((app.get("image_nua_config") or {}).get("metadata") or {}).get("id")
+            == app_id
+        )
+        and (not running_status or app.get("running_status", STOPPED) == running_status)
+    ]
+    end = offset + limit if limit else None
+    return selected[offset:end]
+
+
+@_after_pending_writes
+def deploy_config_history_references() -> tuple[set[str], list[dict[str, Any]]]:
+    """Return the provider images and the volume definitions referenced by
+    all the deployment records (the journal history).
+
+    With SQLite, the values are extracted by the DB (JSON functions).
+    """
+    with ReadSession() as session:
+        if session.get_bind().dialect.name != "sqlite":
+            return _history_references(
+                record.deployed or {}
+                for record in session.query(DeployConfig.deployed).yield_per(10)
+            )
+        images = session.execute(
+            text(
+                "SELECT DISTINCT json_extract(providers.value, '$.image') "
+                "FROM deployconfig, "
+                "json_each(deployconfig.deployed, '$.apps') AS apps, "
+                "json_each(apps.value, '$.providers') AS providers"
+            )
+        ).scalars()
+        images_set = {image for image in images if image}
+        volumes = session.execute(
+            text(
+                "SELECT volumes.value FROM deployconfig, "
+                "json_each(deployconfig.deployed, '$.apps') AS apps, "
+                "json_each(apps.value, '$.volume') AS volumes "
+                "UNION "
+                "SELECT volumes.value FROM deployconfig, "
+                "json_each(deployconfig.deployed, '$.apps') AS apps, "
+                "json_each(apps.value, '$.providers') AS providers, "
+                "json_each(providers.value, '$.volume') AS volumes"
+            )
+        ).scalars()
+        volumes_list = [json.loads(volume) for volume in volumes]
+    return images_set, volumes_list
+
+
+def _history_references(
+    deployed_list: Iterable[dict[str, Any]],
+) -> tuple[set[str], list[dict[str, Any]]]:
+    images: set[str] = set()
+    volumes: dict[str, dict[str, Any]] = {}
+    for deployed in deployed_list:
+        for app in deployed.get("apps") or []:
+            providers = app.get("providers") or []
+            images.update(pro["image"] for pro in providers if pro.get("image"))
+            for site in [app, *providers]:
+                for volume in site.get("volume") or []:
+                    volumes[json.dumps(volume, sort_keys=True)] = volume
+    return images, list(volumes.values())
+
+
+def deploy_config_previous(with_deployed: bool = True) -> dict:
     """Retrieve the config with "previous" state.
 
     It should be zero, or sometimes only one.
     """
-    items = deploy_config_last_status(PREVIOUS, 1)
+    items = deploy_config_last_status(PREVIOUS, 1, with_deployed)
     if items:
         return items[0]
     return {}
 
 
-def deploy_config_last_inactive() -> dict:
+def deploy_config_last_inactive(with_deployed: bool = True) -> dict:
     """Retrieve the last config with "inactive" state."""
-    items = deploy_config_last_status(INACTIVE, 1)
+    items = deploy_config_last_status(INACTIVE, 1, with_deployed)
     if items:
         return items[0]
     return {}
@@ -568,6 +1168,8 @@ def deploy_config_last_one() -> dict:
     return {}
 
 
+@_after_pending_writes
+@retry_on_lock
 def new_user_number() -> int:
     """Return incremented value of UserCount."""
     with Session() as session:
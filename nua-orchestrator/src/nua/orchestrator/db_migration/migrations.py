@@ -1,10 +1,61 @@
-"""Minimal migration framework until better implementation."""
+"""Minimal migration framework until better implementation.
 
-# from packaging.version import Version
+Migrations are applied in order at startup (see nua_db_setup), each one checks
+if it is needed: a migration is a no-op on a DB created by the current models
+(create_base() creates the missing tables and their indexes, but does not
+modify existing tables).
+"""
+
+from collections.abc import Callable
 
-# from .. import config
-# from .tools import column_exists, execute_cmd
+from nua.lib.console import print_green
+from sqlalchemy import create_engine
+
+from .. import config
+from ..db import store
+from ..db.model.deployconfig import DeployConfig
+from ..db.model.image import CatalogImage
+from ..db.model.instance import Instance
+from ..db.model.setting import Setting
+from .tools import column_exists, execute_cmd, index_exists
+
+# from packaging.version import Version
 
 
 def to_version_0_5_8():
     pass
+
+
+def to_version_0_5_47():
+    """Indexes of the instance, setting and deployconfig tables, image_id
+    column of instance, and tables of the ports and volumes of instances."""
+    if index_exists("instance", "ix_instance_label_id"):
+        return
+    print_green("Migration: adding indexes and instance ports/volumes tables")
+    if not column_exists("instance", "image_id"):
+        execute_cmd("ALTER TABLE instance ADD COLUMN image_id VARCHAR(80) DEFAULT ''")
+    engine = create_engine(config.read("nua", "db", "url"))
+    for model in (Instance, Setting, DeployConfig):
+        for index in model.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+    store.rebuild_instance_side_tables()
+
+
+def to_version_0_5_48():
+    """Table of the catalog of the local Docker images."""
+    engine = create_engine(config.read("nua", "db", "url"))
+    CatalogImage.__table__.create(bind=engine, checkfirst=True)
+
+
+MIGRATIONS: list[Callable] = [
+    to_version_0_5_8,
+    to_version_0_5_47,
+    to_version_0_5_48,
+]
+# changed when a migration is added (part of the key of the settings snapshot)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def apply_migrations():
+    for migration in MIGRATIONS:
+        migration()
@@ -23,3 +23,10 @@ def execute_cmd(cmd: str):
     """
     engine = create_engine(config.read("nua", "db", "url"))
     engine.execute(cmd)
+
+
+def index_exists(table_name: str, index_name: str) -> bool:
+    engine = create_engine(config.read("nua", "db", "url"))
+    insp = inspect(engine)
+    indexes = insp.get_indexes(table_name)
+    return any(index["name"] == index_name for index in indexes)
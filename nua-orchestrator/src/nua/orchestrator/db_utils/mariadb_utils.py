@@ -42,13 +42,15 @@ def mariadb_pwd() -> str:
     For orchestrator context, assuming this function can only be used *after* password
     was generated (or its another bug).
 
-    Rem.: No cache. Rarely used function and pwd can be changed.
+    Rem.: The value is cached by internal_secrets, and reloaded when the file
+    changes.
     """
-    pwd = os.environ.get("NUA_MARIADB_PASSWORD")
-    if pwd:
-        return pwd
-    file_path = Path(os.path.expanduser("~nua")) / NUA_MARIADB_PWD_FILE
-    return file_path.read_text(encoding="utf8").strip()
+    from ..internal_secrets import read_secret
+
+    pwd = read_secret("MARIADB_ROOT_PASSWORD")
+    if pwd is None:
+        raise FileNotFoundError(Path(os.path.expanduser("~nua")) / NUA_MARIADB_PWD_FILE)
+    return pwd
 
 
 def set_random_mariadb_pwd() -> bool:
@@ -61,10 +63,13 @@ def _store_mariadb_password(password: str):
 
     Expect to be run either by root or nua.
     """
+    from ..internal_secrets import invalidate_secret
+
     file_path = Path(os.path.expanduser("~nua")) / NUA_MARIADB_PWD_FILE
     file_path.write_text(f"{password}\n", encoding="utf8")
     chown_r(file_path, "nua")
     os.chmod(file_path, 0o600)  # noqa: S103
+    invalidate_secret()
 
 
 def set_mariadb_pwd(password: str, any_ip=True) -> bool:
@@ -33,14 +33,14 @@ def postgres_pwd() -> str:
     For orchestrator context, assuming this function can only be used *after* password
     was generated (or its another bug).
 
-    Rem.: No cache. Rarely used function and password can be changed.
+    Rem.: The value is cached by internal_secrets, and reloaded when the file
+    changes.
     """
-    password = os.environ.get("NUA_POSTGRES_PASSWORD")
-    if password:
-        return password
-    file_path = Path("~nua").expanduser() / NUA_PG_PWD_FILE
-    with open(file_path, encoding="utf8") as rfile:
-        password = rfile.read().strip()
+    from ..internal_secrets import read_secret
+
+    password = read_secret("POSTGRES_PASSWORD")
+    if password is None:
+        raise FileNotFoundError(Path("~nua").expanduser() / NUA_PG_PWD_FILE)
     return password
 
 
@@ -54,10 +54,13 @@ def _store_pg_password(password: str):
 
     Expect to be run either by root or nua.
     """
+    from ..internal_secrets import invalidate_secret
+
     file_path = Path("~nua").expanduser() / NUA_PG_PWD_FILE
     with open(file_path, "w", encoding="utf8") as wfile:
         wfile.write(f"{password}\n")
     chown_r(file_path, "nua")
+    invalidate_secret("POSTGRES_PASSWORD")
     os.chmod(file_path, 0o600)  # noqa: S103
 
 
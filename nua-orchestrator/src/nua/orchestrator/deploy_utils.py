@@ -1,6 +1,8 @@
 """Class to manage the deployment of a group of AppInstance."""
 
-from collections.abc import Callable
+import json
+import tarfile
+from collections.abc import Callable, Iterable
 from copy import deepcopy
 from pathlib import Path
 from pprint import pformat
@@ -8,15 +10,23 @@ from typing import Any
 
 import docker
 import docker.types
+from docker.errors import APIError, ImageNotFound
 from docker.models.containers import Container
+from docker.models.images import Image
 from nua.lib.archive_search import ArchiveSearch
-from nua.lib.docker import display_one_docker_img, docker_require
+from nua.lib.docker import display_one_docker_img
 from nua.lib.panic import Abort, important, info, show, vprint, warning
 from nua.lib.tool.state import verbosity
 
 from .app_instance import AppInstance
 from .db import store
+from .docker_registry import (
+    is_registry_reference,
+    pull_registry_image,
+    registry_image_nua_config,
+)
 from .docker_utils import (  # docker_volume_prune,
+    docker_client,
     docker_exec_commands,
     docker_host_gateway_ip,
     docker_network_create_bridge,
@@ -35,9 +45,13 @@ from .docker_utils import (  # docker_volume_prune,
     docker_volume_type,
     docker_wait_for_status,
 )
+from .image_catalog import record_image, require_image
+from .image_fetch import fetch_images
 from .internal_secrets import secrets_dict
+from .metrics import observe, timed
 from .net_utils.ports import check_port_available
 from .provider import Provider
+from .tracing import span
 from .utils import size_to_bytes
 from .volume import Volume
 
@@ -45,10 +59,49 @@ PULLED_IMAGES: dict[str, str] = {}
 
 
 def load_install_image(image_path: str | Path) -> tuple:
-    """Install docker image (tar file) in local docker daemon.
+    """Install docker image (tar file or image of a registry) in local docker
+    daemon.
 
     Return: tuple(image_id, image_nua_config)
     """
+    image, image_nua_config, _status = install_image(image_path)
+    record_image(image)
+    display_installed_image(image, image_nua_config)
+    return image.id, image_nua_config
+
+
+def install_app_images(image_paths: Iterable[str]) -> dict[str, tuple]:
+    """Install the distinct images in local docker daemon, in parallel.
+
+    Return: dict of image path: tuple(image_id, image_nua_config)
+    """
+
+    def on_done(_path: str, result: tuple[Image, dict, str]) -> str:
+        image, image_nua_config, status = result
+        record_image(image)
+        display_installed_image(image, image_nua_config)
+        return status
+
+    installed = fetch_images(image_paths, install_image, "App", on_done)
+    return {path: (image.id, conf) for path, (image, conf, _st) in installed.items()}
+
+
+def display_installed_image(image: Image, image_nua_config: dict) -> None:
+    metadata = image_nua_config["metadata"]
+    with verbosity(0):
+        important("Installing App: {id} {version}, {title}".format(**metadata))
+        important("Installing image:")
+        display_one_docker_img(image)
+
+
+def install_image(image_path: str | Path) -> tuple[Image, dict, str]:
+    """Install docker image (tar file or image of a registry) in local docker
+    daemon, without display (may run in a worker thread).
+
+    Return: tuple(image, image_nua_config, status)
+    """
+    if is_registry_reference(image_path):
+        return pull_install_image(str(image_path))
     path = Path(image_path)
     # image is local, so we can mount it directly
     if not path.is_file():
@@ -63,23 +116,61 @@ def load_install_image(image_path: str | Path) -> tuple:
         )
 
     metadata = image_nua_config["metadata"]
-    msg = "Installing App: {id} {version}, {title}".format(**metadata)
-    if verbosity(0):
-        important(msg)
-
-    client = docker.from_env()
-    # images_before = {img.id for img in client.images.list()}
-    with open(path, "rb") as input:  # noqa: S108
+    client = docker_client()
+    image_id = tar_image_id(path)
+    if image_id:
+        try:
+            # same image id: same content, no need to load the archive
+            return client.images.get(image_id), image_nua_config, "present"
+        except (ImageNotFound, APIError):
+            pass
+    with (
+        span("load_install_image", app_id=metadata["id"]),
+        timed("nua_image_load_seconds", app_id=metadata["id"]),
+        open(path, "rb") as input,
+    ):
         loaded = client.images.load(input)
+    observe("nua_image_load_bytes", path.stat().st_size, app_id=metadata["id"])
     if not loaded or len(loaded) > 1:
         warning("loaded image result is strange:", f"{loaded=}")
-    loaded_img = loaded[0]
-    # images_after = {img.id for img in client.images.list()}
-    # new = images_after - images_before
-    with verbosity(0):
-        important("Installing image:")
-        display_one_docker_img(loaded_img)
-    return loaded_img.id, image_nua_config
+    return loaded[0], image_nua_config, "loaded"
+
+
+def tar_image_id(path: Path) -> str:
+    """Return the id of the image of a 'docker save' archive (digest of its
+    config), or "" if not found."""
+    try:
+        with tarfile.open(path) as archive:
+            member = archive.extractfile("manifest.json")
+            if member is None:
+                return ""
+            manifest = json.load(member)
+    except (OSError, KeyError, ValueError, tarfile.TarError):
+        return ""
+    if not manifest or not isinstance(manifest, list):
+        return ""
+    # "<hex>.json" (legacy format) or "blobs/sha256/<hex>" (OCI layout)
+    config_name = Path(manifest[0].get("Config") or "").name
+    digest = config_name.removesuffix(".json")
+    if len(digest) != 64:
+        return ""
+    return f"sha256:{digest}"
+
+
+def pull_install_image(image_url: str) -> tuple[Image, dict, str]:
+    """Install docker image from a Docker registry in local docker daemon.
+
+    Return: tuple(image, image_nua_config, status)
+    """
+    with span("pull_install_image", image=image_url):
+        image, status = pull_registry_image(image_url)
+    image_nua_config = registry_image_nua_config(image)
+    if not image_nua_config:
+        raise Abort(
+            f"image non compatible Nua: {image_url}.",
+            explanation="No Nua config found",
+        )
+    return image, image_nua_config, status
 
 
 def port_allocator(start_ports: int, end_ports: int, allocated_ports: set) -> Callable:
@@ -206,7 +297,7 @@ def exec_post_run(
     with verbosity(1):
         show("Executing the post-run commands")
     commands = post_run_expanded(rsite)
-    docker_exec_commands(container, commands)
+    docker_exec_commands(container, commands, parallel=rsite.post_run_parallel)
 
 
 def post_run_expanded(rsite: Provider) -> list[str]:
@@ -399,37 +490,45 @@ def pull_provider_container(provider: Provider) -> bool:
 
     Currrently: only managing Docker bridge network.
     """
-    # print("======================================")
-    # print(pformat(provider))
-    # print("======================================")
+    return pull_providers_containers([provider])
+
+
+def pull_providers_containers(providers: Iterable[Provider]) -> bool:
+    """Retrieve the containers of the providers (distinct images pulled in
+    parallel) or get references from cache."""
+    providers = [provider for provider in providers if _set_provider_image(provider)]
+    missing = [
+        provider.image for provider in providers if provider.image not in PULLED_IMAGES
+    ]
+    images = fetch_images(missing, require_image, "Provider", _pulled_image)
+    for image_name, (image_id, _image) in images.items():
+        if image_id:
+            PULLED_IMAGES[image_name] = image_id
+    result = True
+    for provider in providers:
+        if provider.image not in PULLED_IMAGES:
+            warning(f"No image found for '{provider.image}'")
+            result = False
+            continue
+        provider.image_id = PULLED_IMAGES[provider.image]
+    return result
+
+
+def _set_provider_image(provider: Provider) -> bool:
+    """Set the image of the provider, return False if not a container."""
     docker_url = provider.base_image()
     if docker_url:
         provider.image = docker_url
-    if not provider.image:
-        return True
-    return _pull_provider_docker(provider)
-
-
-def _pull_provider_docker(provider: Provider) -> bool:
-    """Retrieve a provider container or get reference from cache."""
-    if provider.image not in PULLED_IMAGES:
-        _actual_pull_container(provider)
-
-    if provider.image not in PULLED_IMAGES:
-        warning(f"No image found for '{provider.image}'")
-        return False
+    return bool(provider.image)
 
-    provider.image_id = PULLED_IMAGES[provider.image]
-    return True
 
-
-def _actual_pull_container(provider: Provider):
-    """Retrieve a provider container."""
-    with verbosity(0):
-        info(f"Pulling image '{provider.image}'")
-
-    docker_image = docker_require(provider.image)
-    if docker_image:
-        PULLED_IMAGES[provider.image] = docker_image.id
-        with verbosity(0):
-            display_one_docker_img(docker_image)
+def _pulled_image(_image_name: str, result: tuple[str, Image | None]) -> str:
+    image_id, docker_image = result
+    if not image_id:
+        return "not found"
+    if docker_image is None:
+        # found in the image catalog
+        return "present"
+    with verbosity(1):
+        display_one_docker_img(docker_image)
+    return "pulled"
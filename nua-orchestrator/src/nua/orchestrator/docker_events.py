@@ -0,0 +1,200 @@
+"""Wait for container state changes from the Docker events stream.
+
+A single background thread follows the container events of the Docker daemon and
+resolves the futures of the callers waiting for "container X reached state Y".
+The current state is checked once when registering the wait (so an event that
+happened before is not missed) and then only at long intervals, in case events
+were lost (reconnection of the stream).
+
+If the events stream is not available, the callers fall back to polling.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from time import monotonic, sleep
+
+from docker import DockerClient
+from docker.errors import DockerException
+from nua.lib.panic import debug, warning
+from nua.lib.tool.state import verbosity
+
+from . import config
+
+# Pseudo state of a container no more listed by Docker:
+REMOVED = "removed"
+# States of a container present in the list of containers:
+LISTED_STATES = ("created", "running", "paused", "restarting", "exited", "dead")
+# Container state after each Docker event action:
+ACTION_STATES = {
+    "create": "created",
+    "start": "running",
+    "unpause": "running",
+    "restart": "running",
+    "pause": "paused",
+    "die": "exited",
+    "stop": "exited",
+    "destroy": REMOVED,
+    "health_status: healthy": "healthy",
+    "health_status: unhealthy": "unhealthy",
+}
+# Interval between checks of the current state, in case of lost events:
+RECHECK_INTERVAL = 2.0
+POLL_INTERVAL = 0.1
+
+
+class _Waiter:
+    def __init__(self, name: str, states: Iterable[str]):
+        self.name = name
+        self.states = frozenset(states)
+        self.future: Future[str] = Future()
+
+    def notify(self, name: str, state: str) -> bool:
+        if name != self.name or state not in self.states:
+            return False
+        if not self.future.done():
+            self.future.set_result(state)
+        return True
+
+
+class ContainerEvents:
+    """Shared subscriber of the container events of the Docker daemon."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: list[_Waiter] = []
+        self._stream = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Start following the events stream if needed, return True if running."""
+        with self._lock:
+            if self.running:
+                return True
+            try:
+                client = DockerClient.from_env()
+                # the request is sent when the stream is created, so no event
+                # is lost between here and the thread start:
+                self._stream = client.events(decode=True, filters={"type": "container"})
+            except DockerException as e:
+                with verbosity(2):
+                    warning(f"Docker events not available: {e}")
+                self._stream = None
+                return False
+            self._thread = threading.Thread(
+                target=self._follow,
+                args=(self._stream,),
+                name="nua-docker-events",
+                daemon=True,
+            )
+            self._thread.start()
+            return True
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+            self._stream = None
+
+    def expect(self, name: str, states: Iterable[str]) -> Future[str] | None:
+        """Return a Future resolved with the first of 'states' reached by the
+        container 'name', or None if the events stream is not available."""
+        if not self.start():
+            return None
+        waiter = _Waiter(name, states)
+        with self._lock:
+            self._waiters.append(waiter)
+        waiter.future.add_done_callback(lambda _f: self._discard(waiter))
+        return waiter.future
+
+    def dispatch(self, event: dict) -> None:
+        """Resolve the futures waiting for the state resulting of event."""
+        state = ACTION_STATES.get(event.get("Action") or event.get("status", ""))
+        if state is None:
+            return
+        name = event.get("Actor", {}).get("Attributes", {}).get("name", "")
+        with self._lock:
+            waiters = list(self._waiters)
+        for waiter in waiters:
+            waiter.notify(name, state)
+
+    def _discard(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _follow(self, stream) -> None:
+        try:
+            for event in stream:
+                self.dispatch(event)
+        except Exception as e:  # noqa: BLE001
+            # stream closed or daemon restarted, the waiters will recheck
+            # the state and the stream is reopened on next wait
+            with verbosity(3):
+                debug(f"Docker events stream closed: {e}")
+
+
+_container_events = ContainerEvents()
+
+
+def container_events() -> ContainerEvents:
+    return _container_events
+
+
+def _events_enabled() -> bool:
+    # enabled unless explicitly disabled in the settings:
+    return config.read("host", "docker_events") is not False
+
+
+def wait_container_state(
+    name: str,
+    states: Iterable[str],
+    timeout: float,
+    current: Callable[[], str],
+) -> str:
+    """Wait until the container 'name' reaches one of the 'states'.
+
+    'current' returns the actual state of the container (REMOVED if not listed).
+    Return the reached state, or "" on timeout.
+    """
+    states = frozenset(states)
+    future = container_events().expect(name, states) if _events_enabled() else None
+    if future is None:
+        return _poll_container_state(states, timeout, current)
+    deadline = monotonic() + timeout
+    try:
+        while True:
+            state = current()
+            if state in states:
+                return state
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                return ""
+            try:
+                return future.result(timeout=min(remaining, RECHECK_INTERVAL))
+            except FutureTimeout:
+                continue
+    finally:
+        future.cancel()
+
+
+def _poll_container_state(
+    states: frozenset[str],
+    timeout: float,
+    current: Callable[[], str],
+) -> str:
+    deadline = monotonic() + timeout
+    while True:
+        state = current()
+        if state in states:
+            return state
+        if monotonic() > deadline:
+            return ""
+        sleep(POLL_INTERVAL)
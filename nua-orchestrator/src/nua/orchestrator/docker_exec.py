@@ -0,0 +1,233 @@
+"""Command execution in containers through the Docker API socket.
+
+The exec session is attached to a raw socket of the Docker daemon:
+
+- stdin is streamed from a file by chunks, in a writer thread,
+- stdout and stderr are demultiplexed incrementally from the frames of the
+  Docker stream protocol and sent to a sink (binary file, callback or nothing),
+- nothing is accumulated: memory usage is bounded by the chunk size, whatever
+  the size of the input and output (a restore of a database dump of several
+  GB).
+
+A short tail of stderr is kept for error messages.
+"""
+
+from __future__ import annotations
+
+import socket
+import struct
+import threading
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import IO, Any
+
+from docker.models.containers import Container
+from docker.utils.socket import read as socket_read
+
+CHUNK_SIZE = 64 * 1024
+STDERR_TAIL = 8 * 1024
+MAX_PARALLEL_COMMANDS = 4
+# Docker multiplexed stream header: stream type (1 byte), 3 zero bytes, size:
+FRAME_HEADER = struct.Struct(">BxxxL")
+STREAM_STDOUT = 1
+STREAM_STDERR = 2
+
+Sink = IO[bytes] | Callable[[bytes], Any] | None
+
+
+@dataclass
+class ExecResult:
+    exit_code: int
+    stderr_tail: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+
+class OutputTail:
+    """Sink keeping the last 'limit' bytes of an output."""
+
+    def __init__(self, limit: int = STDERR_TAIL):
+        self.limit = limit
+        self.chunks: deque[bytes] = deque()
+        self.size = 0
+
+    def __call__(self, data: bytes) -> None:
+        self.chunks.append(data)
+        self.size += len(data)
+        while self.size - len(self.chunks[0]) >= self.limit:
+            self.size -= len(self.chunks.popleft())
+
+    def text(self) -> str:
+        return b"".join(self.chunks)[-self.limit :].decode("utf8", "replace")
+
+
+def _writer(sink: Sink) -> Callable[[bytes], Any]:
+    if sink is None:
+        return lambda _data: None
+    if callable(sink):
+        return sink
+    return sink.write
+
+
+def _raw_socket(sock: Any) -> socket.socket:
+    """Return the underlying socket of the object returned by exec_start()."""
+    return getattr(sock, "_sock", sock)
+
+
+def _send_input(sock: socket.socket, source: IO[bytes], errors: list) -> None:
+    try:
+        while chunk := source.read(CHUNK_SIZE):
+            sock.sendall(chunk)
+    except OSError as e:
+        # the command may exit without reading all its input:
+        errors.append(e)
+    finally:
+        try:
+            sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+
+def read_exactly(sock: Any, size: int) -> bytes:
+    """Read size bytes, or less at the end of the stream."""
+    data = b""
+    while len(data) < size:
+        chunk = socket_read(sock, size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def demultiplex(
+    sock: Any,
+    stdout: Callable[[bytes], Any],
+    stderr: Callable[[bytes], Any],
+) -> None:
+    """Dispatch the frames of the Docker stream to stdout and stderr, chunk by
+    chunk (a frame is never read entirely in memory)."""
+    while True:
+        header = read_exactly(sock, FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            return
+        stream_type, remaining = FRAME_HEADER.unpack(header)
+        output = stderr if stream_type == STREAM_STDERR else stdout
+        while remaining:
+            chunk = socket_read(sock, min(remaining, CHUNK_SIZE))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            output(chunk)
+
+
+def exec_stream(
+    container: Container,
+    cmd: str | list[str],
+    stdin: Path | IO[bytes] | None = None,
+    stdout: Sink = None,
+    stderr: Sink = None,
+    user: str = "",
+    workdir: str | None = None,
+    environment: dict[str, str] | None = None,
+) -> ExecResult:
+    """Execute cmd in the container, streaming its input and output.
+
+    stdin: a file path or a binary file object, or None.
+    stdout, stderr: a binary file object, a callable receiving the chunks of
+    bytes, or None to discard the output.
+    """
+    api = container.client.api
+    exec_id = api.exec_create(
+        container.id,
+        cmd,
+        stdin=stdin is not None,
+        stdout=True,
+        stderr=True,
+        tty=False,
+        user=user,
+        workdir=workdir,
+        environment=environment,
+    )["Id"]
+    tail = OutputTail()
+    write_stderr = _writer(stderr)
+
+    def on_stderr(data: bytes) -> None:
+        tail(data)
+        write_stderr(data)
+
+    sock = api.exec_start(exec_id, socket=True)
+    errors: list[OSError] = []
+    try:
+        if stdin is None:
+            demultiplex(sock, _writer(stdout), on_stderr)
+        elif isinstance(stdin, Path):
+            with stdin.open("rb") as source:
+                _exec_with_input(sock, source, stdout, on_stderr, errors)
+        else:
+            _exec_with_input(sock, stdin, stdout, on_stderr, errors)
+    finally:
+        sock.close()
+    exit_code = api.exec_inspect(exec_id).get("ExitCode")
+    message = tail.text()
+    if exit_code is None:
+        exit_code = -1
+    if errors and not exit_code:
+        exit_code = -1
+        message = f"{message}\nInput not fully sent: {errors[0]}"
+    return ExecResult(exit_code=exit_code, stderr_tail=message)
+
+
+def _exec_with_input(
+    sock: Any,
+    source: IO[bytes],
+    stdout: Sink,
+    on_stderr: Callable[[bytes], Any],
+    errors: list,
+) -> None:
+    writer = threading.Thread(
+        target=_send_input,
+        args=(_raw_socket(sock), source, errors),
+        name="nua-exec-stdin",
+        daemon=True,
+    )
+    writer.start()
+    demultiplex(sock, _writer(stdout), on_stderr)
+    writer.join()
+
+
+def exec_commands(
+    container: Container,
+    commands: list[str],
+    parallel: bool = False,
+    output: Callable[[str, bytes], Any] | None = None,
+    user: str = "root",
+    workdir: str = "/",
+) -> list[ExecResult]:
+    """Execute shell commands in the container, in sequence or concurrently.
+
+    output(command, chunk) receives the output (stdout and stderr) of each
+    command. Return the results in the order of the commands.
+    """
+
+    def run(command: str) -> ExecResult:
+        sink = partial(output, command) if output is not None else None
+        return exec_stream(
+            container,
+            ["sh", "-c", command],
+            stdout=sink,
+            stderr=sink,
+            user=user,
+            workdir=workdir,
+        )
+
+    if not parallel or len(commands) < 2:
+        return [run(command) for command in commands]
+    workers = min(MAX_PARALLEL_COMMANDS, len(commands))
+    with ThreadPoolExecutor(workers, thread_name_prefix="nua-exec") as executor:
+        return list(executor.map(run, commands))
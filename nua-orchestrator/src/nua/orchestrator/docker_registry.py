@@ -0,0 +1,303 @@
+"""Registries of format "docker_registry": Nua images served by a Docker
+registry (Registry HTTP API v2).
+
+- the tags of an app image "nua-<app>" are listed from the registry and
+  resolved like the versions of the local tar archives,
+- an image is installed by a pull of the local Docker daemon, which only
+  downloads the layers it does not already have. The pull is skipped when the
+  manifest digest of the tag is already known locally,
+- the nua-config of an image is read once from the pulled image and kept by
+  digest of the image config.
+
+The tag lists and the manifests are kept in an on-disk cache and revalidated
+with their ETag (a 304 response has no body). If the registry is unreachable,
+the cached content is used.
+
+A search result (the "registry path" of an app) is the URL of the image,
+like "https://localhost/nua/nua-hedgedoc:1.9-3".
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlparse
+from urllib.request import Request, urlopen
+
+import tomli
+import yaml
+from docker.errors import ImageNotFound
+from docker.models.images import Image
+from nua.lib.constants import NUA_METADATA_PATH, nua_config_names
+from nua.lib.docker import docker_image_file
+from nua.lib.panic import debug, vprint, warning
+from nua.lib.tool.state import verbosity
+
+from . import config
+from .docker_utils import docker_client
+from .metrics import timed
+
+MANIFEST_TYPES = (
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+)
+DEFAULT_CACHE = "/home/nua/cache/docker_registry"
+DEFAULT_TIMEOUT = 30
+TAGS_PAGE_SIZE = 1000
+
+
+class RegistryCache:
+    """On-disk cache of registry responses: body and ETag, per URL."""
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf8")).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.json"
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        try:
+            return json.loads(self._path(key).read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, entry: dict[str, Any]) -> None:
+        """Store the entry atomically, best effort (the cache is optional)."""
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_text(json.dumps(entry), encoding="utf8")
+            tmp_path.replace(path)
+        except OSError as e:
+            with verbosity(2):
+                warning(f"Registry cache not written: {e}")
+
+
+class RegistryClient:
+    """Client of the Registry HTTP API v2, for a registry url like
+    "https://localhost/nua" (the path is the namespace of the repositories)."""
+
+    def __init__(
+        self,
+        url: str,
+        cache: RegistryCache | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        parsed = urlparse(url)
+        self.url = url.rstrip("/")
+        self.base = f"{parsed.scheme}://{parsed.netloc}"
+        self.host = parsed.netloc
+        self.namespace = parsed.path.strip("/")
+        self.cache = cache
+        self.timeout = timeout
+
+    def repository(self, app: str) -> str:
+        name = f"nua-{app}"
+        return f"{self.namespace}/{name}" if self.namespace else name
+
+    def docker_reference(self, repository: str) -> str:
+        """Name of the repository for the Docker daemon."""
+        return f"{self.host}/{repository}"
+
+    def image_url(self, repository: str, tag: str) -> str:
+        return f"{self.base}/{repository}:{tag}"
+
+    def get(self, path: str, accept: str = "") -> dict[str, Any] | None:
+        """GET the path, revalidating the cached response by its ETag.
+
+        Return the entry (body, headers), or None if not found.
+        """
+        url = urljoin(self.base, path)
+        key = f"{accept} {url}"
+        cached = self.cache.get(key) if self.cache else None
+        request = Request(url)
+        if accept:
+            request.add_header("Accept", accept)
+        if cached and cached.get("etag"):
+            request.add_header("If-None-Match", cached["etag"])
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                entry = {
+                    "etag": response.headers.get("ETag", ""),
+                    "digest": response.headers.get("Docker-Content-Digest", ""),
+                    "link": response.headers.get("Link", ""),
+                    "body": response.read().decode("utf8"),
+                }
+        except HTTPError as e:
+            if e.code == 304 and cached:
+                return cached
+            if e.code == 404:
+                return None
+            raise
+        except (URLError, OSError) as e:
+            if cached:
+                with verbosity(1):
+                    warning(f"Registry unreachable, using cached data: {e}")
+                return cached
+            raise
+        if self.cache and (entry["etag"] or entry["digest"]):
+            self.cache.set(key, entry)
+        return entry
+
+    def tags(self, repository: str) -> list[str]:
+        """Return the tags of the repository (all the pages)."""
+        tags: list[str] = []
+        path = f"/v2/{repository}/tags/list?n={TAGS_PAGE_SIZE}"
+        while path:
+            entry = self.get(path)
+            if entry is None:
+                break
+            tags.extend(json.loads(entry["body"]).get("tags") or [])
+            path = _next_link(entry.get("link", ""))
+        return tags
+
+    def _manifest_path(self, repository: str, reference: str) -> str:
+        return f"/v2/{repository}/manifests/{reference}"
+
+    def cached_manifest_digest(self, repository: str, reference: str) -> str:
+        """Return the digest of the cached manifest, without request."""
+        if not self.cache:
+            return ""
+        url = urljoin(self.base, self._manifest_path(repository, reference))
+        cached = self.cache.get(f"{', '.join(MANIFEST_TYPES)} {url}")
+        return (cached or {}).get("digest", "")
+
+    def manifest(self, repository: str, reference: str) -> tuple[dict, str]:
+        """Return the manifest of the tag (or digest) and its digest.
+
+        The manifest of a multi-platform image is the index of the platform
+        manifests.
+        """
+        entry = self.get(
+            self._manifest_path(repository, reference), ", ".join(MANIFEST_TYPES)
+        )
+        if entry is None:
+            raise FileNotFoundError(f"{self.base}/{repository}:{reference}")
+        digest = entry.get("digest") or (
+            "sha256:" + hashlib.sha256(entry["body"].encode("utf8")).hexdigest()
+        )
+        return json.loads(entry["body"]), digest
+
+
+def _next_link(link: str) -> str:
+    """Return the path of the next page from a 'Link: <path>; rel="next"'."""
+    if 'rel="next"' not in link:
+        return ""
+    return link.split(";", 1)[0].strip().strip("<>")
+
+
+def registry_cache() -> RegistryCache:
+    return RegistryCache(
+        config.read("nua", "docker_registry", "cache") or DEFAULT_CACHE
+    )
+
+
+def registry_client(url: str) -> RegistryClient:
+    timeout = config.read("nua", "docker_registry", "timeout") or DEFAULT_TIMEOUT
+    return RegistryClient(url, registry_cache(), timeout)
+
+
+def is_registry_reference(path: str | Path) -> bool:
+    return str(path).startswith(("http://", "https://"))
+
+
+def split_image_url(image_url: str) -> tuple[RegistryClient, str, str]:
+    """Return the client, repository and tag of an image url."""
+    parsed = urlparse(image_url)
+    repository, tag = parsed.path.strip("/").rsplit(":", 1)
+    return registry_client(f"{parsed.scheme}://{parsed.netloc}"), repository, tag
+
+
+def find_registry_tags(registry: dict, app: str, tag: str) -> list[tuple[str, str]]:
+    """Return the (tag, image url) of the app image in the registry.
+
+    If tag is set, only this tag, else all the tags (but "latest").
+    """
+    client = registry_client(registry["url"])
+    repository = client.repository(app)
+    try:
+        tags = client.tags(repository)
+    except (HTTPError, URLError, OSError, ValueError) as e:
+        with verbosity(1):
+            warning(f"Registry {registry['url']} not available: {e}")
+        return []
+    with verbosity(4):
+        vprint(f"find_registry_tags: {repository} {tags}")
+    if tag:
+        tags = [name for name in tags if name == tag]
+    else:
+        tags = [name for name in tags if name != "latest"]
+    return [(name, client.image_url(repository, name)) for name in tags]
+
+
+def local_image_of_digest(reference: str, digest: str) -> Image | None:
+    """Return the local image pulled from the repository with this manifest
+    digest, if any."""
+    repo_digest = f"{reference}@{digest}"
+    try:
+        image = docker_client().images.get(repo_digest)
+    except ImageNotFound:
+        return None
+    if repo_digest in (image.attrs.get("RepoDigests") or []):
+        return image
+    return None
+
+
+def pull_registry_image(image_url: str) -> tuple[Image, str]:
+    """Install the image in the local Docker daemon, pulling only the layers
+    not already present (no pull if the tag digest is known locally).
+
+    Return: tuple(image, status)
+    """
+    client, repository, tag = split_image_url(image_url)
+    reference = client.docker_reference(repository)
+    # digest of the cached manifest: an image already present locally is found
+    # without any request to the registry
+    cached_digest = client.cached_manifest_digest(repository, tag)
+    if cached_digest:
+        image = local_image_of_digest(reference, cached_digest)
+        if image is not None:
+            return image, "present"
+    _manifest, digest = client.manifest(repository, tag)
+    image = local_image_of_digest(reference, digest)
+    if image is not None:
+        with verbosity(2):
+            debug(f"Image {image_url} ({digest}) already present locally")
+        if f"{reference}:{tag}" not in image.tags:
+            image.tag(reference, tag)
+        return image, "present"
+    with timed("nua_image_pull_seconds", app_id=repository.rsplit("/", 1)[-1]):
+        return docker_client().images.pull(reference, tag=tag), "pulled"
+
+
+def registry_image_nua_config(image: Image) -> dict:
+    """Return the nua-config of the image, cached by image id (the digest of
+    the image config)."""
+    cache = registry_cache()
+    key = f"nua-config {image.id}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached["nua_config"]
+    nua_config: dict = {}
+    for name in nua_config_names():
+        content = docker_image_file(image.id, f"{NUA_METADATA_PATH}/{name}")
+        if content:
+            nua_config = _parse_nua_config(name, content.decode("utf8"))
+            break
+    if nua_config:
+        cache.set(key, {"nua_config": nua_config})
+    return nua_config
+
+
+def _parse_nua_config(name: str, content: str) -> dict:
+    if name.endswith("toml"):
+        return tomli.loads(content)
+    return yaml.safe_load(content)
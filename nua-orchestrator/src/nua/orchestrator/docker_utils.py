@@ -11,8 +11,6 @@ from functools import cache
 from pathlib import Path
 from pprint import pformat
 from subprocess import run  # noqa: S404
-from subprocess import PIPE, STDOUT, Popen
-from time import sleep
 from typing import Any
 
 from docker import DockerClient
@@ -37,6 +35,9 @@ from nua.lib.shell import chmod_r, mkdir_p
 from nua.lib.tool.state import verbosity
 
 from . import config
+from .docker_events import LISTED_STATES, REMOVED, wait_container_state
+from .docker_exec import ExecResult, OutputTail, exec_commands, exec_stream
+from .metrics import docker_call
 from .provider import Provider
 from .volume import Volume
 
@@ -46,6 +47,15 @@ RE_VAR = re.compile(r"\{[^\{\}]+\}")
 # local daemon ######################################################
 
 
+@cache
+def docker_client() -> DockerClient:
+    """Client of the local Docker daemon, shared by the calls of the command.
+
+    Connected on first use (the API version is negotiated once).
+    """
+    return DockerClient.from_env()
+
+
 @cache
 def docker_host_gateway_ip() -> str:
     cmd = ["ip", "-j", "route"]
@@ -78,13 +88,14 @@ def docker_service_start_if_needed():
 # container #########################################################
 
 
+@docker_call
 def docker_container_of_name(
     name: str,
     client: DockerClient | None = None,
 ) -> Container | None:
     """Return the Container of the given name or None if not found."""
     if client is None:
-        actual_client = DockerClient.from_env()
+        actual_client = docker_client()
     else:
         actual_client = client
     try:
@@ -113,7 +124,7 @@ def docker_mount_point(container: Container, volume_name: str) -> str:
 
 def docker_container_volumes(container_name: str) -> list[DockerVolume]:
     volumes = []
-    client = DockerClient.from_env()
+    client = docker_client()
     container = docker_container_of_name(container_name, client)
     if container is None:
         return volumes
@@ -134,9 +145,10 @@ def docker_container_named_volume(
     return None
 
 
+@docker_call
 def docker_container_status(container_id: str) -> str:
     """Get container status per Id."""
-    client = DockerClient.from_env()
+    client = docker_client()
     try:
         cont = client.containers.get(container_id)
     except (NotFound, APIError):
@@ -149,7 +161,7 @@ def docker_container_status(container_id: str) -> str:
 
 def docker_container_status_record(container_id: str) -> dict[str, Any]:
     """Return container status dict (per container Id)."""
-    client = DockerClient.from_env()
+    client = docker_client()
     try:
         cont = client.containers.get(container_id)
     except (NotFound, APIError):
@@ -171,6 +183,7 @@ def docker_container_since(container: Container) -> int:
     return int((now - created).total_seconds())
 
 
+@docker_call
 def docker_start_container_name(name: str) -> bool:
     if not name:
         return False
@@ -183,6 +196,7 @@ def docker_start_container_name(name: str) -> bool:
     return _docker_start_container(container)
 
 
+@docker_call
 def docker_restart_container_name(name: str):
     if not name:
         return
@@ -195,18 +209,26 @@ def docker_restart_container_name(name: str):
     _docker_restart_container(container)
 
 
+def _docker_container_state(name: str) -> str:
+    """Return the status of the container of the given name, or REMOVED."""
+    container = docker_container_of_name(name)
+    if container is None:
+        return REMOVED
+    return container.status
+
+
 def _docker_wait_empty_container_list(name: str, timeout: int) -> bool:
-    if not timeout:
-        timeout = 1
-    count = timeout * 10
-    while docker_container_of_name(name) is not None:
-        if count <= 0:
-            return False
-        count -= 1
-        sleep(0.1)
-    return True
+    return bool(
+        wait_container_state(
+            name,
+            (REMOVED,),
+            timeout or 1,
+            lambda: _docker_container_state(name),
+        )
+    )
 
 
+@docker_call
 def docker_stop_container_name(name: str):
     if not name:
         return
@@ -225,6 +247,7 @@ def docker_stop_container_name(name: str):
         #     warning(f"container not killed: {remain.name}")
 
 
+@docker_call
 def docker_pause_container_name(name: str):
     if not name:
         return
@@ -237,6 +260,7 @@ def docker_pause_container_name(name: str):
     _docker_pause_container(container)
 
 
+@docker_call
 def docker_unpause_container_name(name: str):
     if not name:
         return
@@ -301,6 +325,7 @@ def _docker_display_not_removed(name: str):
         warning(f"container not removed: {container}")
 
 
+@docker_call
 def docker_remove_container(name: str, force=False):
     if not name:
         return
@@ -319,13 +344,14 @@ def docker_remove_container(name: str, force=False):
 
 def _docker_wait_container_listed(name: str) -> bool:
     timeout = config.read("host", "docker_run_timeout") or 30
-    count = timeout * 10
-    while docker_container_of_name(name) is None:
-        if count <= 0:
-            return False
-        count -= 1
-        sleep(0.1)
-    return True
+    return bool(
+        wait_container_state(
+            name,
+            LISTED_STATES,
+            timeout,
+            lambda: _docker_container_state(name),
+        )
+    )
 
 
 def docker_check_container_listed(name: str) -> bool:
@@ -412,6 +438,7 @@ def docker_run_params(rsite: Provider) -> dict:
     return params
 
 
+@docker_call
 def docker_run(rsite: Provider, secrets: dict) -> Container:
     """Wrapper on top of the py-docker run() command.
 
@@ -436,12 +463,12 @@ def docker_run(rsite: Provider, secrets: dict) -> Container:
     with verbosity(3):
         vprint("Docker secrets:", secrets)
 
-    _check_run_container(container, rsite.container_name)
+    _check_run_container(container, params["name"])
     return container
 
 
 def _docker_run(rsite: Provider, secrets: dict, params: dict) -> Container:
-    client = DockerClient.from_env()
+    client = docker_client()
     erase_previous_container(client, params["name"])
     actual_params = params_with_secrets_and_f_strings(params, secrets)
     return client.containers.run(rsite.image_id, **actual_params)
@@ -491,116 +518,105 @@ def _check_run_container(container: Container, name: str):
     # test_docker_exec(container)
 
 
+@docker_call
 def docker_exec_stdout(container: Container, params: dict, output: io.BufferedIOBase):
-    """Wrapper on top of the py-docker exec_run() command, capturing the output.
+    """Execute a command in the container, writing its stdout to output.
 
-    Defaults are:
-    cmd, stdout=True, stderr=True, stdin=False, tty=False, privileged=False,
-    user='', detach=False, stream=False, socket=False, environment=None,
-    workdir=None, demux=False
+    params: "cmd", and optional "user", "workdir".
 
     Returns: None
     """
-    cmd = params["cmd"]
-    user = params.get("user", "")
-    workdir = params.get("workdir")
-    _, stream = container.exec_run(
-        cmd=cmd,
-        user=user,
-        workdir=workdir,
-        stream=True,
-        stdout=True,
-        stderr=False,
-        demux=True,
+    exec_stream(
+        container,
+        params["cmd"],
+        stdout=output,
+        user=params.get("user", ""),
+        workdir=params.get("workdir"),
     )
-    for data in stream:
-        print(data)
-        output.write(data[0])
 
 
+@docker_call
 def docker_exec_no_output(container: Container, command: str):
-    """Wrapper on top of the py-docker exec_run() command, not capturing the output.
-
-    Defaults are:
-    cmd, stdout=True, stderr=True, stdin=False, tty=False, privileged=False,
-    user='', detach=False, stream=False, socket=False, environment=None,
-    workdir=None, demux=False
+    """Execute a command in the container as root, the output is only displayed
+    in verbose mode.
 
     Returns: None
     """
-    _, stream = container.exec_run(
-        cmd=command,
-        user="root",
-        workdir="/",
-        stream=True,
-        stdout=True,
-        stderr=False,
-        demux=True,
-    )
-    for data in stream:
-        print(data[0].decode())
+    results = exec_commands(container, [command], output=_show_exec_output)
+    _warn_exec_failures([command], results)
 
 
+@docker_call
 def docker_exec_stdin(container: Container, cmd: str, input_file: Path) -> str:
-    """Wrapper on top of the py-docker exec_run() command, capturing file to stdin.
+    """Execute a command in the container, streaming the file to its stdin.
 
-    Defaults are:
-    cmd, stdout=True, stderr=True, stdin=False, tty=False, privileged=False,
-    user='', detach=False, stream=False, socket=False, environment=None,
-    workdir=None, demux=False
+    Returns: the end of the output (stdout and stderr) of the command.
     """
-    docker_cmd = shlex.split(f"/usr/bin/docker exec -i {container.id} {cmd}")
-    with open(input_file, "rb") as rfile:
-        proc = Popen(
-            docker_cmd,
-            stdin=rfile,
-            stdout=PIPE,
-            stderr=STDOUT,
-        )
-        result, _ = proc.communicate()
-    return result.decode("utf8")
+    tail = OutputTail()
+    exec_stream(
+        container,
+        shlex.split(cmd),
+        stdin=Path(input_file),
+        stdout=tail,
+        stderr=tail,
+    )
+    return tail.text()
 
 
+@docker_call
 def docker_exec_checked(container: Container, params: dict, output: io.BufferedIOBase):
-    """Wrapper on top of the py-docker exec_run() command, capturing the output.
-
-    Write the binary output of run_exec to output buffered io, or raise Runtime Error.
+    """Execute a shell command in the container, writing its output to output, or
+    raise RuntimeError if the command fails (any non-zero exit code).
 
-    Defaults are:
-    cmd, stdout=True, stderr=True, stdin=False, tty=False, privileged=False,
-    user='', detach=False, stream=False, socket=False, environment=None,
-    workdir=None, demux=False
+    params: "cmd", and optional "user" (root), "workdir" (/), "stderr" (True: stderr
+    is also written to output).
 
     Returns: None
     """
     cmd = params["cmd"]
-    shcmd = f'sh -c "{cmd}"'
-    user = params.get("user", "root")
-    workdir = params.get("workdir", "/")
-    stderr = params.get("stderr", True)
-    _, stream = container.exec_run(
-        cmd=shcmd,
-        user=user,
-        workdir=workdir,
-        stream=True,
-        stdout=True,
-        stderr=stderr,
-        demux=False,
+    result = exec_stream(
+        container,
+        ["sh", "-c", cmd],
+        stdout=output,
+        stderr=output if params.get("stderr", True) else None,
+        user=params.get("user", "root"),
+        workdir=params.get("workdir", "/"),
     )
-    # will test the first line only:
-    test_passed = False
-    for data in stream:
-        if not test_passed:
-            if b"OCI runtime exec failed" in data:
-                raise RuntimeError(data.decode("utf8"))
-            test_passed = True
-        output.write(data)
+    if not result.ok:
+        raise RuntimeError(
+            f"Command failed (exit code {result.exit_code}): {cmd}\n"
+            f"{result.stderr_tail}"
+        )
 
 
-def docker_exec_commands(container: Container, commands: list[str]):
+@docker_call
+def docker_exec_commands(
+    container: Container,
+    commands: list[str],
+    parallel: bool = False,
+):
+    """Execute the shell commands in the container, concurrently if 'parallel'."""
     for command in commands:
-        print("Command:", command)
-        docker_exec_no_output(container, command)
+        with verbosity(1):
+            info("Command:", command)
+    results = exec_commands(
+        container, commands, parallel=parallel, output=_show_exec_output
+    )
+    _warn_exec_failures(commands, results)
+
+
+def _show_exec_output(command: str, data: bytes) -> None:
+    with verbosity(2):
+        vprint(data.decode("utf8", "replace").rstrip())
+
+
+def _warn_exec_failures(commands: list[str], results: list[ExecResult]) -> None:
+    for command, result in zip(commands, results):
+        if not result.ok:
+            warning(
+                f"Command failed (exit code {result.exit_code}): {command}",
+                result.stderr_tail,
+            )
 
 
 # def docker_exec(container: Container, params: dict):
@@ -644,13 +660,14 @@ def docker_exec_commands(container: Container, commands: list[str]):
 # Volumes ###########################################################
 
 
+@docker_call
 def docker_volume_of_name(
     name: str,
     client: DockerClient | None = None,
 ) -> DockerVolume | None:
     """Return the DockerVolume of the given name or None if not found."""
     if client is None:
-        actual_client = DockerClient.from_env()
+        actual_client = docker_client()
     else:
         actual_client = client
     try:
@@ -668,7 +685,7 @@ def docker_volume_type(volume: Volume) -> str:
 
 
 def docker_volume_list(name: str) -> list[DockerVolume]:
-    client = DockerClient.from_env()
+    client = docker_client()
     pre_list = client.volumes.list(filters={"name": name})
     # filter match is not equality
     return [vol for vol in pre_list if vol.name == name]
@@ -682,6 +699,7 @@ def docker_remove_volume_by_source(source: str):
             print(e)
 
 
+@docker_call
 def docker_volume_create(volume: Volume):
     found = docker_volume_list(volume.full_name)
     if not found:
@@ -698,7 +716,7 @@ def docker_volume_create_new(volume: Volume):
     if driver != "local" and not install_plugin(driver):
         # assuming it is the name of a plugin
         raise Abort(f"Install of Docker's plugin '{driver}' failed.")
-    client = DockerClient.from_env()
+    client = docker_client()
     client.volumes.create(
         name=volume.full_name,
         driver=driver,
@@ -722,7 +740,7 @@ def docker_volume_create_local_dir(volume: Volume):
 # def docker_tmpfs_create(volume_opt: dict):
 #     """Create a new volume of type "tmpfs"."""
 #
-#     client = DockerClient.from_env()
+#     client = docker_client()
 #     client.volumes.create(
 #         name=volume_opt["source"],
 #         driver=driver,
@@ -746,6 +764,7 @@ def docker_volume_create_or_use(volume_params: dict):
     # container loading
 
 
+@docker_call
 def docker_volume_prune(volume_opt: dict):
     """Remove a (previously mounted) local docker volume.
 
@@ -757,7 +776,7 @@ def docker_volume_prune(volume_opt: dict):
         return
     name = volume.full_name
     try:
-        client = DockerClient.from_env()
+        client = docker_client()
         pre_list = client.volumes.list(filters={"name": name})
         # beware: filter match is not equality
         found = [vol for vol in pre_list if vol.name == name]
@@ -774,8 +793,9 @@ def docker_volume_prune(volume_opt: dict):
 # network ###########################################################
 
 
+@docker_call
 def docker_network_create_bridge(network_name: str):
-    client = DockerClient.from_env()
+    client = docker_client()
     found = docker_network_by_name(network_name)
     if found:
         return found
@@ -783,6 +803,7 @@ def docker_network_create_bridge(network_name: str):
         return client.networks.create(network_name, driver="bridge")
 
 
+@docker_call
 def docker_network_remove_one(network_name: str):
     """Prune a network identified by its name."""
     network = docker_network_by_name(network_name)
@@ -793,15 +814,16 @@ def docker_network_remove_one(network_name: str):
             print(e)
 
 
+@docker_call
 def docker_network_prune():
     """Prune all unused networks."""
-    client = DockerClient.from_env()
+    client = docker_client()
     client.networks.prune()
 
 
 def docker_network_by_name(network_name: str):
     """Return a network identified by its name."""
-    client = DockerClient.from_env()
+    client = docker_client()
     for net in client.networks.list():
         if net.name == network_name:
             return net
@@ -813,22 +835,37 @@ def docker_wait_for_status(
     expected: str = "running",
     timeout: int = 60,
 ) -> bool:
-    while True:
-        status, since = docker_container_status_raw(container)
-        if status == expected:
-            return True
-        if status == "exited":
-            print("Container did exit")
-            return False
-        if since > timeout:
-            print(f"Timeout while waiting for container '{expected}' status")
-            return False
-        sleep(0.2)
+    """Wait until the container has the expected status.
+
+    The timeout is counted from the creation of the container.
+    """
+
+    def current() -> str:
+        try:
+            container.reload()
+        except NotFound:
+            return REMOVED
+        return container.status
+
+    remaining = timeout - docker_container_since(container)
+    status = wait_container_state(
+        container.name,
+        (expected, "exited", REMOVED),
+        max(remaining, 0),
+        current,
+    )
+    if status == expected:
+        return True
+    if status:
+        print("Container did exit")
+        return False
+    print(f"Timeout while waiting for container '{expected}' status")
+    return False
 
 
 def install_plugin(plugin_name: str) -> str:
     """Install Docker's plugin (plugin for API of remote services)."""
-    client = DockerClient.from_env()
+    client = docker_client()
     try:
         plugin = client.plugins.get(plugin_name)
     except NotFound:
@@ -844,13 +881,15 @@ def install_plugin(plugin_name: str) -> str:
         return ""
 
 
+@docker_call
 def pull_docker_image(image: str) -> Image:
     docker_service_start_if_needed()
     return docker_require(image)
 
 
+@docker_call
 def list_containers():
-    client = DockerClient.from_env()
+    client = docker_client()
     for ctn in client.containers.list(all=True):
         image = ctn.image
         if image.tags:
@@ -863,8 +902,9 @@ def list_containers():
         )
 
 
+@docker_call
 def local_nua_images() -> list[Image]:
-    client = DockerClient.from_env()
+    client = docker_client()
     try:
         images = [image for image in client.images.list() if "NUA_TAG" in image.labels]
     except (APIError, ImageNotFound):
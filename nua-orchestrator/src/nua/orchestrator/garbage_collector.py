@@ -0,0 +1,357 @@
+"""Garbage collector of the unused Docker images and volumes of Nua.
+
+The live set is computed from the DB (instances, active and previous
+deployment states), the candidates from one `docker system df` call (sizes of
+images and volumes, containers using them):
+
+- app images (having a NUA_TAG label) not used by an instance, except the
+  last 'keep_versions' versions of each app,
+- provider images referenced by past deployment states but not used anymore,
+- managed local volumes of past deployment states not used anymore.
+
+Images and volumes used by any container (even stopped) are live. The
+candidates are ranked by size (largest first), then age (oldest first), and
+removed in batches. The scan only reads the DB (read-only sessions), the
+removals only delete the records of the removed images (image table and
+image catalog): it can run as a periodic job (`nua-orchestrator gc --delete`)
+while other commands deploy.
+"""
+
+from __future__ import annotations
+
+import time
+from contextlib import suppress
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any
+
+from docker.errors import APIError, NotFound
+from nua.lib.panic import important, info, show, warning
+from nua.lib.tool.state import verbosity
+
+from . import config
+from .db import store
+from .docker_utils import docker_client
+from .image_catalog import normalized_reference
+from .metrics import docker_call
+from .search_cmd import tag_version
+from .state_journal import StateJournal
+from .volume import Volume
+
+DEFAULT_KEEP_VERSIONS = 2
+DEFAULT_BATCH_SIZE = 20
+# seconds between two batches of removals, to not monopolize the daemon:
+BATCH_PAUSE = 0.5
+IMAGE = "image"
+VOLUME = "volume"
+
+
+@dataclass
+class Candidate:
+    kind: str
+    # image id or volume name:
+    id: str
+    name: str
+    size: int
+    # creation time, epoch seconds:
+    created: float
+    reason: str
+    # tags of an image:
+    tags: list[str] = field(default_factory=list)
+
+    def age_days(self, now: float) -> float:
+        return max(0.0, now - self.created) / 86400
+
+
+@dataclass
+class LiveSet:
+    image_ids: set[str] = field(default_factory=set)
+    # normalized references of the images:
+    image_refs: set[str] = field(default_factory=set)
+    volumes: set[str] = field(default_factory=set)
+    # references of the past deployment states:
+    history_images: set[str] = field(default_factory=set)
+    history_volumes: set[str] = field(default_factory=set)
+
+
+@dataclass
+class GCReport:
+    dry_run: bool
+    candidates: list[Candidate] = field(default_factory=list)
+    removed: list[Candidate] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def reclaimable(self) -> int:
+        return sum(candidate.size for candidate in self.candidates)
+
+    @property
+    def freed(self) -> int:
+        return sum(candidate.size for candidate in self.removed)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "dry_run": self.dry_run,
+            "reclaimable": self.reclaimable,
+            "freed": self.freed,
+            "candidates": [asdict(candidate) for candidate in self.candidates],
+            "removed": [candidate.id for candidate in self.removed],
+            "errors": self.errors,
+        }
+
+
+def _add_site(live: LiveSet, site: dict[str, Any]) -> None:
+    if site.get("image_id"):
+        live.image_ids.add(site["image_id"])
+    if site.get("image"):
+        live.image_refs.add(normalized_reference(site["image"]))
+    live.volumes.update(_managed_volume_names(site.get("volume") or []))
+
+
+def _managed_volume_names(definitions: list[dict[str, Any]]) -> set[str]:
+    names = set()
+    for definition in definitions:
+        try:
+            volume = Volume.parse(definition)
+        except (ValueError, KeyError):
+            continue
+        if volume.is_managed and volume.is_local and volume.full_name:
+            names.add(volume.full_name)
+    return names
+
+
+def live_set() -> LiveSet:
+    """Images and volumes used by the instances and by the active and
+    previous deployment states (only DB reads)."""
+    live = LiveSet()
+    for record in store.list_instances_fields(("image_id", "image")):
+        _add_site(live, record)
+    live.volumes.update(
+        volume.full_name for volume in store.list_instances_container_active_volumes()
+    )
+    state = StateJournal()
+    state.read_current_state()
+    states = [state.deployed_state()]
+    # kept for a restore of the previous state:
+    state.read_previous_state()
+    states.append(state.deployed_state())
+    for deployed in states:
+        for app in deployed["apps"]:
+            for site in [app, *(app.get("providers") or [])]:
+                _add_site(live, site)
+    images, volumes = store.deploy_config_history_references()
+    live.history_images = {normalized_reference(image) for image in images}
+    live.history_volumes = _managed_volume_names(volumes)
+    return live
+
+
+@docker_call
+def docker_usage() -> dict[str, Any]:
+    """Return the disk usage of the images, containers and volumes."""
+    return docker_client().df()
+
+
+def _created(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value)
+    if text.endswith("Z"):
+        # Python 3.10 fromisoformat() does not parse the "Z" suffix
+        text = f"{text[:-1]}+00:00"
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _image_size(image: dict[str, Any]) -> int:
+    """Size freed by the removal (not shared with other images)."""
+    shared = max(image.get("SharedSize") or 0, 0)
+    return max((image.get("Size") or 0) - shared, 0)
+
+
+def _kept_app_images(images: list[dict[str, Any]], keep_versions: int) -> set[str]:
+    """Ids of the last 'keep_versions' versions of each app image."""
+    per_app: dict[str, list[tuple[Any, str]]] = {}
+    for image in images:
+        labels = image.get("Labels") or {}
+        if "NUA_TAG" not in labels:
+            continue
+        tag = labels["NUA_TAG"].rsplit(":", 1)[-1]
+        per_app.setdefault(labels.get("APP_ID", ""), []).append(
+            (tag_version(tag), image["Id"])
+        )
+    kept = set()
+    for versions in per_app.values():
+        versions.sort(reverse=True)
+        kept.update(image_id for _version, image_id in versions[:keep_versions])
+    return kept
+
+
+def plan(
+    usage: dict[str, Any],
+    live: LiveSet,
+    keep_versions: int = DEFAULT_KEEP_VERSIONS,
+    images: bool = True,
+    volumes: bool = True,
+) -> list[Candidate]:
+    """Return the removal candidates, largest and oldest first."""
+    candidates: list[Candidate] = []
+    used_images = {
+        container.get("ImageID") for container in usage.get("Containers") or []
+    }
+    if images:
+        all_images = usage.get("Images") or []
+        kept = _kept_app_images(all_images, keep_versions)
+        for image in all_images:
+            candidate = _image_candidate(image, live, used_images | kept)
+            if candidate:
+                candidates.append(candidate)
+    if volumes:
+        for volume in usage.get("Volumes") or []:
+            candidate = _volume_candidate(volume, live)
+            if candidate:
+                candidates.append(candidate)
+    candidates.sort(key=lambda candidate: (-candidate.size, candidate.created))
+    return candidates
+
+
+def _image_candidate(
+    image: dict[str, Any], live: LiveSet, kept: set[str]
+) -> Candidate | None:
+    image_id = image["Id"]
+    if image_id in live.image_ids or image_id in kept:
+        return None
+    tags = [tag for tag in image.get("RepoTags") or [] if tag != "<none>:<none>"]
+    refs = {normalized_reference(tag) for tag in tags}
+    if refs & live.image_refs:
+        return None
+    if "NUA_TAG" in (image.get("Labels") or {}):
+        reason = "unused app image"
+    elif refs & live.history_images:
+        reason = "superseded provider image"
+    else:
+        return None
+    return Candidate(
+        kind=IMAGE,
+        id=image_id,
+        name=tags[0] if tags else image_id[:19],
+        size=_image_size(image),
+        created=_created(image.get("Created")),
+        reason=reason,
+        tags=tags,
+    )
+
+
+def _volume_candidate(volume: dict[str, Any], live: LiveSet) -> Candidate | None:
+    name = volume["Name"]
+    if name not in live.history_volumes or name in live.volumes:
+        return None
+    usage = volume.get("UsageData") or {}
+    # RefCount: number of containers using the volume, -1 if unknown
+    if usage.get("RefCount", -1) != 0:
+        return None
+    return Candidate(
+        kind=VOLUME,
+        id=name,
+        name=name,
+        size=max(usage.get("Size") or 0, 0),
+        created=_created(volume.get("CreatedAt")),
+        reason="unused volume",
+    )
+
+
+@docker_call
+def _remove(candidate: Candidate) -> None:
+    client = docker_client()
+    if candidate.kind == IMAGE:
+        # the removal by id of an image of several tags is a conflict (without
+        # force): remove its tags, the last one removes the image
+        for reference in [*candidate.tags, candidate.id]:
+            with suppress(NotFound):
+                client.images.remove(reference, force=False, noprune=False)
+    else:
+        client.volumes.get(candidate.id).remove()
+
+
+def _remove_batch(batch: list[Candidate], report: GCReport) -> None:
+    removed = []
+    for candidate in batch:
+        try:
+            _remove(candidate)
+        except NotFound:
+            pass
+        except APIError as e:
+            report.errors.append(f"{candidate.name}: {e.explanation or e}")
+            continue
+        removed.append(candidate)
+    report.removed.extend(removed)
+    image_ids = [candidate.id for candidate in removed if candidate.kind == IMAGE]
+    if image_ids:
+        store.remove_ids(image_ids)
+        store.catalog_remove_images(
+            [
+                record["reference"]
+                for record in store.catalog_images()
+                if record["image_id"] in image_ids
+            ]
+        )
+
+
+def collect(
+    dry_run: bool = True,
+    keep_versions: int | None = None,
+    batch_size: int | None = None,
+    images: bool = True,
+    volumes: bool = True,
+) -> GCReport:
+    """Find the unused images and volumes, and remove them (if not dry_run)."""
+    if keep_versions is None:
+        keep_versions = _setting("keep_versions", DEFAULT_KEEP_VERSIONS)
+    if batch_size is None:
+        batch_size = _setting("batch_size", DEFAULT_BATCH_SIZE)
+    live = live_set()
+    report = GCReport(dry_run=dry_run)
+    report.candidates = plan(docker_usage(), live, keep_versions, images, volumes)
+    if dry_run:
+        return report
+    batch_size = max(batch_size, 1)
+    for start in range(0, len(report.candidates), batch_size):
+        if start:
+            time.sleep(BATCH_PAUSE)
+        _remove_batch(report.candidates[start : start + batch_size], report)
+    return report
+
+
+def _setting(key: str, default: int) -> int:
+    value = config.read("nua", "gc", key)
+    return default if value is None else int(value)
+
+
+def display_report(report: GCReport) -> None:
+    now = time.time()
+    with verbosity(0):
+        if not report.candidates:
+            important("Nothing to remove.")
+            return
+        title = "Removal candidates" if report.dry_run else "Removed"
+        important(f"{title} (largest first):")
+        removed = {candidate.id for candidate in report.removed}
+        for candidate in report.candidates:
+            if not report.dry_run and candidate.id not in removed:
+                continue
+            show(
+                f"{candidate.kind:<7}{_mib(candidate.size):>10}  "
+                f"{candidate.age_days(now):>6.0f} days  {candidate.name}  "
+                f"({candidate.reason})"
+            )
+        if report.dry_run:
+            info(f"Reclaimable: {_mib(report.reclaimable)}")
+        else:
+            info(f"Freed: {_mib(report.freed)}")
+    for error in report.errors:
+        warning(f"Not removed: {error}")
+
+
+def _mib(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MiB"
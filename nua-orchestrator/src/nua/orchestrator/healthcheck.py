@@ -77,6 +77,15 @@ class HealthCheck:
     def as_dict(self) -> dict:
         return self._dict
 
+    def startup_timeout(self) -> int:
+        """Maximum delay for a new container to become healthy, in seconds."""
+        if not self._dict.get("command"):
+            return 0
+        start_period = self._dict.get("start-period", self._dict.get("start_period"))
+        return (start_period or 0) + (
+            self._dict["interval"] + self._dict["timeout"]
+        ) * (self._dict["retries"] + 1)
+
     def as_docker_params(self) -> dict:
         params: dict[str, Any] = {}
         if not self._dict["command"]:
@@ -0,0 +1,208 @@
+"""Catalog of the local Docker images, kept in the orchestrator DB.
+
+Each orchestrator command is a new process: without a catalog, every
+command asks the Docker daemon for each provider image and lists all the images
+to find the Nua ones. The catalog records, per Docker reference, the image id,
+digest, size and labels, and when this was last verified in the daemon.
+
+- an entry verified less than 'image_catalog_ttl' seconds ago is used
+  without listing the daemon images (an image required to run a container is
+  only checked by a single inspect of its id, it may have been removed
+  outside of Nua),
+- otherwise the catalog is reconciled with a single listing of the daemon
+  images (no inspect of each image): entries of removed images are dropped,
+  the others are refreshed (a retagged reference gets its new image id and
+  digest),
+- a reference not in the daemon is pulled, and recorded.
+
+The catalog is reconciled at most once per process, even when the images are
+looked up from several threads (see image_fetch).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from typing import Any
+
+from docker.errors import APIError, ImageNotFound
+from docker.models.images import Image
+from nua.lib.docker import docker_require
+from nua.lib.panic import vprint
+from nua.lib.tool.state import verbosity
+
+from . import config
+from .db import store
+from .docker_utils import docker_client, docker_service_start_if_needed
+from .metrics import docker_call
+
+DEFAULT_TTL = 600
+_reconciled = False
+_reconcile_lock = threading.Lock()
+
+
+def normalized_reference(reference: str) -> str:
+    """Return the reference as listed in the RepoTags of the daemon:
+    "docker.io/library/postgres" -> "postgres:latest"."""
+    name = reference.strip()
+    for prefix in ("docker.io/", "index.docker.io/", "library/"):
+        name = name.removeprefix(prefix)
+    if "@" not in name and ":" not in name.rsplit("/", 1)[-1]:
+        name = f"{name}:latest"
+    return name
+
+
+def catalog_ttl() -> int:
+    ttl = config.read("nua", "host", "image_catalog_ttl")
+    return DEFAULT_TTL if ttl is None else int(ttl)
+
+
+def _is_fresh(record: dict[str, Any], ttl: int) -> bool:
+    try:
+        verified = datetime.fromisoformat(record.get("verified") or "")
+    except ValueError:
+        return False
+    # the verified dates are timezone-aware (UTC):
+    return time.time() - verified.timestamp() < ttl
+
+
+def _digest(repo_digests: list[str] | None) -> str:
+    for repo_digest in repo_digests or []:
+        return repo_digest.split("@", 1)[-1]
+    return ""
+
+
+def _record(reference: str, summary: dict[str, Any], verified: str) -> dict:
+    return {
+        "reference": reference,
+        "image_id": summary.get("Id", ""),
+        "digest": _digest(summary.get("RepoDigests")),
+        "size": summary.get("Size") or 0,
+        "labels": summary.get("Labels") or {},
+        "verified": verified,
+    }
+
+
+@docker_call
+def _daemon_images() -> list[dict[str, Any]]:
+    """Summary of the local images (one API call)."""
+    try:
+        return docker_client().api.images()
+    except APIError:
+        return []
+
+
+def reconcile() -> None:
+    """Synchronize the catalog with the images of the daemon."""
+    global _reconciled
+
+    summaries = _daemon_images()
+    verified = store.now_iso()
+    references: dict[str, dict[str, Any]] = {}
+    for summary in summaries:
+        for tag in summary.get("RepoTags") or []:
+            if tag != "<none>:<none>":
+                references[tag] = summary
+    known = {record["reference"]: record for record in store.catalog_images()}
+    removed = [reference for reference in known if reference not in references]
+    if removed:
+        store.catalog_remove_images(removed)
+    store.catalog_store_images(
+        [
+            _record(reference, summary, verified)
+            for reference, summary in references.items()
+        ]
+    )
+    with verbosity(4):
+        vprint(f"image catalog: {len(references)} images, {len(removed)} removed")
+    _reconciled = True
+
+
+def _reconcile_once() -> bool:
+    """Reconcile the catalog if not yet done by this process (by any thread).
+
+    Return True if the catalog is reconciled now.
+    """
+    if _reconciled:
+        return False
+    with _reconcile_lock:
+        if not _reconciled:
+            reconcile()
+    return True
+
+
+def lookup(reference: str) -> dict[str, Any]:
+    """Return the catalog record of the reference if the image is present
+    locally, or {}. Reconcile the catalog if the record is too old."""
+    name = normalized_reference(reference)
+    record = store.catalog_image(name)
+    if record and _is_fresh(record, catalog_ttl()):
+        return record
+    if _reconcile_once():
+        return store.catalog_image(name)
+    return {}
+
+
+def record_image(image: Image, reference: str = "") -> None:
+    """Record a pulled or loaded image, under the reference or its tags."""
+    references = [reference] if reference else image.tags
+    summary = {
+        "Id": image.id,
+        "RepoDigests": image.attrs.get("RepoDigests"),
+        "Size": image.attrs.get("Size"),
+        "Labels": image.labels,
+    }
+    verified = store.now_iso()
+    store.catalog_store_images(
+        [_record(normalized_reference(name), summary, verified) for name in references]
+    )
+
+
+@docker_call
+def _image_present(image_id: str) -> bool:
+    """Check that the image is still in the daemon (one inspect call)."""
+    try:
+        docker_client().images.get(image_id)
+    except ImageNotFound:
+        return False
+    except APIError:
+        # the daemon will report its own error at run time:
+        return True
+    return True
+
+
+def require_image(reference: str) -> tuple[str, Image | None]:
+    """Return the image id of the reference, pulling the image if needed.
+
+    Return: tuple(image id or "", pulled image or None)
+    """
+    record = lookup(reference)
+    if record:
+        if _image_present(record["image_id"]):
+            return record["image_id"], None
+        # removed since verified ('docker rmi', 'docker image prune'):
+        store.catalog_remove_images([normalized_reference(reference)])
+    docker_service_start_if_needed()
+    image = docker_require(reference)
+    if image is None:
+        return "", None
+    record_image(image, reference)
+    return image.id, image
+
+
+def nua_images_labels(refresh: bool = False) -> list[dict[str, str]]:
+    """Return the labels of the local Nua images (having a NUA_TAG label).
+
+    If 'refresh', reconcile the catalog first (once per process).
+    """
+    records = store.catalog_images()
+    ttl = catalog_ttl()
+    if (refresh or not all(_is_fresh(r, ttl) for r in records)) and (_reconcile_once()):
+        records = store.catalog_images()
+    labels = {}
+    for record in records:
+        image_labels = record.get("labels") or {}
+        if "NUA_TAG" in image_labels:
+            labels[record["image_id"]] = image_labels
+    return list(labels.values())
@@ -0,0 +1,110 @@
+"""Concurrent acquisition of the images of a deployment.
+
+The required images (app images, then provider images) are deduplicated and
+fetched by a small pool of threads: loading a tar archive and pulling from a
+registry are mostly I/O of the Docker daemon. The progress of the whole stage
+is displayed as the images become available (from the main thread, so the
+output is not interleaved). Each fetch is recorded as a span of the deploy
+trace, child of the span of the calling thread.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from time import perf_counter
+from typing import Any, TypeVar
+
+from nua.lib.panic import info
+from nua.lib.tool.state import verbosity
+
+from .tracing import Span, attached, current_span, span
+
+MAX_PARALLEL_IMAGES = 4
+
+T = TypeVar("T")
+
+
+class ImageProgress:
+    """Aggregated progress of the acquisition of a set of images."""
+
+    def __init__(self, kind: str, total: int):
+        self.kind = kind
+        self.total = total
+        self.done = 0
+        self.start = perf_counter()
+
+    def update(self, name: str, status: str) -> None:
+        self.done += 1
+        with verbosity(0):
+            info(f"{self.kind} images {self.done}/{self.total}: {name} ({status})")
+
+    def finish(self) -> None:
+        with verbosity(1):
+            info(
+                f"{self.total} {self.kind} image(s) ready in "
+                f"{perf_counter() - self.start:.1f}s"
+            )
+
+
+def fetch_images(
+    sources: Iterable[str],
+    fetch: Callable[[str], T],
+    kind: str,
+    on_done: Callable[[str, T], str] | None = None,
+    workers: int = MAX_PARALLEL_IMAGES,
+) -> dict[str, T]:
+    """Call fetch() for each distinct source, in parallel.
+
+    on_done(source, result), called from the calling thread when a fetch
+    succeeds, returns the status to display. The first error is raised once
+    the running fetches are finished (the pending ones are cancelled).
+    """
+    unique = list(dict.fromkeys(sources))
+    results: dict[str, T] = {}
+    if not unique:
+        return results
+    progress = ImageProgress(kind, len(unique))
+    traced_fetch = _traced(fetch, current_span())
+    if len(unique) == 1 or workers < 2:
+        for source in unique:
+            results[source] = _done(traced_fetch(source), source, on_done, progress)
+        progress.finish()
+        return results
+    with ThreadPoolExecutor(
+        min(workers, len(unique)), thread_name_prefix="nua-image"
+    ) as executor:
+        futures = {executor.submit(traced_fetch, source): source for source in unique}
+        pending: set[Any] = set(futures)
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_EXCEPTION)
+            for future in finished:
+                if future.exception() is not None:
+                    for other in pending:
+                        other.cancel()
+                    raise future.exception()  # type: ignore[misc]
+                source = futures[future]
+                results[source] = _done(future.result(), source, on_done, progress)
+    progress.finish()
+    return results
+
+
+def _traced(fetch: Callable[[str], T], parent: Span | None) -> Callable[[str], T]:
+    """Return fetch() recording a span of each call under 'parent'."""
+
+    def traced_fetch(source: str) -> T:
+        with attached(parent), span("fetch_image", label=source):
+            return fetch(source)
+
+    return traced_fetch
+
+
+def _done(
+    result: T,
+    source: str,
+    on_done: Callable[[str, T], str] | None,
+    progress: ImageProgress,
+) -> T:
+    status = on_done(source, result) if on_done else "ok"
+    progress.update(source, status)
+    return result
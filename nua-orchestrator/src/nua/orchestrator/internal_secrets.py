@@ -1,51 +1,169 @@
+"""Secrets passed to the containers at docker.run() time (DB admin passwords).
+
+Secrets are read from an ordered list of backends and kept in memory for the
+life of the process. An entry is reloaded when its source changes: the backends
+return a version token (for files: mtime, size and inode) checked at each
+access, a stat() instead of reading and parsing the file for every started
+container.
+
+Other backends (vault, keyring...) can be added with register_secret_backend().
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections.abc import Hashable, Iterable
 from pathlib import Path
 
 from .db_utils.mariadb_utils import NUA_MARIADB_PWD_FILE
 from .db_utils.postgres_utils import NUA_PG_PWD_FILE
 
+# key of the secret: name of the file in ~nua
+SECRET_FILES = {
+    "POSTGRES_PASSWORD": NUA_PG_PWD_FILE,
+    "MARIADB_ROOT_PASSWORD": NUA_MARIADB_PWD_FILE,
+    "MYSQL_ROOT_PASSWORD": NUA_MARIADB_PWD_FILE,
+}
+# key of the secret: environment variable (used in container context)
+SECRET_ENV = {
+    "POSTGRES_PASSWORD": "NUA_POSTGRES_PASSWORD",
+    "MARIADB_ROOT_PASSWORD": "NUA_MARIADB_PASSWORD",
+    "MYSQL_ROOT_PASSWORD": "NUA_MARIADB_PASSWORD",
+}
 
-def secrets_dict(key_list: list) -> dict:
-    result = {}
-    for key in key_list:
-        val = read_secret(key)
-        if val is not None:
-            result[key] = val
-    return result
 
+class SecretBackend:
+    """Source of secret values.
 
-def read_secret(key: str) -> str | None:
-    if key == "POSTGRES_PASSWORD":
-        return _postgres_pwd()
-    if key in {"MARIADB_ROOT_PASSWORD", "MYSQL_ROOT_PASSWORD"}:
-        return _mariadb_pwd()
-    return None
+    read() returns None for a key unknown to the backend. version() returns a
+    token that changes when the value may have changed, or None if the value
+    must not be cached.
+    """
 
+    def read(self, key: str) -> str | None:
+        raise NotImplementedError
 
-def _postgres_pwd() -> str:
-    """Return the 'postgres' user DB password.
+    def version(self, key: str) -> Hashable | None:
+        return None
 
-    Read the password from local file.
 
-    Assuming this function can only be used *after* password was generated (or it's a
-    bug).
-    """
-    # pwd = os.environ.get("NUA_POSTGRES_PASSWORD")
-    # if pwd:
-    #     return pwd
-    file_path = Path("~nua").expanduser() / NUA_PG_PWD_FILE
-    return file_path.read_text(encoding="utf8").strip()
+class EnvSecretBackend(SecretBackend):
+    def __init__(self, variables: dict[str, str] | None = None):
+        self.variables = SECRET_ENV if variables is None else variables
 
+    def read(self, key: str) -> str | None:
+        if key not in self.variables:
+            return None
+        return os.environ.get(self.variables[key]) or None
 
-def _mariadb_pwd() -> str:
-    """Return the 'root' user DB password of mariadb.
 
-    Read the password from local file.
+class FileSecretBackend(SecretBackend):
+    """Secrets stored in files (one value per file), ~nua by default."""
 
-    Assuming this function can only be used *after* password was generated (or it's a
-    bug).
-    """
-    # pwd = os.environ.get("NUA_MARIADB_PASSWORD")
-    # if pwd:
-    #     return pwd
-    file_path = Path("~nua").expanduser() / NUA_MARIADB_PWD_FILE
-    return file_path.read_text(encoding="utf8").strip()
+    def __init__(
+        self,
+        files: dict[str, str] | None = None,
+        directory: Path | None = None,
+    ):
+        self.files = SECRET_FILES if files is None else files
+        self.directory = directory
+
+    def path(self, key: str) -> Path | None:
+        if key not in self.files:
+            return None
+        directory = self.directory or Path("~nua").expanduser()
+        return directory / self.files[key]
+
+    def read(self, key: str) -> str | None:
+        path = self.path(key)
+        if path is None or not path.is_file():
+            return None
+        return path.read_text(encoding="utf8").strip()
+
+    def version(self, key: str) -> Hashable | None:
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class SecretsService:
+    def __init__(self, backends: Iterable[SecretBackend] = ()):
+        self.backends: list[SecretBackend] = list(backends)
+        # key: (backend, version, value)
+        self._cache: dict[str, tuple[SecretBackend, Hashable, str]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, backend: SecretBackend, first: bool = False) -> None:
+        with self._lock:
+            if first:
+                self.backends.insert(0, backend)
+            else:
+                self.backends.append(backend)
+            self._cache.clear()
+
+    def invalidate(self, key: str | None = None) -> None:
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached:
+                backend, version, value = cached
+                if backend.version(key) == version:
+                    return value
+                del self._cache[key]
+            for backend in self.backends:
+                # version taken before reading: a concurrent change is seen
+                # at next access
+                version = backend.version(key)
+                value = backend.read(key)
+                if value is None:
+                    continue
+                if version is not None:
+                    self._cache[key] = (backend, version, value)
+                return value
+        return None
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, str]:
+        result = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+
+_SERVICE = SecretsService([EnvSecretBackend(), FileSecretBackend()])
+
+
+def secrets_service() -> SecretsService:
+    return _SERVICE
+
+
+def register_secret_backend(backend: SecretBackend, first: bool = False) -> None:
+    """Add a backend, by default after the environment and ~nua files."""
+    _SERVICE.register(backend, first=first)
+
+
+def invalidate_secret(key: str | None = None) -> None:
+    """Forget a cached secret (all secrets if key is None), to call after
+    changing it."""
+    _SERVICE.invalidate(key)
+
+
+def secrets_dict(key_list: list) -> dict:
+    return _SERVICE.get_many(key_list)
+
+
+def read_secret(key: str) -> str | None:
+    return _SERVICE.get(key)
@@ -4,7 +4,7 @@ from nua.lib.docker import display_one_docker_img
 from nua.lib.panic import vprint
 from nua.lib.tool.state import verbosity
 
-from ..docker_utils import pull_docker_image
+from ..image_catalog import require_image
 
 
 @dataclass(frozen=True)
@@ -15,13 +15,11 @@ class LocalServiceBase:
     def _pull_docker_image(self, required_image) -> bool:
         with verbosity(0):
             vprint(f"pulling docker image '{required_image}'")
-        image = pull_docker_image(required_image)
+        image_id, image = require_image(required_image)
         if image:
             with verbosity(0):
                 display_one_docker_img(image)
-            return True
-        else:
-            return False
+        return bool(image_id)
 
     def restart(self) -> bool:
         return True
@@ -0,0 +1,469 @@
+"""Prometheus-style metrics of the orchestrator.
+
+Enabled by the setting `[metrics] enabled = true`. The orchestrator runs as short
+lived commands, so the counters and histograms recorded by a command are added,
+at exit, to the totals kept in the metrics file. The metrics are rendered in the
+Prometheus text format:
+
+- by the command `nua-orchestrator metrics` (also the "metrics" RPC method, used
+  by nua-server),
+- by a small built-in HTTP listener: `nua-orchestrator metrics --serve`.
+
+On each rendering, the resource usage of the Nua containers (containers of an
+image having the NUA_TAG label) is sampled with container.stats().
+"""
+
+from __future__ import annotations
+
+import atexit
+import fcntl
+import functools
+import json
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from time import perf_counter
+from typing import Any
+
+import docker
+from docker.errors import DockerException
+from nua.lib.panic import info, warning
+from nua.lib.tool.state import verbosity
+
+from . import config, tracing
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+GAUGE = "gauge"
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+SIZE_BUCKETS = tuple(float(10**n) for n in range(3, 12))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+STATS_WORKERS = 8
+
+# name: (type, help, buckets)
+METRICS: dict[str, tuple[str, str, tuple[float, ...]]] = {
+    "nua_deploy_phase_seconds": (
+        HISTOGRAM,
+        "Duration of the deployment phases.",
+        DURATION_BUCKETS,
+    ),
+    "nua_deploy_phase_errors_total": (
+        COUNTER,
+        "Deployment phases ended by an error.",
+        (),
+    ),
+    "nua_docker_call_seconds": (
+        HISTOGRAM,
+        "Duration of the calls to the Docker daemon.",
+        DURATION_BUCKETS,
+    ),
+    "nua_docker_call_errors_total": (
+        COUNTER,
+        "Calls to the Docker daemon ended by an error.",
+        (),
+    ),
+    "nua_image_load_seconds": (
+        HISTOGRAM,
+        "Duration of the load of Nua images in the Docker daemon.",
+        DURATION_BUCKETS,
+    ),
+    "nua_image_load_bytes": (
+        HISTOGRAM,
+        "Size of the Nua images loaded in the Docker daemon.",
+        SIZE_BUCKETS,
+    ),
+    "nua_backup_seconds": (
+        HISTOGRAM,
+        "Duration of the backups.",
+        DURATION_BUCKETS,
+    ),
+    "nua_backup_bytes": (
+        HISTOGRAM,
+        "Size of the backups.",
+        SIZE_BUCKETS,
+    ),
+    "nua_backup_errors_total": (
+        COUNTER,
+        "Failed backups.",
+        (),
+    ),
+    "nua_container_cpu_ratio": (
+        GAUGE,
+        "CPU usage of the container, 1.0 is one full CPU.",
+        (),
+    ),
+    "nua_container_memory_bytes": (
+        GAUGE,
+        "Memory usage of the container (without page cache).",
+        (),
+    ),
+    "nua_container_memory_limit_bytes": (
+        GAUGE,
+        "Memory limit of the container.",
+        (),
+    ),
+}
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+class Registry:
+    """Counters and histograms, per metric name and labels.
+
+    A counter value is a float, a histogram value is a dict with the "buckets"
+    cumulative counts, "sum" and "count".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values: dict[str, dict[LabelKey, Any]] = {}
+
+    def inc(self, name: str, labels: dict[str, str], amount: float = 1.0) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self.values.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name: str, labels: dict[str, str], value: float) -> None:
+        buckets = METRICS[name][2]
+        key = _label_key(labels)
+        with self._lock:
+            series = self.values.setdefault(name, {})
+            histo = series.setdefault(
+                key, {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            )
+            for idx, bound in enumerate(buckets):
+                if value <= bound:
+                    histo["buckets"][idx] += 1
+            histo["sum"] += value
+            histo["count"] += 1
+
+    def merge(self, other: Registry) -> None:
+        """Add the values of other registry."""
+        for name, series in other.values.items():
+            mine = self.values.setdefault(name, {})
+            for key, value in series.items():
+                if isinstance(value, dict):
+                    previous = mine.get(key)
+                    if previous is None or len(previous["buckets"]) != len(
+                        value["buckets"]
+                    ):
+                        mine[key] = json.loads(json.dumps(value))
+                        continue
+                    previous["buckets"] = [
+                        a + b for a, b in zip(previous["buckets"], value["buckets"])
+                    ]
+                    previous["sum"] += value["sum"]
+                    previous["count"] += value["count"]
+                else:
+                    mine[key] = mine.get(key, 0.0) + value
+
+    def clear(self) -> None:
+        with self._lock:
+            self.values = {}
+
+    def as_list(self) -> list[dict[str, Any]]:
+        return [
+            {"name": name, "labels": dict(key), "value": value}
+            for name, series in sorted(self.values.items())
+            for key, value in sorted(series.items())
+        ]
+
+    @classmethod
+    def from_list(cls, content: list[dict[str, Any]]) -> Registry:
+        registry = cls()
+        for item in content:
+            if item.get("name") not in METRICS:
+                continue
+            series = registry.values.setdefault(item["name"], {})
+            series[_label_key(item["labels"])] = item["value"]
+        return registry
+
+
+def _label_key(labels: dict[str, str]) -> LabelKey:
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+_registry = Registry()
+
+
+def registry() -> Registry:
+    return _registry
+
+
+def metrics_enabled() -> bool:
+    return bool(config.read("nua", "metrics", "enabled"))
+
+
+def metrics_file() -> Path:
+    return Path(config.read("nua", "metrics", "file") or "/home/nua/metrics.json")
+
+
+def inc(name: str, amount: float = 1.0, **labels: str) -> None:
+    if metrics_enabled():
+        _registry.inc(name, labels, amount)
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    if metrics_enabled():
+        _registry.observe(name, labels, value)
+
+
+@contextmanager
+def timed(name: str, errors: str = "", **labels: str) -> Iterator[None]:
+    """Observe the duration of the block in the 'name' histogram, and count
+    the exceptions in the 'errors' counter."""
+    if not metrics_enabled():
+        yield
+        return
+    t0 = perf_counter()
+    try:
+        yield
+    except BaseException:
+        if errors:
+            _registry.inc(errors, labels)
+        raise
+    finally:
+        _registry.observe(name, labels, perf_counter() - t0)
+
+
+def instrumented(name: str, errors: str = "", label: str = "call") -> Callable:
+    """Decorator: time the function, labelled by its name."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name, errors, **{label: func.__name__}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def deploy_phase(func: Callable) -> Callable:
+    """Decorator of the AppDeployer phases: metrics and span of the trace."""
+    timed_func = instrumented(
+        "nua_deploy_phase_seconds", "nua_deploy_phase_errors_total", "phase"
+    )(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracing.span(func.__name__, label=tracing.app_label(args)):
+            return timed_func(*args, **kwargs)
+
+    return wrapper
+
+
+def docker_call(func: Callable) -> Callable:
+    """Decorator of the docker_utils calls: metrics and count in the trace."""
+    timed_func = instrumented(
+        "nua_docker_call_seconds", "nua_docker_call_errors_total"
+    )(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracing.docker_call():
+            return timed_func(*args, **kwargs)
+
+    return wrapper
+
+
+def flush() -> None:
+    """Add the metrics of this command to the metrics file."""
+    if not _registry.values or not metrics_enabled():
+        return
+    path = metrics_file()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a+", encoding="utf8") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            handle.seek(0)
+            total = _load(handle.read())
+            total.merge(_registry)
+            handle.seek(0)
+            handle.truncate()
+            json.dump(total.as_list(), handle)
+    except OSError as e:
+        with verbosity(2):
+            warning(f"Metrics not saved: {e}")
+        return
+    _registry.clear()
+
+
+def _load(content: str) -> Registry:
+    try:
+        return Registry.from_list(json.loads(content or "[]"))
+    except (ValueError, KeyError, TypeError):
+        return Registry()
+
+
+def load_metrics() -> Registry:
+    """Return the saved metrics plus the metrics of this command."""
+    total = Registry()
+    path = metrics_file()
+    if path.is_file():
+        with path.open(encoding="utf8") as handle:
+            fcntl.flock(handle, fcntl.LOCK_SH)
+            total = _load(handle.read())
+    total.merge(_registry)
+    return total
+
+
+atexit.register(flush)
+
+
+def container_stats() -> list[tuple[str, dict[str, str], float]]:
+    """Sample the resource usage of the Nua containers.
+
+    Return the (metric name, labels, value) gauges.
+    """
+    try:
+        client = docker.from_env()
+        containers = client.containers.list(filters={"label": "NUA_TAG"})
+    except DockerException as e:
+        with verbosity(2):
+            warning(f"Container stats not available: {e}")
+        return []
+    if not containers:
+        return []
+    with ThreadPoolExecutor(min(STATS_WORKERS, len(containers))) as executor:
+        stats = list(executor.map(_one_container_stats, containers))
+    gauges = []
+    for container, stat in zip(containers, stats):
+        if not stat:
+            continue
+        labels = {
+            "container": container.name,
+            "app_id": container.labels.get("APP_ID", ""),
+        }
+        gauges.extend((name, labels, value) for name, value in stat.items())
+    return gauges
+
+
+def _one_container_stats(container) -> dict[str, float]:
+    try:
+        stats = container.stats(stream=False)
+    except DockerException:
+        return {}
+    return parse_stats(stats)
+
+
+def parse_stats(stats: dict[str, Any]) -> dict[str, float]:
+    """Return the gauges from the result of the Docker stats API."""
+    result = {}
+    cpu = stats.get("cpu_stats") or {}
+    precpu = stats.get("precpu_stats") or {}
+    cpu_delta = cpu.get("cpu_usage", {}).get("total_usage", 0) - precpu.get(
+        "cpu_usage", {}
+    ).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    online_cpus = cpu.get("online_cpus") or len(
+        cpu.get("cpu_usage", {}).get("percpu_usage") or [1]
+    )
+    if system_delta > 0 and cpu_delta >= 0:
+        result["nua_container_cpu_ratio"] = cpu_delta / system_delta * online_cpus
+    memory = stats.get("memory_stats") or {}
+    if "usage" in memory:
+        details = memory.get("stats") or {}
+        # cgroup v2: inactive_file, cgroup v1: total_inactive_file
+        cache = details.get("inactive_file", details.get("total_inactive_file", 0))
+        result["nua_container_memory_bytes"] = float(memory["usage"] - cache)
+    if memory.get("limit"):
+        result["nua_container_memory_limit_bytes"] = float(memory["limit"])
+    return result
+
+
+def render(
+    metrics: Registry,
+    gauges: list[tuple[str, dict[str, str], float]] | None = None,
+) -> str:
+    """Return the metrics in the Prometheus text format."""
+    gauge_series: dict[str, list[tuple[dict[str, str], float]]] = {}
+    for name, labels, value in gauges or []:
+        gauge_series.setdefault(name, []).append((labels, value))
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        if kind == GAUGE:
+            series = gauge_series.get(name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+            continue
+        values = metrics.values.get(name)
+        if not values:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, value in sorted(values.items()):
+            labels = dict(key)
+            if kind == COUNTER:
+                lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+                continue
+            for bound, count in zip(buckets, value["buckets"]):
+                bucket_labels = {**labels, "le": _number(bound)}
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+            inf_labels = {**labels, "le": "+Inf"}
+            lines.append(f"{name}_bucket{_format_labels(inf_labels)} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_number(value['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    content = ",".join(
+        f'{key}="{_escape(str(val))}"' for key, val in sorted(labels.items())
+    )
+    return f"{{{content}}}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value))
+
+
+def metrics_text(with_containers: bool = True) -> str:
+    gauges = container_stats() if with_containers else []
+    return render(load_metrics(), gauges)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics_text().encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(host: str = "", port: int = 0) -> None:
+    """Serve the metrics on http://host:port/metrics until interrupted."""
+    host = host or config.read("nua", "metrics", "host") or "127.0.0.1"
+    port = port or config.read("nua", "metrics", "port") or 9120
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    with verbosity(0):
+        info(f"Serving metrics on http://{host}:{port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -6,9 +6,22 @@ Environment variables:
     NUA_DB_LOCAL_DIR:
         if DB is local, directory to make if not exists. Option useful
         for SQLite.
+
+Startup does not write to the DB when nothing changed: the settings are stored
+again only if their content differs (or for a first launch or a version
+upgrade). For SQLite, a snapshot of the settings is kept in a file next to the
+DB ("nua.db.settings.json"), valid while the DB files are not modified, so the
+read-only commands don't query the DB for the configuration.
+
+The snapshot is taken after a checkpoint of the write-ahead log: the DB file
+then contains all the commits, and the empty log, deleted by SQLite when the
+last connection closes, is not part of the version of the DB files.
 """
 
+import hashlib
+import json
 import os
+from contextlib import suppress
 from importlib import resources as rso
 from pathlib import Path
 
@@ -18,19 +31,27 @@ from nua.lib.console import print_green, print_red
 from . import __version__, config
 from .db import store
 from .db.create import create_base
-from .db.session import configure_session
+from .db.session import checkpoint_wal, configure_session
+from .db_migration.migrations import SCHEMA_VERSION, apply_migrations
 from .util.deep_access_dict import DeepAccessDict
 
 __all__ = ["setup_nua_db"]
 
+# includes the change counter (DB file) and the checkpoint salts (WAL file):
+DB_HEADER_SIZE = 32
+
 
 def setup_nua_db():
     """Create the db if needed and also populate the configuration from both db values
     and default parameters."""
     get_db_uri()
-    create_base()
+    snapshot = load_settings_snapshot()
+    if snapshot is None:
+        create_base()
     configure_session()
-    setup_first_launch()
+    if snapshot is None:
+        apply_migrations()
+    setup_first_launch(snapshot)
 
 
 def default_config() -> dict:
@@ -54,7 +75,7 @@ def update_default_settings(settings):
     config.set("nua", "ssh", "address", existing_nua_config.read("ssh", "address"))
     config.set("nua", "ssh", "port", existing_nua_config.read("ssh", "port"))
     # store to DB
-    store.set_nua_settings(config.read("nua"))
+    store_settings(config.read("nua"))
 
 
 def set_default_settings():
@@ -66,7 +87,7 @@ def set_default_settings():
     config.set("nua", "instance", "")
     config.set("nua", "version", __version__)
     # store to DB
-    store.set_nua_settings(config.read("nua"))
+    store_settings(config.read("nua"))
 
 
 def set_db_url_in_settings(settings):
@@ -77,12 +98,18 @@ def set_db_url_in_settings(settings):
     existing_nua_config.set("db", "local_dir", current_db_local_dir)
     # update live config
     config.set("nua", existing_nua_config)
-    # store to DB checked/updated/completed config
-    store.set_nua_settings(config.read("nua"))
+    # store to DB checked/updated/completed config, if changed
+    if settings_hash(config.read("nua")) != settings_hash(settings):
+        store_settings(config.read("nua"))
 
 
-def setup_first_launch():
-    settings = store.installed_nua_settings()
+def setup_first_launch(settings: dict | None = None):
+    """Set the live configuration from the settings stored in the DB (or from
+    their snapshot)."""
+    if settings is None:
+        settings = store.installed_nua_settings()
+        if settings:
+            save_settings_snapshot(settings)
     if not settings:
         print_green(
             f"First launch: set Nua defaults in '{config.read('nua', 'db', 'url')}'"
@@ -100,6 +127,99 @@ def setup_first_launch():
         return update_default_settings(settings)
 
 
+def store_settings(settings: dict) -> None:
+    store.set_nua_settings(settings)
+    save_settings_snapshot(settings)
+
+
+def settings_hash(settings: dict) -> str:
+    content = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf8")).hexdigest()
+
+
+def _sqlite_db_path() -> Path | None:
+    url = config.read("nua", "db", "url") or ""
+    prefix = "sqlite:///"
+    if not url.startswith(prefix) or url == prefix or ":memory:" in url:
+        return None
+    return Path(url[len(prefix) :])
+
+
+def _db_files_version(db_path: Path) -> list | None:
+    """Return the modification time, size and header of the DB file and of its
+    write-ahead log, None if no DB.
+
+    The headers contain the change counter of the DB file and the salts of the
+    WAL, modified by commits even within the resolution of mtime. An empty WAL
+    is the same as no WAL.
+    """
+    version = []
+    for path in (db_path, db_path.with_name(f"{db_path.name}-wal")):
+        try:
+            stat = path.stat()
+            with path.open("rb") as rfile:
+                header = rfile.read(DB_HEADER_SIZE)
+        except OSError:
+            if path == db_path:
+                return None
+            continue
+        if path != db_path and stat.st_size == 0:
+            continue
+        version.append([stat.st_mtime_ns, stat.st_size, header.hex()])
+    return version
+
+
+def _snapshot_path(db_path: Path) -> Path:
+    return db_path.with_name(f"{db_path.name}.settings.json")
+
+
+def load_settings_snapshot() -> dict | None:
+    """Return the snapshot of the settings if the DB was not modified since it
+    was taken, else None."""
+    db_path = _sqlite_db_path()
+    if db_path is None:
+        return None
+    version = _db_files_version(db_path)
+    if version is None:
+        return None
+    try:
+        snapshot = json.loads(_snapshot_path(db_path).read_text(encoding="utf8"))
+    except (OSError, ValueError):
+        return None
+    if (
+        snapshot.get("db_version") != version
+        or snapshot.get("schema") != SCHEMA_VERSION
+    ):
+        return None
+    settings = snapshot.get("settings")
+    if not settings or snapshot.get("hash") != settings_hash(settings):
+        return None
+    return settings
+
+
+def save_settings_snapshot(settings: dict) -> None:
+    """Save the settings, as stored in the current state of the DB files."""
+    db_path = _sqlite_db_path()
+    if db_path is None or not checkpoint_wal():
+        return
+    version = _db_files_version(db_path)
+    if version is None:
+        return
+    snapshot = {
+        "db_version": version,
+        "schema": SCHEMA_VERSION,
+        "hash": settings_hash(settings),
+        "settings": settings,
+    }
+    path = _snapshot_path(db_path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}")
+    # best effort: the snapshot is only a cache
+    with suppress(OSError, TypeError, ValueError):
+        tmp_path.write_text(json.dumps(snapshot, default=str), encoding="utf8")
+        tmp_path.chmod(0o600)
+        tmp_path.replace(path)
+
+
 def get_db_uri() -> None:
     # environment:
     url = os.environ.get("NUA_DB_URL", "")
@@ -222,11 +222,24 @@ class Provider(dict):
     def docker(self, docker: dict):
         self["docker"] = docker
 
+    @property
+    def resources(self) -> dict:
+        """Resource requests of the container (see resource_planner)."""
+        return self.get("resources") or {}
+
     @property
     def post_run(self) -> list[str]:
         """Return the image original nua-config 'run/post-run' value."""
         return force_list(self.config_run.get("post-run") or "")
 
+    @property
+    def post_run_parallel(self) -> bool:
+        """Return the image original nua-config 'run/post-run-parallel' value.
+
+        If True, the post-run commands are independent and can run concurrently.
+        """
+        return bool(self.config_run.get("post-run-parallel"))
+
     @property
     def post_run_status(self) -> str:
         """Return the image original nua-config 'run/post-run-status' value."""
@@ -350,7 +363,7 @@ class Provider(dict):
 
     def _parse_backup(self, config: dict | None = None):
         if config:
-            self.backup = config
+            self.backup = deepcopy(config)
         else:
             self.backup = {}
 
@@ -392,9 +405,12 @@ class Provider(dict):
         self.volumes = Volume.normalize_list(volume_list)
 
     def rebased_volumes_upon_package_conf(self, config_dict: dict) -> list:
-        """warning: here, no update of self data"""
+        """warning: here, no update of self data
+
+        The config_dict may be shared between instances of the same image: the
+        returned volumes are copies."""
         base_list = config_dict.get("volume") or []
-        base_list = [vol for vol in base_list if vol]
+        base_list = [deepcopy(vol) for vol in base_list if vol]
         if not base_list:
             # if volumes are not configured in the package nua-config, there
             # is no point to add volumes in the instance configuration
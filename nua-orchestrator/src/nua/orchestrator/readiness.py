@@ -0,0 +1,135 @@
+"""Readiness checks of a new container, before switching the traffic to it.
+
+- if the app declares a healthcheck: wait for the "healthy" Docker status,
+- else wait for the container to run and its web port to accept connections,
+- and, if a readiness path is configured, for a non 5xx HTTP response.
+"""
+
+from __future__ import annotations
+
+import socket
+from time import monotonic, sleep
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from nua.lib.panic import info, warning
+from nua.lib.tool.state import verbosity
+
+from .docker_events import REMOVED, wait_container_state
+from .docker_utils import docker_container_of_name
+from .healthcheck import HealthCheck
+from .provider import Provider
+
+PROBE_INTERVAL = 0.5
+PROBE_HOST = "127.0.0.1"
+
+
+def container_health(name: str) -> str:
+    """Return the health status of the container, or its status if it has no
+    healthcheck (or REMOVED)."""
+    container = docker_container_of_name(name)
+    if container is None:
+        return REMOVED
+    if container.status != "running":
+        return container.status
+    health = container.attrs.get("State", {}).get("Health")
+    if health:
+        return health.get("Status", "starting")
+    return container.status
+
+
+def wait_container_healthy(name: str, timeout: float) -> bool:
+    state = wait_container_state(
+        name,
+        ("healthy", "unhealthy", "exited", "dead", REMOVED),
+        timeout,
+        lambda: container_health(name),
+    )
+    return state == "healthy"
+
+
+def wait_container_running(name: str, timeout: float) -> bool:
+    state = wait_container_state(
+        name,
+        ("running", "exited", "dead", REMOVED),
+        timeout,
+        lambda: container_health(name),
+    )
+    # "running" or "starting"/"healthy" if there is a healthcheck:
+    return state == "running"
+
+
+def wait_tcp_port(port: int, timeout: float, host: str = PROBE_HOST) -> bool:
+    deadline = monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=PROBE_INTERVAL):
+                return True
+        except OSError:
+            if monotonic() > deadline:
+                return False
+            sleep(PROBE_INTERVAL)
+
+
+def wait_http_ready(
+    port: int,
+    path: str,
+    timeout: float,
+    host: str = PROBE_HOST,
+) -> bool:
+    """Wait for an HTTP response that is not a server error."""
+    url = f"http://{host}:{port}/{path.lstrip('/')}"
+    deadline = monotonic() + timeout
+    while True:
+        try:
+            with urlopen(url, timeout=PROBE_INTERVAL * 4):
+                return True
+        except HTTPError as e:
+            if e.code < 500:
+                return True
+        except (URLError, OSError):
+            pass
+        if monotonic() > deadline:
+            return False
+        sleep(PROBE_INTERVAL)
+
+
+def web_port(rsite: Provider) -> int | None:
+    """Return the host port of the first web port of the container."""
+    for port in rsite.port_list:
+        if port.get("web") and port.get("host_use"):
+            return int(port["host_use"])
+    return None
+
+
+def wait_ready(
+    rsite: Provider,
+    container_name: str,
+    timeout: float,
+    readiness_path: str = "",
+) -> bool:
+    """Wait until the container of rsite is ready to receive traffic."""
+    deadline = monotonic() + timeout
+    healthcheck = HealthCheck(rsite.healthcheck)
+    if healthcheck.as_dict().get("command"):
+        with verbosity(0):
+            info(f"Waiting for healthy status of '{container_name}'")
+        timeout = max(timeout, healthcheck.startup_timeout())
+        ready = wait_container_healthy(container_name, timeout)
+    else:
+        with verbosity(0):
+            info(f"Waiting for '{container_name}' to accept connections")
+        ready = wait_container_running(container_name, timeout)
+        port = web_port(rsite)
+        if ready and port:
+            ready = wait_tcp_port(port, max(deadline - monotonic(), 1))
+    if ready and readiness_path:
+        port = web_port(rsite)
+        if port:
+            ready = wait_http_ready(
+                port, readiness_path, max(deadline - monotonic(), 1)
+            )
+    if not ready:
+        with verbosity(0):
+            warning(f"Container '{container_name}' is not ready")
+    return ready
@@ -0,0 +1,326 @@
+"""Resource limits of the containers, derived from the host capacity.
+
+The planner shares the CPUs and memory of the host (minus a reserve for the
+host itself: Nginx, Docker, local databases) between all the containers of
+the deployment, apps and their docker providers:
+
+- a container may request explicit limits in the "resources" section of its
+  deploy configuration: 'cpus' (float), 'memory' and 'memory_reservation'
+  (Docker size strings like "512M"), 'pids', 'cpuset' (Docker cpuset string),
+- explicit limits are allocated first, the other containers share the
+  remaining capacity proportionally to their 'weight' (default 1),
+- a container with 'pin = true' gets dedicated CPUs (cpuset_cpus), allocated
+  from the last CPUs of the host, the first ones being left to the host,
+- the memory reservation (soft limit) is 'reservation_ratio' of the limit.
+
+The planner is disabled by default ('enabled' in the [resources] settings).
+The plan is computed for all the containers before any of them is started,
+overcommit (explicit limits or pinned CPUs exceeding the capacity) is
+reported then.
+
+Example of deploy configuration:
+
+    [[site]]
+    image = "hedgedoc:1.9.7-3"
+    domain = "test.example.com"
+    resources = { weight = 2, memory = "2G", pin = true, cpus = 2 }
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from nua.lib.panic import Abort, info, show, warning
+from nua.lib.tool.state import verbosity
+
+from . import config
+from .app_instance import AppInstance
+
+NANO = 1_000_000_000
+MIN_CPUS = 0.1
+MIN_MEMORY = 64 * 1024 * 1024
+DEFAULT_RESERVED_CPUS = 1.0
+DEFAULT_RESERVED_MEMORY = "1G"
+DEFAULT_RESERVATION_RATIO = 0.5
+DEFAULT_PIDS_LIMIT = 1024
+# on overcommit: "warn" or "abort" the deployment
+DEFAULT_OVERCOMMIT = "warn"
+UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+
+@dataclass
+class HostCapacity:
+    # ids of the CPUs usable by the containers:
+    cpus: list[int]
+    memory: int
+
+    @classmethod
+    def current(cls) -> HostCapacity:
+        try:
+            cpus = sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            cpus = list(range(os.cpu_count() or 1))
+        return cls(cpus=cpus, memory=_host_memory())
+
+
+@dataclass
+class Allocation:
+    name: str
+    nano_cpus: int
+    mem_limit: int
+    mem_reservation: int
+    pids_limit: int
+    cpuset_cpus: str = ""
+
+    def as_docker_params(self) -> dict[str, Any]:
+        params: dict[str, Any] = {
+            "nano_cpus": self.nano_cpus,
+            "mem_limit": self.mem_limit,
+            "mem_reservation": self.mem_reservation,
+            "pids_limit": self.pids_limit,
+        }
+        if self.cpuset_cpus:
+            params["cpuset_cpus"] = self.cpuset_cpus
+        return params
+
+
+@dataclass
+class ResourcePlan:
+    host: HostCapacity
+    allocations: dict[str, Allocation] = field(default_factory=dict)
+    overcommit: list[str] = field(default_factory=list)
+
+    def allocation(self, name: str) -> Allocation | None:
+        return self.allocations.get(name)
+
+
+@dataclass
+class _Request:
+    name: str
+    weight: float
+    cpus: float | None
+    memory: int | None
+    reservation: int | None
+    pids: int | None
+    cpuset: str
+    pin: bool
+
+
+def parse_size(value: float | str) -> int:
+    """Return the number of bytes of a Docker size: 512, "512M", "2g", "1.5G"."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = value.strip().lower().removesuffix("ib").removesuffix("b")
+    number = text.rstrip("kmgt")
+    unit = text[len(number) :]
+    if unit not in UNITS or not number:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(number) * UNITS[unit])
+
+
+def _host_memory() -> int:
+    try:
+        with open("/proc/meminfo", encoding="utf8") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def _setting(key: str, default: Any) -> Any:
+    value = config.read("nua", "resources", key)
+    return default if value is None else value
+
+
+def planner_enabled() -> bool:
+    """The planner is opt-in: "enabled = true" in the [resources] settings."""
+    return bool(_setting("enabled", False))
+
+
+def _request(name: str, resources: dict[str, Any]) -> _Request:
+    def optional(key: str, convert: Any) -> Any:
+        value = resources.get(key)
+        return None if value in (None, "") else convert(value)
+
+    return _Request(
+        name=name,
+        weight=max(float(resources.get("weight", 1)), 0.0),
+        cpus=optional("cpus", float),
+        memory=optional("memory", parse_size),
+        reservation=optional("memory_reservation", parse_size),
+        pids=optional("pids", int),
+        cpuset=str(resources.get("cpuset") or ""),
+        pin=bool(resources.get("pin")),
+    )
+
+
+def _cpuset(cpus: list[int]) -> str:
+    """Return the Docker cpuset string of a list of CPU ids: "2-4,7"."""
+    ranges: list[str] = []
+    start = previous = cpus[0]
+    for cpu in [*cpus[1:], None]:
+        if cpu is not None and cpu == previous + 1:
+            previous = cpu
+            continue
+        ranges.append(str(start) if start == previous else f"{start}-{previous}")
+        if cpu is not None:
+            start = previous = cpu
+    return ",".join(ranges)
+
+
+def _weighted_shares(
+    requests: list[_Request], explicit: dict[str, float], capacity: float
+) -> dict[str, float]:
+    """Explicit values, and share of the remaining capacity for the others."""
+    shares = dict(explicit)
+    others = [request for request in requests if request.name not in explicit]
+    total_weight = sum(request.weight for request in others)
+    remaining = max(capacity - sum(explicit.values()), 0.0)
+    for request in others:
+        if total_weight:
+            shares[request.name] = remaining * request.weight / total_weight
+        else:
+            shares[request.name] = remaining / len(others)
+    return shares
+
+
+def plan(
+    containers: list[tuple[str, dict[str, Any]]],
+    host: HostCapacity | None = None,
+) -> ResourcePlan:
+    """Compute the allocations of the containers.
+
+    containers: list of (container name, "resources" section of the deploy config)
+    """
+    if host is None:
+        host = HostCapacity.current()
+    result = ResourcePlan(host=host)
+    requests = [_request(name, resources) for name, resources in containers]
+    if not requests:
+        return result
+    reserved_cpus = min(
+        float(_setting("reserved_cpus", DEFAULT_RESERVED_CPUS)), len(host.cpus) - 1
+    )
+    reserved_memory = parse_size(_setting("reserved_memory", DEFAULT_RESERVED_MEMORY))
+    cpus = max(len(host.cpus) - max(reserved_cpus, 0.0), MIN_CPUS)
+    memory = max(host.memory - reserved_memory, MIN_MEMORY)
+    ratio = float(_setting("reservation_ratio", DEFAULT_RESERVATION_RATIO))
+    pids_limit = int(_setting("pids_limit", DEFAULT_PIDS_LIMIT))
+
+    explicit_cpus = {r.name: r.cpus for r in requests if r.cpus is not None}
+    explicit_memory = {r.name: r.memory for r in requests if r.memory is not None}
+    _check_total(result, "CPU limits", sum(explicit_cpus.values()), cpus, _cpus)
+    _check_total(result, "memory limits", sum(explicit_memory.values()), memory, _gib)
+    cpu_shares = _weighted_shares(requests, explicit_cpus, cpus)
+    memory_shares = _weighted_shares(requests, explicit_memory, memory)
+    cpusets = _pinned_cpusets(result, requests, cpu_shares, int(reserved_cpus))
+
+    for request in requests:
+        cpu_limit = min(max(cpu_shares[request.name], MIN_CPUS), len(host.cpus))
+        mem_limit = max(int(memory_shares[request.name]), MIN_MEMORY)
+        if request.reservation is None:
+            reservation = int(mem_limit * ratio)
+        else:
+            reservation = min(request.reservation, mem_limit)
+        result.allocations[request.name] = Allocation(
+            name=request.name,
+            nano_cpus=int(cpu_limit * NANO),
+            mem_limit=mem_limit,
+            mem_reservation=reservation,
+            pids_limit=request.pids or pids_limit,
+            cpuset_cpus=request.cpuset or cpusets.get(request.name, ""),
+        )
+    total_reservation = sum(a.mem_reservation for a in result.allocations.values())
+    _check_total(result, "memory reservations", total_reservation, memory, _gib)
+    return result
+
+
+def _pinned_cpusets(
+    result: ResourcePlan,
+    requests: list[_Request],
+    cpu_shares: dict[str, float],
+    reserved: int,
+) -> dict[str, str]:
+    """Allocate dedicated CPUs to the pinned containers, from the last CPU."""
+    free = result.host.cpus[max(reserved, 0) :]
+    cpusets = {}
+    for request in requests:
+        if not request.pin or request.cpuset:
+            continue
+        count = max(math.ceil(cpu_shares[request.name] - 1e-9), 1)
+        if count > len(free):
+            result.overcommit.append(
+                f"{request.name}: {count} CPUs to pin, {len(free)} free, not pinned"
+            )
+            continue
+        pinned = sorted(free[-count:])
+        free = free[:-count]
+        cpusets[request.name] = _cpuset(pinned)
+    return cpusets
+
+
+def _check_total(
+    result: ResourcePlan,
+    title: str,
+    requested: float,
+    capacity: float,
+    fmt: Callable[[float], str],
+) -> None:
+    if requested > capacity:
+        result.overcommit.append(
+            f"{title}: {fmt(requested)} requested, {fmt(capacity)} available"
+        )
+
+
+def _cpus(cpus: float) -> str:
+    return f"{cpus:.2f} CPUs"
+
+
+def _gib(size: float) -> str:
+    return f"{size / 1024**3:.2f} GiB"
+
+
+def plan_apps(
+    apps: list[AppInstance], host: HostCapacity | None = None
+) -> ResourcePlan:
+    """Compute the allocations of the containers of the apps (and their docker
+    providers)."""
+    containers = []
+    for app in apps:
+        containers.append((app.container_name, app.resources))
+        for provider in app.providers:
+            if provider.is_docker_type():
+                containers.append((provider.container_name, provider.resources))
+    return plan(containers, host)
+
+
+def report(resource_plan: ResourcePlan) -> None:
+    """Display the allocations, warn about overcommit (or abort, depending on
+    the 'overcommit' setting)."""
+    host = resource_plan.host
+    with verbosity(2):
+        info(
+            f"Host capacity: {len(host.cpus)} CPUs, {_gib(host.memory)}, "
+            "resource limits:"
+        )
+        for allocation in resource_plan.allocations.values():
+            show(
+                f"{allocation.name}: {_cpus(allocation.nano_cpus / NANO)} "
+                f"{allocation.cpuset_cpus}, memory {_gib(allocation.mem_limit)} "
+                f"(reserved {_gib(allocation.mem_reservation)}), "
+                f"pids {allocation.pids_limit}"
+            )
+    if not resource_plan.overcommit:
+        return
+    if _setting("overcommit", DEFAULT_OVERCOMMIT) == "abort":
+        raise Abort(
+            "Host resources overcommitted:\n" + "\n".join(resource_plan.overcommit)
+        )
+    for message in resource_plan.overcommit:
+        warning(f"Resources overcommitted: {message}")
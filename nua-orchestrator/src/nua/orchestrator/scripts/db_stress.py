@@ -0,0 +1,123 @@
+"""Concurrency stress benchmark of the orchestrator DB.
+
+Several processes (like the CLI, the RPC calls of nua-server and the backup
+cron) read and write the same SQLite DB. Each worker runs a mix of writes
+(instance records, deployment states) and reads (listings), and reports
+its latencies and failed operations.
+
+    python -m nua.orchestrator.scripts.db_stress --workers 8 --operations 300
+    python -m nua.orchestrator.scripts.db_stress --baseline  # untuned engine
+"""
+
+from __future__ import annotations
+
+import statistics
+import tempfile
+import time
+from multiprocessing import get_context
+from pathlib import Path
+
+import typer
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from .. import config
+from ..db import session as db_session
+from ..db import store
+from ..db.create import create_base
+
+app = typer.Typer()
+
+# one read out of WRITE_EVERY operations is replaced by a write:
+WRITE_EVERY = 3
+
+
+def _configure_worker(url: str, baseline: bool) -> None:
+    config.set("nua", "db", "url", url)
+    if baseline:
+        # SQLAlchemy defaults: rollback journal, no pool, no retry
+        engine = create_engine(url)
+        db_session.LOCK_RETRIES = 0
+        db_session.Session.configure(bind=engine)
+        db_session.ReadSession.configure(bind=engine)
+    else:
+        db_session.configure_session()
+
+
+def _operation(worker: int, index: int) -> None:
+    if index % WRITE_EVERY:
+        store.list_instances_fields()
+        store.deploy_config_last_one()
+        return
+    label = f"app-{worker}-{index % 10}"
+    store.store_instance(
+        app_id="stress",
+        label_id=label,
+        site_config={"env": {"INDEX": str(index)}, "persistent": {}},
+    )
+    store.deploy_config_add_config({"apps": [label]}, 0, "inactive")
+
+
+def worker_run(url: str, worker: int, operations: int, baseline: bool) -> dict:
+    """Run the operations, return the latencies (seconds) and errors."""
+    _configure_worker(url, baseline)
+    latencies = []
+    errors = 0
+    for index in range(operations):
+        start = time.perf_counter()
+        try:
+            _operation(worker, index)
+        except OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    return {"latencies": latencies, "errors": errors}
+
+
+def stress(
+    db_path: Path,
+    workers: int = 4,
+    operations: int = 200,
+    baseline: bool = False,
+) -> dict:
+    """Run the workers in parallel processes, return the aggregated results."""
+    url = f"sqlite:///{db_path}"
+    config.set("nua", "db", "url", url)
+    create_base()
+    start = time.perf_counter()
+    with get_context("spawn").Pool(workers) as pool:
+        results = pool.starmap(
+            worker_run,
+            [(url, worker, operations, baseline) for worker in range(workers)],
+        )
+    duration = time.perf_counter() - start
+    latencies = sorted(lat for result in results for lat in result["latencies"])
+    done = len(latencies)
+    return {
+        "duration": duration,
+        "operations": done,
+        "errors": sum(result["errors"] for result in results),
+        "ops_per_second": done / duration if duration else 0.0,
+        "median_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99_ms": latencies[int(done * 0.99) - 1] * 1000 if latencies else 0.0,
+    }
+
+
+@app.command()
+def main(
+    workers: int = typer.Option(8, help="Number of concurrent processes."),
+    operations: int = typer.Option(300, help="Operations per process."),
+    baseline: bool = typer.Option(False, help="Use the untuned SQLAlchemy engine."),
+):
+    """Stress the orchestrator DB with concurrent processes."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result = stress(Path(tmp_dir) / "nua.db", workers, operations, baseline)
+    print(
+        f"{result['operations']} operations in {result['duration']:.2f}s "
+        f"({result['ops_per_second']:.0f}/s), {result['errors']} errors, "
+        f"median {result['median_ms']:.1f}ms, p99 {result['p99_ms']:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    app()
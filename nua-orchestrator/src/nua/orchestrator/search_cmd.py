@@ -1,5 +1,4 @@
-"""Nua : search image related funcitons.
-"""
+"""Nua : search image related funcitons."""
 
 from collections.abc import Generator
 from operator import itemgetter
@@ -13,41 +12,58 @@ from packaging.version import Version
 from packaging.version import parse as parse_version
 
 from . import config
-from .docker_utils import local_nua_images
+from .docker_registry import find_registry_tags
+from .image_catalog import nua_images_labels
 
 
 def image_available_locally(app_name: str) -> bool:
-    """Return True if image of app_name is available in local Docker daemon."""
+    """Return True if image of app_name is available in local Docker daemon.
+
+    The images are found in the image catalog, updated from the daemon only if
+    not found or outdated.
+    """
     app, tag = parse_app_name(app_name)
-    if tag:
-        nua_tag = f"nua-{app}:{tag}"
-        for image in local_nua_images():
-            if image.labels["NUA_TAG"] == nua_tag:
+    for refresh in (False, True):
+        for labels in nua_images_labels(refresh):
+            if tag and labels["NUA_TAG"] == f"nua-{app}:{tag}":
                 return True
-    else:
-        for image in local_nua_images():
-            if image.labels["APP_ID"] == app:
+            if not tag and labels.get("APP_ID") == app:
                 return True
     return False
 
 
-def search_nua(app_name: str) -> list[Path]:
+def search_nua(app_name: str) -> list[Path | str]:
     """Search Nua image from the registries.
 
-    (local registry for now).
-
     Return:
-        list of path of local Nua archives sorted by version.
+        list of path of local Nua archives or url of registry images, sorted
+        by version, the preferred last: for a same version, the registry of
+        lowest priority value (first of list_registries()) is the last.
     """
     app, tag = parse_app_name(app_name)
-    return search_docker_tar_local(app, tag)
-
+    results: list[tuple[Version, int, Path | str]] = []
+    for registry in list_registries():
+        if _is_local_tar(registry):
+            if tag:
+                paths = find_local_tar_tagged(registry, app, tag)
+            else:
+                paths = find_local_tar_untagged(registry, app)
+            results.extend(
+                (_path_tar_version(path), registry["priority"], path) for path in paths
+            )
+        elif _is_docker_registry(registry):
+            results.extend(
+                (tag_version(name), registry["priority"], url)
+                for name, url in find_registry_tags(registry, app, tag)
+            )
+    with verbosity(4):
+        vprint(f"search_nua list: {results}")
+    results.sort(key=lambda item: (item[0], -item[1]))
+    return [item[2] for item in results]
 
-def search_nua_print(app_name: str) -> list[Path]:
-    """Search Nua image from the registries.
 
-    (local registry for now).
-    """
+def search_nua_print(app_name: str) -> list[Path | str]:
+    """Search Nua image from the registries."""
     print_magenta(f"Search image '{app_name}'")
     results = search_nua(app_name)
     if results:
@@ -76,13 +92,13 @@ def parse_app_name(app_name: str) -> tuple:
     return (app, tag)
 
 
-def list_registry_docker_tar_local() -> list:
+def list_registries() -> list:
     registries = config.read("nua", "registry") or []
-    return [
-        reg
-        for reg in sorted(registries, key=itemgetter("priority"))
-        if _is_local_tar(reg)
-    ]
+    return sorted(registries, key=itemgetter("priority"))
+
+
+def list_registry_docker_tar_local() -> list:
+    return [reg for reg in list_registries() if _is_local_tar(reg)]
 
 
 def _is_local_tar(reg) -> bool:
@@ -92,9 +108,18 @@ def _is_local_tar(reg) -> bool:
     return url.scheme == "file"
 
 
+def _is_docker_registry(reg) -> bool:
+    if reg["format"] != "docker_registry":
+        return False
+    return urlparse(reg["url"]).scheme in {"http", "https"}
+
+
 def _path_tar_version(path: Path) -> Version:
     name = path.name.split(":", 1)[1]
-    name = name.split(".tar")[0]
+    return tag_version(name.split(".tar")[0])
+
+
+def tag_version(name: str) -> Version:
     try:
         version = parse_version(name)
     except (LookupError, TypeError, ValueError):
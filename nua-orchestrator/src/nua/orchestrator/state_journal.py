@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from collections.abc import Callable
+from collections.abc import Callable, Iterable
 from functools import wraps
 from typing import Any
 
@@ -15,26 +15,40 @@ from .db.model.deployconfig import ACTIVE
 from .db.store import (
     deploy_config_active,
     deploy_config_add_config,
+    deploy_config_apps,
     deploy_config_last_inactive,
     deploy_config_per_id,
     deploy_config_previous,
+    deploy_config_requested,
+    deploy_config_set_trace,
+    unit_of_work,
 )
 from .provider import Provider
+from .tracing import finish_trace, span, start_trace
 
 
 def restore_if_fail(func: Callable):
-    """Decorator: restore last known stable state if installation failed."""
+    """Decorator: restore last known stable state if installation failed.
+
+    The instance, image and setting writes of the command are grouped in one
+    DB transaction (see store.unit_of_work).
+    """
 
     @wraps(func)
     def wrapper(*args: Any, **kwargs: Any) -> Any:
         state = StateJournal()
         state.read_current_state()
         kwargs["state_journal"] = state
+        start_trace(func.__name__)
         try:
-            return func(*args, **kwargs)
+            with unit_of_work():
+                return func(*args, **kwargs)
         except (OSError, RuntimeError, Abort):
             important("Restore last stable state.")
-            restore_from_state_journal(state)
+            with span("restore_from_state_journal"), unit_of_work():
+                restore_from_state_journal(state)
+        finally:
+            state.store_trace(finish_trace())
 
     return wrapper
 
@@ -70,37 +84,69 @@ class StateJournal:
 
     def __init__(self):
         self.current: dict[str, Any] = {}
+        # id of the record stored by this command, if any:
+        self.stored_id = 0
+
+    def read_current_state(self, with_apps: bool = True) -> None:
+        """Read the current deployed configuration from database.
 
-    def read_current_state(self) -> None:
-        """Read the current deployed configuration from database."""
-        self.current = deploy_config_active()
+        If not 'with_apps', only the header of the record is loaded, the apps
+        are then read on demand by deployed_state().
+        """
+        self.current = deploy_config_active(with_apps)
         if not self.current:
             # either
             # - first run or
             # - last deployment did crash with a PREVIOUS status somewhere
             # - or rare situation (active->inactive)
-            self.current = deploy_config_previous()
+            self.current = deploy_config_previous(with_apps)
         if not self.current:
-            self.current = deploy_config_last_inactive()
+            self.current = deploy_config_last_inactive(with_apps)
 
     def read_previous_state(self) -> None:
         if not self.current:
             return
         self.current = deploy_config_per_id(self.current["previous"])
 
-    def deployed_state(self) -> dict[str, Any]:
+    def deployed_state(
+        self,
+        labels: Iterable[str] | None = None,
+        app_id: str = "",
+        running_status: str = "",
+        offset: int = 0,
+        limit: int = 0,
+    ) -> dict[str, Any]:
         """The last deployed state from the journal.
 
         Return a dict with:
             requested: dict of last site configuration request
             deployed: list of the configures Appinstance data
             state_id:  id of the DB record
+
+        With filters (labels, app_id, running_status) or a page (offset,
+        limit), only the matching apps are read from the DB.
         """
         result = {"requested": {}, "apps": [], "state_id": -1}
-        if self.current:
+        if not self.current:
+            return result
+        result["state_id"] = self.current["id"]
+        filtered = labels is not None or app_id or running_status or offset or limit
+        if "deployed" in self.current and not filtered:
             result["requested"] = self.current["deployed"]["requested"]
             result["apps"] = self.current["deployed"]["apps"]
-            result["state_id"] = self.current["id"]
+            return result
+        if "deployed" in self.current:
+            result["requested"] = self.current["deployed"]["requested"]
+        else:
+            result["requested"] = deploy_config_requested(self.current["id"])
+        result["apps"] = deploy_config_apps(
+            self.current["id"],
+            label_ids=labels,
+            app_id=app_id,
+            running_status=running_status,
+            offset=offset,
+            limit=limit,
+        )
         return result
 
     def store_deployed_state(self, deploy_config: dict[str, Any]) -> int:
@@ -120,8 +166,14 @@ class StateJournal:
         with verbosity(1):
             info(f"Store state number {record['id']}")
         self.current = record
+        self.stored_id = record["id"]
         return record["id"]
 
+    def store_trace(self, trace: dict[str, Any]) -> None:
+        """Attach the timing trace of the command to the stored state."""
+        if self.stored_id and trace:
+            deploy_config_set_trace(self.stored_id, trace)
+
     @staticmethod
     def _app_info(app: AppInstance, text: list[str]) -> None:
         text.append(f"    label: {app.label_id}")
@@ -0,0 +1,186 @@
+"""Timing trace of a deployment.
+
+A trace is a tree of nested spans (name, start, end, app label, number of Docker
+calls). It is started by the commands modifying the deployment (see
+state_journal.restore_if_fail) and stored with the resulting DeployConfig
+record. Spans are opened by the phases of AppDeployer; outside of a trace they
+cost nothing.
+
+`nua-orchestrator debug trace <state-id>` displays the trace.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from time import perf_counter, time
+from typing import Any
+
+BAR_WIDTH = 40
+
+
+class Span:
+    def __init__(self, name: str, **attrs: Any):
+        self.name = name
+        self.attrs = attrs
+        self.start = perf_counter()
+        self.end = 0.0
+        self.docker_calls = 0
+        self.children: list[Span] = []
+
+    def close(self) -> None:
+        if not self.end:
+            self.end = perf_counter()
+        for child in self.children:
+            child.close()
+
+    def as_dict(self, origin: float) -> dict[str, Any]:
+        """Serialize, with times relative to origin (in seconds)."""
+        return {
+            "name": self.name,
+            "attrs": self.attrs,
+            "start": round(self.start - origin, 6),
+            "end": round((self.end or perf_counter()) - origin, 6),
+            "docker_calls": self.docker_calls,
+            "children": [child.as_dict(origin) for child in self.children],
+        }
+
+
+class _State(threading.local):
+    def __init__(self):
+        self.stack: list[Span] = []
+        self.docker_depth = 0
+
+
+_state = _State()
+_started_at = 0.0
+
+
+def start_trace(name: str, **attrs: Any) -> None:
+    """Start a new trace, the root span is 'name'."""
+    global _started_at
+
+    _started_at = time()
+    _state.stack = [Span(name, **attrs)]
+
+
+def trace_active() -> bool:
+    return bool(_state.stack)
+
+
+def finish_trace() -> dict[str, Any]:
+    """Close the trace and return its content ({} if no trace started)."""
+    if not _state.stack:
+        return {}
+    root = _state.stack[0]
+    root.close()
+    _state.stack = []
+    return {"started": _started_at, "root": root.as_dict(root.start)}
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span | None]:
+    """Record the block as a child span of the current span."""
+    if not _state.stack:
+        yield None
+        return
+    current = Span(name, **{k: v for k, v in attrs.items() if v})
+    _state.stack[-1].children.append(current)
+    _state.stack.append(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.close()
+        if _state.stack and _state.stack[-1] is current:
+            _state.stack.pop()
+
+
+def current_span() -> Span | None:
+    return _state.stack[-1] if _state.stack else None
+
+
+@contextmanager
+def attached(parent: Span | None) -> Iterator[None]:
+    """Record the spans of the current thread (a worker thread) as children of
+    'parent', a span of the thread that started the work.
+
+    The workers should open their own span: the Docker calls of several threads
+    are not counted on a shared span.
+    """
+    if parent is None:
+        yield
+        return
+    saved = (_state.stack, _state.docker_depth)
+    _state.stack = [parent]
+    _state.docker_depth = 0
+    try:
+        yield
+    finally:
+        _state.stack, _state.docker_depth = saved
+
+
+@contextmanager
+def docker_call() -> Iterator[None]:
+    """Count a call to the Docker daemon in the current span (the Docker calls
+    made inside this one are not counted)."""
+    if _state.stack and not _state.docker_depth:
+        _state.stack[-1].docker_calls += 1
+    _state.docker_depth += 1
+    try:
+        yield
+    finally:
+        _state.docker_depth -= 1
+
+
+def app_label(args: tuple) -> str:
+    """Return the label of the first app (or provider) in the arguments."""
+    for arg in args:
+        if isinstance(arg, dict) and "label_id" in arg:
+            return arg["label_id"]
+    return ""
+
+
+def total_docker_calls(node: dict[str, Any]) -> int:
+    return node["docker_calls"] + sum(
+        total_docker_calls(child) for child in node["children"]
+    )
+
+
+def render_trace(trace: dict[str, Any], width: int = BAR_WIDTH) -> list[str]:
+    """Return a flame-style view of the trace: one line per span, indented per
+    level, with its duration, its share of the total time, its Docker calls and
+    a bar placed on the timeline of the whole trace."""
+    root = trace.get("root")
+    if not root:
+        return []
+    total = max(root["end"] - root["start"], 1e-9)
+    rows: list[tuple[str, dict[str, Any]]] = []
+
+    def walk(node: dict[str, Any], depth: int) -> None:
+        label = node["attrs"].get("label", "")
+        name = f"{'  ' * depth}{node['name']}"
+        if label:
+            name = f"{name} [{label}]"
+        if "error" in node["attrs"]:
+            name = f"{name} !{node['attrs']['error']}"
+        rows.append((name, node))
+        for child in node["children"]:
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    name_width = max(len(name) for name, _node in rows)
+    lines = []
+    for name, node in rows:
+        duration = node["end"] - node["start"]
+        offset = int((node["start"] - root["start"]) / total * width)
+        length = max(1, round(duration / total * width))
+        bar = (" " * offset + "█" * length)[:width]
+        lines.append(
+            f"{name:<{name_width}}  {duration:9.3f}s {duration / total:6.1%}"
+            f"  docker:{total_docker_calls(node):<4} |{bar:<{width}}|"
+        )
+    return lines
@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from nua.orchestrator import config
+from nua.orchestrator.db import session as db_session
+from nua.orchestrator.db import store
+from nua.orchestrator.db.create import create_base
+from nua.orchestrator.scripts.db_stress import stress
+
+
+@pytest.fixture()
+def db(tmp_path):
+    config.set("nua", "db", "url", f"sqlite:///{tmp_path}/nua.db")
+    create_base()
+    db_session.configure_session()
+
+
+def _lock_error() -> OperationalError:
+    return OperationalError(
+        "INSERT", {}, sqlite3.OperationalError("database is locked")
+    )
+
+
+def test_sqlite_pragmas(db):
+    with db_session.Session() as session:
+        journal_mode = session.execute(text("PRAGMA journal_mode")).scalar()
+        synchronous = session.execute(text("PRAGMA synchronous")).scalar()
+        busy_timeout = session.execute(text("PRAGMA busy_timeout")).scalar()
+
+    assert journal_mode == "wal"
+    # 1: NORMAL
+    assert synchronous == 1
+    assert busy_timeout == db_session.SQLITE_PRAGMAS["busy_timeout"]
+
+
+def test_read_session_is_read_only(db):
+    store.store_instance(label_id="a-1")
+
+    with db_session.ReadSession() as session:
+        count = session.execute(text("SELECT count(*) FROM instance")).scalar()
+        with pytest.raises(OperationalError):
+            session.execute(text("DELETE FROM instance"))
+
+    assert count == 1
+
+
+def test_retry_on_lock(monkeypatch):
+    monkeypatch.setattr(db_session.time, "sleep", lambda _delay: None)
+    calls = []
+
+    @db_session.retry_on_lock
+    def write():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _lock_error()
+        return "done"
+
+    assert write() == "done"
+    assert len(calls) == 3
+
+
+def test_retry_on_lock_gives_up(monkeypatch):
+    monkeypatch.setattr(db_session.time, "sleep", lambda _delay: None)
+    monkeypatch.setattr(db_session, "LOCK_RETRIES", 2)
+    calls = []
+
+    @db_session.retry_on_lock
+    def write():
+        calls.append(1)
+        raise _lock_error()
+
+    with pytest.raises(OperationalError):
+        write()
+    assert len(calls) == 3
+
+
+def test_concurrent_processes(tmp_path):
+    result = stress(tmp_path / "nua.db", workers=3, operations=30)
+
+    assert result["errors"] == 0
+    assert result["operations"] == 90
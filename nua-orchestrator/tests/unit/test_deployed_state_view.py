@@ -0,0 +1,120 @@
+import pytest
+
+from nua.orchestrator import app_deployer, config
+from nua.orchestrator.app_deployer import AppDeployer, share_image_nua_configs
+from nua.orchestrator.app_instance import AppInstance
+from nua.orchestrator.db import store
+from nua.orchestrator.db.create import create_base
+from nua.orchestrator.db.model.deployconfig import ACTIVE
+from nua.orchestrator.db.session import configure_session
+from nua.orchestrator.state_journal import StateJournal
+
+
+def _app(index: int) -> dict:
+    return {
+        "label_id": f"app-{index}",
+        "image": f"img-{index % 2}",
+        "image_id": f"sha256:{index % 2}",
+        "running_status": "running" if index % 3 else "stopped",
+        "image_nua_config": {"metadata": {"id": f"img-{index % 2}"}},
+    }
+
+
+@pytest.fixture()
+def state_id(tmp_path):
+    config.set("nua", "db", "url", f"sqlite:///{tmp_path}/nua.db")
+    create_base()
+    configure_session()
+    deployed = {"requested": {"site": "all"}, "apps": [_app(i) for i in range(10)]}
+    return store.deploy_config_add_config(deployed, -1, ACTIVE)["id"]
+
+
+def test_header_read_without_apps(state_id):
+    state = StateJournal()
+
+    state.read_current_state(with_apps=False)
+    result = state.deployed_state()
+
+    assert "deployed" not in state.current
+    assert result["state_id"] == state_id
+    assert result["requested"] == {"site": "all"}
+    assert len(result["apps"]) == 10
+
+
+@pytest.mark.parametrize(
+    "filters,labels",
+    [
+        ({"labels": ["app-2", "app-5"]}, ["app-2", "app-5"]),
+        ({"labels": []}, []),
+        ({"app_id": "img-1"}, ["app-1", "app-3", "app-5", "app-7", "app-9"]),
+        ({"running_status": "stopped"}, ["app-0", "app-3", "app-6", "app-9"]),
+        ({"app_id": "img-1", "offset": 1, "limit": 2}, ["app-3", "app-5"]),
+    ],
+)
+def test_selected_apps(state_id, filters, labels):
+    state = StateJournal()
+    state.read_current_state(with_apps=False)
+
+    result = state.deployed_state(**filters)
+
+    assert [app["label_id"] for app in result["apps"]] == labels
+
+
+def test_image_nua_config_shared():
+    apps = [AppInstance.from_dict(_app(i)) for i in range(4)]
+
+    share_image_nua_configs(apps)
+
+    assert apps[0].image_nua_config is apps[2].image_nua_config
+    assert apps[1].image_nua_config is apps[3].image_nua_config
+    assert apps[0].image_nua_config is not apps[1].image_nua_config
+
+
+def _image_config() -> dict:
+    return {
+        "metadata": {"id": "img"},
+        "provider": [
+            {
+                "name": "database",
+                "type": "docker-image",
+                "image": "postgres:15",
+                "docker": {"mem_limit": "1G"},
+            }
+        ],
+    }
+
+
+def test_provider_update_not_shared():
+    image_config = _image_config()
+    app_a = AppInstance({"label_id": "a", "image_nua_config": image_config})
+    app_b = AppInstance({"label_id": "b", "image_nua_config": image_config})
+    app_a.parse_providers()
+    app_b.parse_providers()
+
+    app_a.providers[0].update_from_site_declaration({"docker": {"mem_limit": "8G"}})
+
+    assert app_a.providers[0].docker == {"mem_limit": "8G"}
+    assert app_b.providers[0].docker == {"mem_limit": "1G"}
+    assert image_config == _image_config()
+
+
+def test_installed_image_config_copied(monkeypatch):
+    image_config = _image_config()
+    apps = [
+        AppInstance({"label_id": label, "registry_path": "/var/tmp/img.tar"})
+        for label in ("a", "b")
+    ]
+    monkeypatch.setattr(app_deployer, "start_container_engine", lambda: None)
+    monkeypatch.setattr(
+        app_deployer,
+        "install_app_images",
+        lambda paths: {path: ("sha256:img", image_config) for path in paths},
+    )
+    deployer = AppDeployer()
+    deployer.apps = apps
+
+    deployer.install_images()
+
+    assert apps[0].image_nua_config == apps[1].image_nua_config == image_config
+    assert apps[0].image_nua_config is not apps[1].image_nua_config
+    assert apps[0].image_nua_config is not image_config
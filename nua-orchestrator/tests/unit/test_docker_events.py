@@ -0,0 +1,75 @@
+import threading
+
+from nua.orchestrator import docker_events
+from nua.orchestrator.docker_events import REMOVED, ContainerEvents
+
+
+def _event(action: str, name: str) -> dict:
+    return {
+        "Type": "container",
+        "Action": action,
+        "Actor": {"Attributes": {"name": name}},
+    }
+
+
+def _running_events(monkeypatch) -> ContainerEvents:
+    events = ContainerEvents()
+    monkeypatch.setattr(events, "start", lambda: True)
+    monkeypatch.setattr(docker_events, "_container_events", events)
+    return events
+
+
+def test_dispatch_resolves_matching_future(monkeypatch):
+    events = _running_events(monkeypatch)
+    future = events.expect("app-1", ("running",))
+
+    events.dispatch(_event("start", "app-2"))
+    events.dispatch(_event("die", "app-1"))
+    assert not future.done()
+    events.dispatch(_event("start", "app-1"))
+
+    assert future.result(timeout=0) == "running"
+    # the waiter is discarded once resolved:
+    assert not events._waiters
+
+
+def test_wait_container_state_from_event(monkeypatch):
+    events = _running_events(monkeypatch)
+    calls = []
+
+    def current():
+        calls.append(1)
+        return "running"
+
+    timer = threading.Timer(0.05, events.dispatch, (_event("destroy", "app-1"),))
+    timer.start()
+
+    result = docker_events.wait_container_state("app-1", (REMOVED,), 5, current)
+
+    assert result == REMOVED
+    # the state is only checked once, not polled:
+    assert len(calls) == 1
+
+
+def test_wait_container_state_timeout(monkeypatch):
+    events = _running_events(monkeypatch)
+
+    result = docker_events.wait_container_state(
+        "app-1", (REMOVED,), 0.1, lambda: "running"
+    )
+
+    assert result == ""
+    assert not events._waiters
+
+
+def test_wait_container_state_polling_fallback(monkeypatch):
+    events = ContainerEvents()
+    monkeypatch.setattr(events, "start", lambda: False)
+    monkeypatch.setattr(docker_events, "_container_events", events)
+    states = iter(["running", "exited", REMOVED])
+
+    result = docker_events.wait_container_state(
+        "app-1", (REMOVED,), 5, lambda: next(states)
+    )
+
+    assert result == REMOVED
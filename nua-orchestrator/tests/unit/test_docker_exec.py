@@ -0,0 +1,142 @@
+import io
+import socket
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from nua.orchestrator import docker_exec
+from nua.orchestrator.docker_exec import (
+    FRAME_HEADER,
+    STREAM_STDERR,
+    STREAM_STDOUT,
+    OutputTail,
+    demultiplex,
+    exec_commands,
+    exec_stream,
+)
+
+
+def _frame(stream_type: int, payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(stream_type, len(payload)) + payload
+
+
+def _feed(frames: bytes) -> socket.socket:
+    """Return a socket reading the frames."""
+    reader, writer = socket.socketpair()
+    writer.sendall(frames)
+    writer.close()
+    return reader
+
+
+class _FakeApi:
+    """Docker API executing each command by returning canned frames."""
+
+    def __init__(self, outputs: dict[str, tuple[bytes, int]]):
+        self.outputs = outputs
+        self.execs: dict[str, tuple] = {}
+        self.received: dict[str, bytes] = {}
+
+    def exec_create(self, container_id, cmd, stdin=False, **kwargs):
+        exec_id = f"exec-{len(self.execs)}"
+        self.execs[exec_id] = (cmd, stdin)
+        return {"Id": exec_id}
+
+    def exec_start(self, exec_id, socket=False):
+        cmd, stdin = self.execs[exec_id]
+        frames, _code = self.outputs[cmd[-1]]
+        if not stdin:
+            return _feed(frames)
+        return self._echo_input(exec_id, frames)
+
+    def _echo_input(self, exec_id: str, frames: bytes):
+        ours, theirs = socket.socketpair()
+
+        def serve():
+            data = b""
+            while chunk := theirs.recv(65536):
+                data += chunk
+            self.received[exec_id] = data
+            theirs.sendall(frames)
+            theirs.close()
+
+        threading.Thread(target=serve, daemon=True).start()
+        return ours
+
+    def exec_inspect(self, exec_id):
+        cmd, _stdin = self.execs[exec_id]
+        return {"ExitCode": self.outputs[cmd[-1]][1]}
+
+
+def _container(outputs: dict[str, tuple[bytes, int]]):
+    api = _FakeApi(outputs)
+    return SimpleNamespace(id="c1", client=SimpleNamespace(api=api)), api
+
+
+def test_demultiplex_routes_streams(monkeypatch):
+    monkeypatch.setattr(docker_exec, "CHUNK_SIZE", 1000)
+    big = bytes(range(256)) * 40
+    sock = _feed(
+        _frame(STREAM_STDOUT, big) + _frame(STREAM_STDERR, b"oops") + _frame(1, b"!")
+    )
+    stdout: list[bytes] = []
+    stderr: list[bytes] = []
+
+    demultiplex(sock, stdout.append, stderr.append)
+
+    assert b"".join(stdout) == big + b"!"
+    # large frames are read by chunks:
+    assert max(len(chunk) for chunk in stdout) <= 1000
+    assert stderr == [b"oops"]
+
+
+@pytest.mark.parametrize(
+    "chunks,limit,expected",
+    [
+        ([b"abc", b"def"], 10, "abcdef"),
+        ([b"abc", b"def", b"ghi"], 4, "fghi"),
+        ([b"a" * 20], 4, "aaaa"),
+    ],
+)
+def test_output_tail(chunks: list[bytes], limit: int, expected: str):
+    tail = OutputTail(limit)
+
+    for chunk in chunks:
+        tail(chunk)
+
+    assert tail.text() == expected
+
+
+def test_exec_stream_streams_input(tmp_path):
+    dump = tmp_path / "dump.sql"
+    dump.write_bytes(b"x" * 300_000)
+    container, api = _container(
+        {"restore": (_frame(STREAM_STDOUT, b"done") + _frame(STREAM_STDERR, b"w"), 3)}
+    )
+    output = io.BytesIO()
+
+    result = exec_stream(container, ["restore"], stdin=dump, stdout=output)
+
+    assert api.received["exec-0"] == dump.read_bytes()
+    assert output.getvalue() == b"done"
+    assert not result.ok
+    assert result.stderr_tail == "w"
+
+
+def test_exec_commands_parallel_keeps_order():
+    commands = [f"cmd-{i}" for i in range(6)]
+    outputs = {cmd: (_frame(STREAM_STDOUT, cmd.encode()), 0) for cmd in commands}
+    outputs["cmd-2"] = (_frame(STREAM_STDERR, b"failed"), 1)
+    container, _api = _container(outputs)
+    received: dict[str, bytes] = {}
+
+    results = exec_commands(
+        container,
+        commands,
+        parallel=True,
+        output=lambda cmd, data: received.__setitem__(cmd, data),
+    )
+
+    assert [result.ok for result in results] == [True, True, False, True, True, True]
+    assert received["cmd-5"] == b"cmd-5"
+    assert results[2].stderr_tail == "failed"
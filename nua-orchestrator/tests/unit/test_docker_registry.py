@@ -0,0 +1,153 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import ClassVar
+
+import pytest
+
+from nua.orchestrator import config
+from nua.orchestrator.docker_registry import RegistryCache, RegistryClient
+from nua.orchestrator.search_cmd import search_nua
+
+TAGS = ["1.2-1", "latest", "1.10-1", "1.9-2"]
+MANIFEST = json.dumps({"schemaVersion": 2, "layers": []}).encode()
+MANIFEST_DIGEST = "sha256:" + hashlib.sha256(MANIFEST).hexdigest()
+
+
+class RegistryStandIn(BaseHTTPRequestHandler):
+    """Minimal Registry v2: tags/list (paginated by 2) and manifests, with
+    ETags."""
+
+    requests: ClassVar[list[tuple[str, int]]] = []
+
+    def do_GET(self):
+        if "/tags/list" in self.path:
+            last = self.path.split("last=")[1] if "last=" in self.path else ""
+            start = TAGS.index(last) + 1 if last else 0
+            body = json.dumps({"tags": TAGS[start : start + 2]}).encode()
+            link = ""
+            if start + 2 < len(TAGS):
+                repository = self.path.split("/tags/")[0]
+                link = (
+                    f'<{repository}/tags/list?n=2&last={TAGS[start + 1]}>; rel="next"'
+                )
+            self._reply(body, link=link)
+        elif "/manifests/" in self.path:
+            self._reply(MANIFEST, digest=MANIFEST_DIGEST)
+        else:
+            self._send(404)
+
+    def _reply(self, body: bytes, link: str = "", digest: str = "") -> None:
+        etag = '"' + hashlib.sha256(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304)
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        if link:
+            self.send_header("Link", link)
+        if digest:
+            self.send_header("Docker-Content-Digest", digest)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.requests.append((self.path, 200))
+
+    def _send(self, code: int) -> None:
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+        self.requests.append((self.path, code))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def registry_url(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RegistryStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    RegistryStandIn.requests = []
+    url = f"http://127.0.0.1:{server.server_address[1]}/nua"
+    registries = config.read("nua", "registry")
+    config.set("nua", "docker_registry", "cache", str(tmp_path / "cache"))
+    config.set(
+        "nua",
+        "registry",
+        [
+            {"priority": 5, "format": "docker_registry", "url": url},
+            {"priority": 1, "format": "docker_tar", "url": f"file://{tmp_path}"},
+        ],
+    )
+    yield url
+    config.set("nua", "registry", registries)
+    server.shutdown()
+    server.server_close()
+
+
+def test_tags_all_pages(registry_url, tmp_path):
+    client = RegistryClient(registry_url, RegistryCache(tmp_path / "cache"))
+
+    tags = client.tags("nua/nua-app")
+
+    assert tags == TAGS
+
+
+def test_cached_responses_revalidated(registry_url, tmp_path):
+    client = RegistryClient(registry_url, RegistryCache(tmp_path / "cache"))
+    client.tags("nua/nua-app")
+    client.manifest("nua/nua-app", "1.2-1")
+    RegistryStandIn.requests = []
+
+    tags = client.tags("nua/nua-app")
+    manifest, digest = client.manifest("nua/nua-app", "1.2-1")
+
+    assert tags == TAGS
+    assert manifest == json.loads(MANIFEST)
+    assert digest == MANIFEST_DIGEST
+    assert {code for _path, code in RegistryStandIn.requests} == {304}
+
+
+@pytest.mark.parametrize(
+    "app_name,tags",
+    [
+        ("app", ["1.2-1", "1.9-2", "1.10-1"]),
+        ("nua-app:1.9-2", ["1.9-2"]),
+        ("app:2.0", []),
+    ],
+)
+def test_search_resolves_versions(registry_url, app_name, tags):
+    results = search_nua(app_name)
+
+    assert results == [
+        f"{registry_url.rsplit('/', 1)[0]}/nua/nua-app:{t}" for t in tags
+    ]
+
+
+def test_search_mixes_tar_and_registry(registry_url, tmp_path):
+    (tmp_path / "nua-app:1.9-2.tar").write_bytes(b"")
+    (tmp_path / "nua-app:1.11-1.tar").write_bytes(b"")
+
+    results = search_nua("app")
+
+    assert [str(r).rsplit(":", 1)[-1] for r in results] == [
+        "1.2-1",
+        "1.9-2",
+        "1.9-2.tar",
+        "1.10-1",
+        "1.11-1.tar",
+    ]
+    assert isinstance(results[-1], Path)
+
+
+def test_search_same_version_prefers_first_registry(registry_url, tmp_path):
+    (tmp_path / "nua-app:1.9-2.tar").write_bytes(b"")
+
+    results = search_nua("nua-app:1.9-2")
+
+    assert len(results) == 2
+    # the docker_tar registry has the lowest priority value:
+    assert results[-1] == tmp_path / "nua-app:1.9-2.tar"
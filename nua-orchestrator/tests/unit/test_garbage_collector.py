@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+
+import pytest
+from docker.errors import APIError, ImageNotFound
+
+from nua.orchestrator import config, garbage_collector
+from nua.orchestrator.db import store
+from nua.orchestrator.db.create import create_base
+from nua.orchestrator.db.model.deployconfig import ACTIVE, INACTIVE
+from nua.orchestrator.db.session import configure_session
+from nua.orchestrator.garbage_collector import IMAGE, Candidate, LiveSet, plan
+
+MIB = 1024 * 1024
+
+
+def _app_image(image_id: str, tag: str, size: int, created: int) -> dict:
+    return {
+        "Id": image_id,
+        "RepoTags": [f"nua-app:{tag}"],
+        "Labels": {"NUA_TAG": f"nua-app:{tag}", "APP_ID": "app"},
+        "Size": size,
+        "SharedSize": 0,
+        "Created": created,
+    }
+
+
+USAGE = {
+    "Images": [
+        _app_image("sha256:a1", "1.0-1", 10 * MIB, 100),
+        _app_image("sha256:a2", "1.9-1", 20 * MIB, 200),
+        _app_image("sha256:a3", "1.10-1", 30 * MIB, 300),
+        _app_image("sha256:a4", "1.11-1", 30 * MIB, 400),
+        {
+            "Id": "sha256:pg14",
+            "RepoTags": ["postgres:14"],
+            "Size": 80 * MIB,
+            "SharedSize": 20 * MIB,
+            "Created": 50,
+        },
+        {"Id": "sha256:pg15", "RepoTags": ["postgres:15"], "Size": 90 * MIB},
+        {"Id": "sha256:other", "RepoTags": ["ubuntu:22.04"], "Size": 70 * MIB},
+    ],
+    "Containers": [{"ImageID": "sha256:a1"}],
+    "Volumes": [
+        {"Name": "old-data", "UsageData": {"Size": 5 * MIB, "RefCount": 0}},
+        {"Name": "mounted-data", "UsageData": {"Size": 5 * MIB, "RefCount": 1}},
+        {"Name": "live-data", "UsageData": {"Size": 5 * MIB, "RefCount": 0}},
+        {"Name": "foreign", "UsageData": {"Size": 5 * MIB, "RefCount": 0}},
+    ],
+}
+
+
+def _live() -> LiveSet:
+    return LiveSet(
+        image_ids={"sha256:a4"},
+        image_refs={"postgres:15"},
+        volumes={"live-data"},
+        history_images={"postgres:14", "postgres:15"},
+        history_volumes={"old-data", "mounted-data", "live-data"},
+    )
+
+
+@pytest.mark.parametrize(
+    "keep,expected",
+    [
+        (0, ["sha256:pg14", "sha256:a3", "sha256:a2", "old-data"]),
+        (1, ["sha256:pg14", "sha256:a3", "sha256:a2", "old-data"]),
+        (2, ["sha256:pg14", "sha256:a2", "old-data"]),
+        (3, ["sha256:pg14", "old-data"]),
+    ],
+)
+def test_plan_keep_versions(keep, expected):
+    candidates = plan(USAGE, _live(), keep_versions=keep)
+
+    assert [candidate.id for candidate in candidates] == expected
+
+
+def test_plan_sizes_and_reasons():
+    candidates = plan(USAGE, _live(), keep_versions=0, volumes=False)
+
+    assert [(c.name, c.size // MIB, c.reason) for c in candidates] == [
+        ("postgres:14", 60, "superseded provider image"),
+        ("nua-app:1.10-1", 30, "unused app image"),
+        ("nua-app:1.9-1", 20, "unused app image"),
+    ]
+
+
+def test_history_references(tmp_path):
+    config.set("nua", "db", "url", f"sqlite:///{tmp_path}/nua.db")
+    create_base()
+    configure_session()
+    volume = {"type": "volume", "name": "data", "label": "app-1"}
+    old = {
+        "apps": [
+            {
+                "volume": [volume],
+                "providers": [{"image": "postgres:14", "volume": [volume]}],
+            }
+        ]
+    }
+    new = {"apps": [{"providers": [{"image": "postgres:15"}, {"image": ""}]}]}
+    store.deploy_config_add_config(old, -1, INACTIVE)
+    store.deploy_config_add_config(new, 1, ACTIVE)
+
+    images, volumes = store.deploy_config_history_references()
+
+    assert images == {"postgres:14", "postgres:15"}
+    assert volumes == [volume]
+
+
+class FakeImages:
+    """Removal of the images of the daemon, by tag or by id."""
+
+    def __init__(self, tags: dict[str, str]):
+        self.tags = tags
+        self.calls = []
+
+    def remove(self, reference: str, force: bool, noprune: bool) -> None:
+        self.calls.append(reference)
+        if reference in self.tags:
+            del self.tags[reference]
+        elif reference not in self.tags.values():
+            raise ImageNotFound(reference)
+        else:
+            raise APIError("conflict: image is referenced in multiple repositories")
+
+
+def test_remove_image_of_several_tags(monkeypatch):
+    images = FakeImages(
+        {"postgres:15": "sha256:pg15", "postgres:latest": "sha256:pg15"}
+    )
+    client = SimpleNamespace(images=images)
+    monkeypatch.setattr(garbage_collector, "docker_client", lambda: client)
+    candidate = Candidate(
+        kind=IMAGE,
+        id="sha256:pg15",
+        name="postgres:15",
+        size=1,
+        created=0,
+        reason="superseded provider image",
+        tags=["postgres:15", "postgres:latest"],
+    )
+
+    garbage_collector._remove(candidate)
+
+    assert images.calls == ["postgres:15", "postgres:latest", "sha256:pg15"]
+    assert images.tags == {}
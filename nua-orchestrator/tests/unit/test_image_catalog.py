@@ -0,0 +1,154 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from nua.orchestrator import config, image_catalog
+from nua.orchestrator.db import store
+from nua.orchestrator.db.create import create_base
+from nua.orchestrator.db.session import configure_session
+from nua.orchestrator.image_fetch import fetch_images
+from nua.orchestrator.search_cmd import image_available_locally
+
+DAEMON = [
+    {
+        "Id": "sha256:pg15",
+        "RepoTags": ["postgres:15"],
+        "RepoDigests": ["postgres@sha256:d15"],
+        "Size": 100,
+        "Labels": None,
+    },
+    {
+        "Id": "sha256:app1",
+        "RepoTags": ["nua-app:1.0-1"],
+        "RepoDigests": [],
+        "Size": 50,
+        "Labels": {"NUA_TAG": "nua-app:1.0-1", "APP_ID": "app"},
+    },
+]
+
+
+@pytest.fixture()
+def daemon(tmp_path, monkeypatch):
+    config.set("nua", "db", "url", f"sqlite:///{tmp_path}/nua.db")
+    create_base()
+    configure_session()
+    calls = []
+
+    def daemon_images():
+        calls.append("images")
+        # a slow daemon, for the concurrent lookups:
+        time.sleep(0.05)
+        return DAEMON
+
+    monkeypatch.setattr(image_catalog, "_daemon_images", daemon_images)
+    monkeypatch.setattr(
+        image_catalog,
+        "_image_present",
+        lambda image_id: image_id in {summary["Id"] for summary in DAEMON},
+    )
+    monkeypatch.setattr(image_catalog, "_reconciled", False)
+    return calls
+
+
+@pytest.mark.parametrize(
+    "reference,expected",
+    [
+        ("postgres", "postgres:latest"),
+        ("docker.io/library/postgres:15", "postgres:15"),
+        ("localhost:5000/nua/app", "localhost:5000/nua/app:latest"),
+        ("redis@sha256:abc", "redis@sha256:abc"),
+    ],
+)
+def test_normalized_reference(reference, expected):
+    assert image_catalog.normalized_reference(reference) == expected
+
+
+def test_lookup_without_daemon_call_when_fresh(daemon):
+    image_catalog.reconcile()
+    image_catalog._reconciled = False
+    daemon.clear()
+
+    record = image_catalog.lookup("docker.io/postgres:15")
+
+    assert record["image_id"] == "sha256:pg15"
+    assert record["digest"] == "sha256:d15"
+    assert daemon == []
+
+
+def test_stale_catalog_reconciled_once(daemon):
+    store.catalog_store_images(
+        [
+            {
+                "reference": "removed:1",
+                "image_id": "sha256:old",
+                "verified": "2020-01-01T00:00:00+00:00",
+            }
+        ]
+    )
+
+    assert image_catalog.lookup("removed:1") == {}
+    assert image_catalog.lookup("removed:1") == {}
+    assert image_catalog.lookup("postgres:15")["size"] == 100
+    assert daemon == ["images"]
+    assert {r["reference"] for r in store.catalog_images()} == {
+        "postgres:15",
+        "nua-app:1.0-1",
+    }
+
+
+@pytest.mark.parametrize(
+    "app_name,available",
+    [("app", True), ("nua-app:1.0-1", True), ("app:2.0-1", False), ("other", False)],
+)
+def test_image_available_locally(daemon, app_name, available):
+    assert image_available_locally(app_name) is available
+
+
+def test_concurrent_require_image_reconciles_once(daemon):
+    references = ["postgres:15", "nua-app:1.0-1", "docker.io/postgres:15"]
+
+    results = fetch_images(references, image_catalog.require_image, "Provider")
+
+    assert daemon == ["images"]
+    assert {ref: image_id for ref, (image_id, _) in results.items()} == {
+        "postgres:15": "sha256:pg15",
+        "nua-app:1.0-1": "sha256:app1",
+        "docker.io/postgres:15": "sha256:pg15",
+    }
+
+
+def test_require_image_removed_outside_nua(daemon, monkeypatch):
+    monkeypatch.setattr(image_catalog, "docker_service_start_if_needed", lambda: None)
+    pulled = SimpleNamespace(
+        id="sha256:pulled",
+        tags=["redis:7"],
+        attrs={"RepoDigests": ["redis@sha256:d7"], "Size": 30},
+        labels={},
+    )
+    monkeypatch.setattr(image_catalog, "docker_require", lambda ref: pulled)
+    # fresh record of an image removed by 'docker rmi':
+    store.catalog_store_images(
+        [
+            {
+                "reference": "redis:7",
+                "image_id": "sha256:gone",
+                "verified": store.now_iso(),
+            }
+        ]
+    )
+
+    image_id, image = image_catalog.require_image("redis:7")
+
+    assert (image_id, image) == ("sha256:pulled", pulled)
+    assert store.catalog_image("redis:7")["image_id"] == "sha256:pulled"
+
+
+def test_store_images_upsert(daemon):
+    record = {"reference": "postgres:15", "image_id": "sha256:old", "verified": ""}
+    store.catalog_store_images([record])
+
+    store.catalog_store_images([dict(record, image_id="sha256:new", size=7)])
+
+    assert store.catalog_image("postgres:15")["image_id"] == "sha256:new"
+    assert store.catalog_image("postgres:15")["size"] == 7
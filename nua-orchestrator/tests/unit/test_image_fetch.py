@@ -0,0 +1,98 @@
+import io
+import json
+import tarfile
+import threading
+import time
+
+import pytest
+
+from nua.orchestrator import tracing
+from nua.orchestrator.deploy_utils import tar_image_id
+from nua.orchestrator.image_fetch import fetch_images
+
+DIGEST = "a" * 64
+
+
+def test_fetch_deduped_and_bounded():
+    calls = []
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def fetch(source: str) -> str:
+        with lock:
+            calls.append(source)
+            running.append(source)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(source)
+        return source.upper()
+
+    results = fetch_images(["a", "b", "a", "c", "d", "e", "b"], fetch, "App", workers=3)
+
+    assert sorted(calls) == ["a", "b", "c", "d", "e"]
+    assert results == {"a": "A", "b": "B", "c": "C", "d": "D", "e": "E"}
+    assert max(peak) <= 3
+
+
+def test_fetch_error_raised():
+    def fetch(source: str) -> str:
+        if source == "bad":
+            raise FileNotFoundError(source)
+        return source
+
+    with pytest.raises(FileNotFoundError):
+        fetch_images(["ok", "bad", "other"], fetch, "App")
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_fetch_spans_recorded_in_trace(workers):
+    def fetch(source: str) -> str:
+        with tracing.span("load_install_image"), tracing.docker_call():
+            time.sleep(0.01)
+        return source
+
+    tracing.start_trace("deploy")
+    with tracing.span("install_images"):
+        fetch_images(["a", "b", "c"], fetch, "App", workers=workers)
+    trace = tracing.finish_trace()
+
+    phase = trace["root"]["children"][0]
+    assert sorted(child["attrs"]["label"] for child in phase["children"]) == [
+        "a",
+        "b",
+        "c",
+    ]
+    assert tracing.total_docker_calls(phase) == 3
+    assert all(
+        child["children"][0]["name"] == "load_install_image"
+        for child in phase["children"]
+    )
+
+
+def _archive(tmp_path, manifest) -> str:
+    path = tmp_path / "nua-app:1.0-1.tar"
+    with tarfile.open(path, "w") as archive:
+        content = json.dumps(manifest).encode()
+        info = tarfile.TarInfo("manifest.json")
+        info.size = len(content)
+        archive.addfile(info, io.BytesIO(content))
+    return path
+
+
+@pytest.mark.parametrize(
+    "manifest,image_id",
+    [
+        ([{"Config": f"{DIGEST}.json"}], f"sha256:{DIGEST}"),
+        ([{"Config": f"blobs/sha256/{DIGEST}"}], f"sha256:{DIGEST}"),
+        ([{"Config": "short.json"}], ""),
+        ({}, ""),
+    ],
+)
+def test_tar_image_id(tmp_path, manifest, image_id):
+    path = _archive(tmp_path, manifest)
+
+    result = tar_image_id(path)
+
+    assert result == image_id
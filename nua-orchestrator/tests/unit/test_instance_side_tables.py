@@ -0,0 +1,101 @@
+import json
+import sqlite3
+
+import pytest
+
+from nua.orchestrator import config, nua_db_setup
+from nua.orchestrator.db import store
+from nua.orchestrator.db.create import create_base
+from nua.orchestrator.db.session import configure_session
+from nua.orchestrator.db_migration.tools import column_exists, index_exists
+
+SITE_CONFIG = {
+    "domain": "a.example.com",
+    "image_id": "sha256:abc",
+    "port": {"web": {"host_use": 8100, "proxy": None}},
+    "volume": [
+        {"type": "managed", "name": "uploads", "label": "a-1", "target": "/up"},
+        {"type": "tmpfs", "target": "/tmp/cache"},
+    ],
+    "providers": [
+        {
+            "provider_name": "database",
+            "volume": [{"type": "directory", "name": "/srv/db", "target": "/db"}],
+        }
+    ],
+}
+
+
+@pytest.fixture()
+def db(tmp_path):
+    config.set("nua", "db", "url", f"sqlite:///{tmp_path}/nua.db")
+    create_base()
+    configure_session()
+
+
+def test_ports_and_volumes_of_instances(db):
+    store.store_instance(
+        label_id="a-1", domain="a.example.com", state="started", site_config=SITE_CONFIG
+    )
+    store.store_instance(
+        label_id="b-1",
+        domain="b.example.com",
+        state="started",
+        site_config={"port": {"web": {"host_use": 8101}}, "volume": []},
+    )
+
+    ports = store.ports_instances_domains()
+    volumes = store.list_instances_container_active_volumes()
+    local_volumes = store.list_instances_container_local_active_volumes()
+
+    assert ports == {8100: "a.example.com", 8101: "b.example.com"}
+    assert [volume.full_name for volume in volumes] == ["a-1-uploads", "/srv/db"]
+    assert volumes[0].domains == ["a.example.com"]
+    assert [volume.full_name for volume in local_volumes] == ["a-1-uploads"]
+    assert store.list_instances_fields(["label_id", "image_id"])[0] == {
+        "label_id": "a-1",
+        "image_id": "sha256:abc",
+    }
+
+
+def test_side_rows_replaced_and_deleted(db):
+    store.store_instance(
+        label_id="a-1", domain="a.example.com", site_config=SITE_CONFIG
+    )
+    store.store_instance(
+        label_id="a-1",
+        domain="a.example.com",
+        site_config={"port": {"web": {"host_use": 8200}}},
+    )
+
+    assert store.ports_instances_domains() == {8200: "a.example.com"}
+    store.instance_delete_by_label("a-1")
+    assert store.ports_instances_domains() == {}
+
+
+def test_migration_of_legacy_db(tmp_path, monkeypatch):
+    db_path = tmp_path / "nua.db"
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        "CREATE TABLE instance (id INTEGER PRIMARY KEY, app_id VARCHAR(80), "
+        "label_id VARCHAR(80), nua_tag VARCHAR(160), domain VARCHAR(160), "
+        "container VARCHAR(160), image VARCHAR(160), state VARCHAR(16), "
+        "created VARCHAR(40), site_config JSON)"
+    )
+    connection.execute(
+        "INSERT INTO instance (label_id, domain, state, site_config) "
+        "VALUES ('a-1', 'a.example.com', 'started', ?)",
+        (json.dumps(SITE_CONFIG),),
+    )
+    connection.commit()
+    connection.close()
+    monkeypatch.setenv("NUA_DB_URL", f"sqlite:///{db_path}")
+    monkeypatch.setenv("NUA_DB_LOCAL_DIR", str(tmp_path))
+
+    nua_db_setup.setup_nua_db()
+
+    assert column_exists("instance", "image_id")
+    assert index_exists("instance", "ix_instance_label_id")
+    assert index_exists("setting", "ix_setting_app_id_instance")
+    assert store.ports_instances_domains() == {8100: "a.example.com"}
+    assert store.list_instances_fields(["image_id"]) == [{"image_id": "sha256:abc"}]
@@ -0,0 +1,79 @@
+import os
+
+from nua.orchestrator import config
+from nua.orchestrator.app_instance import AppInstance
+from nua.orchestrator.db import store
+from nua.orchestrator.db.create import create_base
+from nua.orchestrator.db.session import configure_session
+from nua.orchestrator.internal_secrets import (
+    EnvSecretBackend,
+    FileSecretBackend,
+    SecretBackend,
+    SecretsService,
+)
+
+
+class _CountingBackend(FileSecretBackend):
+    def __init__(self, directory):
+        super().__init__({"POSTGRES_PASSWORD": ".postgres_pwd"}, directory)
+        self.reads = 0
+
+    def read(self, key):
+        self.reads += 1
+        return super().read(key)
+
+
+class _StaticBackend(SecretBackend):
+    def read(self, key):
+        return {"API_TOKEN": "token"}.get(key)
+
+
+def test_file_secret_cached_until_changed(tmp_path):
+    pwd_file = tmp_path / ".postgres_pwd"
+    pwd_file.write_text("first\n")
+    backend = _CountingBackend(tmp_path)
+    service = SecretsService([backend])
+
+    values = [service.get("POSTGRES_PASSWORD") for _ in range(5)]
+    pwd_file.write_text("second-value\n")
+    os.utime(pwd_file, ns=(1, 1))
+    changed = service.get("POSTGRES_PASSWORD")
+
+    assert values == ["first"] * 5
+    assert changed == "second-value"
+    assert backend.reads == 2
+
+
+def test_backends_order_and_plugins(tmp_path, monkeypatch):
+    (tmp_path / ".postgres_pwd").write_text("from-file")
+    monkeypatch.setenv("NUA_POSTGRES_PASSWORD", "from-env")
+    service = SecretsService([FileSecretBackend(directory=tmp_path)])
+
+    service.register(_StaticBackend())
+    service.register(EnvSecretBackend(), first=True)
+    result = service.get_many(["POSTGRES_PASSWORD", "API_TOKEN", "UNKNOWN"])
+
+    assert result == {"POSTGRES_PASSWORD": "from-env", "API_TOKEN": "token"}
+
+
+def test_persistent_batch_read(tmp_path):
+    config.set("nua", "db", "url", f"sqlite:///{tmp_path}/nua.db")
+    create_base()
+    configure_session()
+    store.store_instance(
+        label_id="a-1", site_config={"persistent": {"": {"DB_PASSWORD": "secret"}}}
+    )
+    store.store_instance(label_id="b-1", site_config={})
+
+    result = store.instances_persistent(["a-1", "b-1", "c-1"])
+
+    assert result == {"a-1": {"": {"DB_PASSWORD": "secret"}}, "b-1": {}, "c-1": {}}
+
+
+def test_persistent_view_shared_with_app():
+    app = AppInstance({"label_id": "a-1"})
+
+    app.persistent("db")["DB_USER"] = "user"
+    app.persistent("db")["DB_NAME"] = "name"
+
+    assert app.persistent_full_dict() == {"db": {"DB_USER": "user", "DB_NAME": "name"}}
@@ -0,0 +1,67 @@
+import pytest
+
+from nua.orchestrator import config
+from nua.orchestrator.db import store
+from nua.orchestrator.db.create import create_base
+from nua.orchestrator.db.session import configure_session
+
+SITE_CONFIG = {
+    "domain": "a.example.com",
+    "container_id": "123",
+    "env": {"KEY": "value"},
+    "image_nua_config": {"metadata": {"title": "App A", "tags": ["test"]}},
+}
+
+
+@pytest.fixture()
+def db(tmp_path):
+    config.set("nua", "db", "url", f"sqlite:///{tmp_path}/nua.db")
+    create_base()
+    configure_session()
+    store.store_instance(
+        app_id="a", label_id="a-1", state="started", site_config=SITE_CONFIG
+    )
+    store.store_instance(app_id="a", label_id="a-2", site_config={"domain": "b"})
+    store.store_instance(app_id="c", label_id="c-1", site_config={"domain": "c"})
+
+
+def test_compact_view(db):
+    result = store.list_instances_fields()
+
+    assert [record["label_id"] for record in result] == ["a-1", "a-2", "c-1"]
+    first = result[0]
+    assert first["site_config"]["image_nua_config"]["metadata"]["title"] == "App A"
+    assert first["site_config"]["container_id"] == "123"
+    assert "env" not in first["site_config"]
+
+
+def test_missing_paths_omitted(db):
+    site_config = {
+        "domain": "d",
+        "image_nua_config": {"metadata": {"title": "App D"}},
+    }
+    store.store_instance(app_id="d", label_id="d-1", site_config=site_config)
+
+    result = store.list_instances_fields(app_id="d")
+
+    # no 'tags' nor 'tagline' in the metadata of the instance:
+    assert result[0]["site_config"] == site_config
+
+
+def test_projection_and_filters(db):
+    result = store.list_instances_fields(
+        ["label_id", "site_config.env"], app_id="a", state="started"
+    )
+
+    assert result == [{"label_id": "a-1", "site_config": {"env": {"KEY": "value"}}}]
+
+
+def test_pagination(db):
+    result = store.list_instances_fields(["label_id"], offset=1, limit=1)
+
+    assert result == [{"label_id": "a-2"}]
+
+
+def test_unknown_field(db):
+    with pytest.raises(ValueError):
+        store.list_instances_fields(["password"])
@@ -0,0 +1,98 @@
+import pytest
+
+from nua.orchestrator import metrics
+from nua.orchestrator.metrics import Registry, parse_stats, render
+
+
+@pytest.fixture()
+def enabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "metrics_enabled", lambda: True)
+    monkeypatch.setattr(metrics, "metrics_file", lambda: tmp_path / "metrics.json")
+    monkeypatch.setattr(metrics, "_registry", Registry())
+    return tmp_path / "metrics.json"
+
+
+def test_disabled_records_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "metrics_enabled", lambda: False)
+    monkeypatch.setattr(metrics, "_registry", Registry())
+
+    with metrics.timed("nua_docker_call_seconds", call="docker_run"):
+        pass
+
+    assert metrics.registry().values == {}
+
+
+def test_timed_counts_errors(enabled):
+    with pytest.raises(ValueError), metrics.timed(
+        "nua_deploy_phase_seconds",
+        "nua_deploy_phase_errors_total",
+        phase="configure_apps",
+    ):
+        raise ValueError
+
+    values = metrics.registry().values
+    key = (("phase", "configure_apps"),)
+    assert values["nua_deploy_phase_errors_total"][key] == 1.0
+    assert values["nua_deploy_phase_seconds"][key]["count"] == 1
+
+
+def test_flush_adds_to_saved_metrics(enabled):
+    for _ in range(2):
+        metrics.inc("nua_backup_errors_total", plugin="pg_dump")
+        metrics.observe("nua_backup_bytes", 5000, plugin="pg_dump")
+        metrics.flush()
+
+    saved = metrics.load_metrics()
+
+    key = (("plugin", "pg_dump"),)
+    assert saved.values["nua_backup_errors_total"][key] == 2.0
+    assert saved.values["nua_backup_bytes"][key]["count"] == 2
+    assert saved.values["nua_backup_bytes"][key]["sum"] == 10000
+
+
+def test_render_histogram():
+    registry = Registry()
+    registry.observe("nua_image_load_seconds", {"app_id": "hedgedoc"}, 0.2)
+
+    text = render(registry)
+
+    assert "# TYPE nua_image_load_seconds histogram" in text
+    assert 'nua_image_load_seconds_bucket{app_id="hedgedoc",le="0.1"} 0' in text
+    assert 'nua_image_load_seconds_bucket{app_id="hedgedoc",le="0.5"} 1' in text
+    assert 'nua_image_load_seconds_bucket{app_id="hedgedoc",le="+Inf"} 1' in text
+    assert 'nua_image_load_seconds_count{app_id="hedgedoc"} 1' in text
+
+
+def test_render_gauges():
+    gauges = [("nua_container_memory_bytes", {"container": 'a"b'}, 1024.0)]
+
+    text = render(Registry(), gauges)
+
+    assert 'nua_container_memory_bytes{container="a\\"b"} 1024.0' in text
+
+
+def test_parse_stats():
+    stats = {
+        "cpu_stats": {
+            "cpu_usage": {"total_usage": 3_000},
+            "system_cpu_usage": 20_000,
+            "online_cpus": 4,
+        },
+        "precpu_stats": {
+            "cpu_usage": {"total_usage": 1_000},
+            "system_cpu_usage": 10_000,
+        },
+        "memory_stats": {
+            "usage": 5_000,
+            "limit": 100_000,
+            "stats": {"inactive_file": 1_000},
+        },
+    }
+
+    result = parse_stats(stats)
+
+    assert result == {
+        "nua_container_cpu_ratio": 0.8,
+        "nua_container_memory_bytes": 4000.0,
+        "nua_container_memory_limit_bytes": 100000.0,
+    }
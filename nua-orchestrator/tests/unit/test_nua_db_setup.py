@@ -0,0 +1,98 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from nua.orchestrator import config, nua_db_setup
+from nua.orchestrator.db import store
+
+STARTUP_SCRIPT = """
+import json
+from nua.orchestrator import nua_db_setup
+from nua.orchestrator.db import store
+
+calls = {"create_base": False, "settings_read": False}
+create_base = nua_db_setup.create_base
+installed_nua_settings = store.installed_nua_settings
+
+
+def counting_create_base():
+    calls["create_base"] = True
+    create_base()
+
+
+def counting_installed_nua_settings():
+    calls["settings_read"] = True
+    return installed_nua_settings()
+
+
+nua_db_setup.create_base = counting_create_base
+store.installed_nua_settings = counting_installed_nua_settings
+nua_db_setup.setup_nua_db()
+print(json.dumps(calls))
+"""
+
+
+@pytest.fixture()
+def db_writes(tmp_path, monkeypatch):
+    monkeypatch.setenv("NUA_DB_URL", f"sqlite:///{tmp_path}/nua.db")
+    monkeypatch.setenv("NUA_DB_LOCAL_DIR", str(tmp_path))
+    writes = []
+    set_nua_settings = store.set_nua_settings
+
+    def counting_set_nua_settings(settings):
+        writes.append(settings)
+        set_nua_settings(settings)
+
+    monkeypatch.setattr(store, "set_nua_settings", counting_set_nua_settings)
+    return writes
+
+
+def test_first_launch_writes_settings_once(db_writes):
+    nua_db_setup.setup_nua_db()
+    nua_db_setup.setup_nua_db()
+
+    assert len(db_writes) == 1
+    assert store.installed_nua_settings()["version"] == config.read("nua", "version")
+
+
+def _startup_process(tmp_path) -> dict:
+    """Run the DB setup in a new process, return the DB accesses done."""
+    env = dict(
+        os.environ,
+        NUA_DB_URL=f"sqlite:///{tmp_path}/nua.db",
+        NUA_DB_LOCAL_DIR=str(tmp_path),
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_read_only_startup_uses_snapshot(tmp_path):
+    first = _startup_process(tmp_path)
+    second = _startup_process(tmp_path)
+    third = _startup_process(tmp_path)
+
+    assert first == {"create_base": True, "settings_read": True}
+    assert second == third == {"create_base": False, "settings_read": False}
+
+
+def test_snapshot_invalidated_by_db_change(db_writes):
+    nua_db_setup.setup_nua_db()
+    settings = store.installed_nua_settings()
+    settings["host"] = {"domain": "changed.example.com"}
+
+    store.set_app_settings("nua-orchestrator", "", "", settings)
+
+    assert nua_db_setup.load_settings_snapshot() is None
+    nua_db_setup.setup_nua_db()
+    assert config.read("nua", "host", "domain") == "changed.example.com"
+    assert nua_db_setup.load_settings_snapshot() == settings
@@ -0,0 +1,38 @@
+from nua.orchestrator.backup.plugins.pg_dump import table_timings
+
+
+def test_table_timings_parallel_dump():
+    lines = [
+        (0.0, "pg_dump: saving encoding = UTF8"),
+        (1.0, 'pg_dump: dumping contents of table "public.big"'),
+        (1.5, 'pg_dump: dumping contents of table "public.small"'),
+        (2.0, "pg_dump: finished item 3 TABLE DATA small"),
+        (9.0, "pg_dump: finished item 2 TABLE DATA big"),
+    ]
+
+    result = table_timings(lines)
+
+    assert result == {"big": 8.0, "small": 0.5}
+
+
+def test_table_timings_sequential_dump():
+    lines = [
+        (1.0, 'pg_dump: dumping contents of table "public.a"'),
+        (3.0, 'pg_dump: dumping contents of table "public.b"'),
+        (4.0, "pg_dump: saving statistics"),
+    ]
+
+    result = table_timings(lines)
+
+    assert result == {"a": 2.0, "b": 1.0}
+
+
+def test_table_timings_parallel_restore():
+    lines = [
+        (0.0, "pg_restore: launching item 2 TABLE DATA big"),
+        (5.0, "pg_restore: finished item 2 TABLE DATA big"),
+    ]
+
+    result = table_timings(lines)
+
+    assert result == {"big": 5.0}
@@ -0,0 +1,169 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from nua.lib.panic import Abort
+
+from nua.orchestrator.app_deployer import (
+    UPDATE_BLUE_GREEN,
+    UPDATE_STOP_FIRST,
+    AppDeployer,
+)
+from nua.orchestrator.app_instance import AppInstance
+from nua.orchestrator.healthcheck import HealthCheck
+from nua.orchestrator.provider import Provider
+from nua.orchestrator.readiness import wait_http_ready, wait_tcp_port, web_port
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        code = 503 if self.path == "/broken" else 404
+        self.send_response(code)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def http_port():
+    server = HTTPServer(("127.0.0.1", 0), _StatusHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_wait_tcp_port_open(http_port):
+    assert wait_tcp_port(http_port, 1)
+
+
+def test_wait_tcp_port_closed():
+    assert not wait_tcp_port(_free_port(), 0.1)
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("/", True),  # a 404 is a response of a running app
+        ("/broken", False),
+    ],
+)
+def test_wait_http_ready(http_port, path: str, expected: bool):
+    assert wait_http_ready(http_port, path, 0.1) == expected
+
+
+def test_web_port():
+    rsite = Provider(
+        {
+            "port_list": [
+                {"container": 5432, "host_use": 8101},
+                {"container": 80, "host_use": 8102, "web": True},
+            ]
+        }
+    )
+
+    assert web_port(rsite) == 8102
+
+
+@pytest.mark.parametrize(
+    "conf,expected",
+    [
+        ({}, 0),
+        ({"command": "true"}, 120 + (5 + 30) * 4),
+        ({"command": "true", "start-period": 10, "interval": 2, "timeout": 3}, 30),
+    ],
+)
+def test_healthcheck_startup_timeout(conf: dict, expected: int):
+    assert HealthCheck(conf).startup_timeout() == expected
+
+
+@pytest.mark.parametrize(
+    "site,expected",
+    [
+        ({}, UPDATE_STOP_FIRST),
+        ({"update": "blue-green"}, UPDATE_BLUE_GREEN),
+    ],
+)
+def test_update_strategy(site: dict, expected: str):
+    assert AppDeployer.update_strategy(Provider(site)) == expected
+
+
+def test_update_strategy_unknown():
+    with pytest.raises(Abort):
+        AppDeployer.update_strategy(Provider({"update": "rolling"}))
+
+
+def test_reuse_providers_keeps_ports():
+    running = Provider(
+        {
+            "container_name": "app-1-db",
+            "container_id": "c1",
+            "run_params": {"ports": {"5432/tcp": 8101}},
+            "port_list": [{"container": 5432, "host": None, "host_use": 8101}],
+        }
+    )
+    new = Provider(
+        {
+            "container_name": "app-1-db",
+            "port_list": [{"container": 5432, "host": None, "host_use": 8105}],
+        }
+    )
+    current_app = AppInstance({"providers": [running]})
+    new_app = AppInstance({"providers": [new]})
+
+    AppDeployer._reuse_providers(new_app, current_app)
+
+    assert new.container_id == "c1"
+    assert [port["host_use"] for port in new.port_list] == [8101]
+
+
+def test_blue_green_start_failure_rolled_back(monkeypatch):
+    deployer = AppDeployer()
+    calls = []
+
+    def start_main_app_container(app):
+        calls.append("start")
+        raise RuntimeError("container exited")
+
+    monkeypatch.setattr(deployer, "_deploy_new_app_step2", lambda *a, **kw: None)
+    monkeypatch.setattr(deployer, "plan_resources", lambda apps: None)
+    monkeypatch.setattr(
+        deployer, "restart_local_services", lambda: calls.append("services")
+    )
+    monkeypatch.setattr(deployer, "start_network", lambda app: None)
+    monkeypatch.setattr(deployer, "evaluate_container_params", lambda app: None)
+    monkeypatch.setattr(deployer, "start_providers_containers", lambda app: None)
+    monkeypatch.setattr(deployer, "start_main_app_container", start_main_app_container)
+    monkeypatch.setattr(
+        deployer,
+        "_rollback_blue_green",
+        lambda app, name, same_app: calls.append(("rollback", name, same_app)),
+    )
+    current_app = AppInstance(
+        {
+            "label": "app",
+            "label_id": "app",
+            "image_nua_config": {"metadata": {"id": "app-1"}},
+        }
+    )
+    new_app = AppInstance(
+        {
+            "label": "app",
+            "label_id": "app",
+            "image_nua_config": {"metadata": {"id": "app-2"}},
+        }
+    )
+
+    with pytest.raises(RuntimeError):
+        deployer.deploy_blue_green(new_app, current_app)
+
+    assert calls == ["services", "start", ("rollback", "app-app-2-next", False)]
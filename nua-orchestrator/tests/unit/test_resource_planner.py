@@ -0,0 +1,99 @@
+import pytest
+from nua.lib.panic import Abort
+
+from nua.orchestrator import config
+from nua.orchestrator.resource_planner import (
+    NANO,
+    HostCapacity,
+    parse_size,
+    plan,
+    planner_enabled,
+    report,
+)
+
+GIB = 1024**3
+HOST = HostCapacity(cpus=list(range(8)), memory=17 * GIB)
+
+
+@pytest.fixture()
+def settings():
+    previous = config.read("nua", "resources")
+    config.set("nua", "resources", {"reserved_cpus": 1, "reserved_memory": "1G"})
+    yield
+    config.set("nua", "resources", previous)
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [(512, 512), ("512M", 512 * 1024**2), ("2g", 2 * GIB), ("1.5GiB", 3 * GIB // 2)],
+)
+def test_parse_size(value, expected):
+    assert parse_size(value) == expected
+
+
+def test_weighted_shares(settings):
+    containers = [
+        ("app-1", {"weight": 3}),
+        ("app-1-db", {}),
+        ("app-2", {"cpus": 3, "memory": "4G", "pids": 100}),
+    ]
+
+    result = plan(containers, HOST)
+
+    app_1, db, app_2 = (result.allocation(name) for name, _ in containers)
+    assert [a.nano_cpus for a in (app_1, db, app_2)] == [3 * NANO, NANO, 3 * NANO]
+    assert [a.mem_limit for a in (app_1, db, app_2)] == [9 * GIB, 3 * GIB, 4 * GIB]
+    assert app_1.mem_reservation == 9 * GIB // 2
+    assert (app_1.pids_limit, app_2.pids_limit) == (1024, 100)
+    assert result.overcommit == []
+
+
+def test_pinned_cpus(settings):
+    containers = [
+        ("app-1", {"cpus": 2, "pin": True}),
+        ("app-2", {"cpus": 1.5, "pin": True}),
+        ("app-3", {"cpuset": "0"}),
+        ("app-4", {}),
+    ]
+
+    result = plan(containers, HOST)
+
+    assert [result.allocation(name).cpuset_cpus for name, _ in containers] == [
+        "6-7",
+        "4-5",
+        "0",
+        "",
+    ]
+    assert "cpuset_cpus" not in result.allocation("app-4").as_docker_params()
+
+
+def test_overcommit(settings):
+    containers = [
+        ("app-1", {"cpus": 6, "memory": "12G", "pin": True}),
+        ("app-2", {"cpus": 2, "memory": "8G", "pin": True}),
+    ]
+
+    result = plan(containers, HOST)
+
+    assert result.overcommit == [
+        "CPU limits: 8.00 CPUs requested, 7.00 CPUs available",
+        "memory limits: 20.00 GiB requested, 16.00 GiB available",
+        "app-2: 2 CPUs to pin, 1 free, not pinned",
+    ]
+    assert result.allocation("app-2").cpuset_cpus == ""
+
+
+def test_overcommit_abort(settings):
+    config.set("nua", "resources", "overcommit", "abort")
+    result = plan([("app-1", {"memory": "32G"})], HOST)
+
+    with pytest.raises(Abort):
+        report(result)
+
+
+def test_planner_opt_in(settings):
+    assert not planner_enabled()
+
+    config.set("nua", "resources", "enabled", True)
+
+    assert planner_enabled()
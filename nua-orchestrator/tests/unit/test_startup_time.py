@@ -0,0 +1,43 @@
+"""Cold start of the nua-orchestrator command.
+
+The command line parsing must not load the deployment machinery: each command
+imports what it needs.
+"""
+
+import subprocess
+import sys
+
+HEAVY_MODULES = (
+    "docker",
+    "sqlalchemy",
+    "nua.orchestrator.api",
+    "nua.orchestrator.app_deployer",
+    "nua.orchestrator.db.store",
+)
+
+
+def _run_with_imports(*args: str) -> tuple[str, set[str]]:
+    """Return the output of the command and the names of the imported modules."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "nua.orchestrator", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _self, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            # header line
+            continue
+        imported.add(name.strip())
+    return result.stdout, imported
+
+
+def test_version_does_not_load_deployment_modules():
+    output, imported = _run_with_imports("--version")
+
+    assert "Nua orchestrator local version" in output
+    assert not [name for name in HEAVY_MODULES if name in imported]
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import event
+
+from nua.orchestrator import config
+from nua.orchestrator.db import store
+from nua.orchestrator.db.create import create_base
+from nua.orchestrator.db.session import Session, configure_session
+
+
+@pytest.fixture()
+def commits(tmp_path):
+    config.set("nua", "db", "url", f"sqlite:///{tmp_path}/nua.db")
+    create_base()
+    configure_session()
+    counter = []
+    event.listen(Session().get_bind(), "commit", lambda _conn: counter.append(1))
+    Session.remove()
+    return counter
+
+
+def _instance_ids() -> dict[str, int]:
+    return {inst.label_id: inst.id for inst in store.list_instances_all()}
+
+
+def test_writes_committed_once(commits):
+    with store.unit_of_work():
+        for index in range(5):
+            store.store_instance(label_id=f"app-{index}", state="stopped")
+            store.store_instance(label_id=f"app-{index}", state="started")
+        store.store_image(id_sha="sha256:1", app_id="app", nua_tag="nua-app:1.0-1")
+        store.set_app_settings("app", "nua-app:1.0-1", "", {"key": "value"})
+        assert commits == []
+
+    assert len(commits) == 1
+    assert {inst.state for inst in store.list_instances_all()} == {"started"}
+    assert store.get_image_by_nua_tag("nua-app:1.0-1").id_sha == "sha256:1"
+
+
+def test_reads_and_deletes_see_pending_writes(commits):
+    with store.unit_of_work():
+        store.store_instance(label_id="app-1", domain="a.example.com")
+        assert store.instance_container("a.example.com") == ""
+        store.store_instance(label_id="app-2")
+        store.instance_delete_by_label("app-2")
+
+    assert list(_instance_ids()) == ["app-1"]
+
+
+def test_upsert_keeps_records(commits):
+    store.store_instance(label_id="app-1", state="stopped")
+    store.store_image(id_sha="sha256:1", app_id="app", nua_tag="nua-app:1.0-1")
+    ids = _instance_ids()
+
+    store.store_instance(label_id="app-1", state="started")
+    store.store_image(id_sha="sha256:1", app_id="app", nua_tag="nua-app:1.0-1", size=10)
+    store.store_image(id_sha="sha256:2", app_id="app", nua_tag="nua-app:1.0-1")
+
+    assert _instance_ids() == ids
+    assert store.list_instances_all()[0].state == "started"
+    assert [img.id_sha for img in store.list_images_raw()] == ["sha256:2"]
+    assert len(store.list_all_settings()) == 1
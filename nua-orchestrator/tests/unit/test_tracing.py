@@ -0,0 +1,109 @@
+import pytest
+
+from nua.orchestrator import config, tracing
+from nua.orchestrator.db import store
+from nua.orchestrator.db.create import create_base
+from nua.orchestrator.db.session import configure_session
+from nua.orchestrator.metrics import deploy_phase, docker_call
+from nua.orchestrator.provider import Provider
+from nua.orchestrator.state_journal import StateJournal
+
+
+@docker_call
+def _docker_inner():
+    pass
+
+
+@docker_call
+def _docker_outer():
+    _docker_inner()
+
+
+class _Deployer:
+    @deploy_phase
+    def start_app(self, app: Provider):
+        _docker_outer()
+        _docker_outer()
+
+    @deploy_phase
+    def failing(self):
+        raise RuntimeError
+
+
+def test_no_trace_no_span():
+    with tracing.span("phase") as current:
+        assert current is None
+
+    assert tracing.finish_trace() == {}
+
+
+def test_nested_spans():
+    deployer = _Deployer()
+    tracing.start_trace("deploy_nua_apps")
+
+    with tracing.span("configure"):
+        deployer.start_app(Provider({"label_id": "app-1"}))
+    with pytest.raises(RuntimeError):
+        deployer.failing()
+    trace = tracing.finish_trace()
+
+    root = trace["root"]
+    assert root["name"] == "deploy_nua_apps"
+    configure, failing = root["children"]
+    (start_app,) = configure["children"]
+    assert start_app["attrs"] == {"label": "app-1"}
+    # nested docker calls are counted once:
+    assert start_app["docker_calls"] == 2
+    assert tracing.total_docker_calls(root) == 2
+    assert failing["attrs"] == {"error": "RuntimeError"}
+    assert root["start"] <= configure["start"] <= configure["end"] <= root["end"]
+    assert not tracing.trace_active()
+
+
+def test_render_trace():
+    trace = {
+        "started": 0,
+        "root": {
+            "name": "deploy",
+            "attrs": {},
+            "start": 0.0,
+            "end": 4.0,
+            "docker_calls": 1,
+            "children": [
+                {
+                    "name": "start_apps",
+                    "attrs": {"label": "app-1"},
+                    "start": 2.0,
+                    "end": 4.0,
+                    "docker_calls": 3,
+                    "children": [],
+                }
+            ],
+        },
+    }
+
+    lines = tracing.render_trace(trace, width=8)
+
+    assert len(lines) == 2
+    assert lines[0].startswith("deploy ")
+    assert "100.0%" in lines[0]
+    assert "docker:4" in lines[0]
+    assert lines[0].endswith("|████████|")
+    assert lines[1].startswith("  start_apps [app-1]")
+    assert "50.0%" in lines[1]
+    assert lines[1].endswith("|    ████|")
+
+
+def test_trace_stored_with_state(tmp_path):
+    config.set("nua", "db", "url", f"sqlite:///{tmp_path}/nua.db")
+    create_base()
+    configure_session()
+    journal = StateJournal()
+    tracing.start_trace("deploy_nua_apps")
+
+    state_id = journal.store_deployed_state({"requested": {}, "apps": []})
+    journal.store_trace(tracing.finish_trace())
+
+    deployed = store.deploy_config_per_id(state_id)["deployed"]
+    assert deployed["apps"] == []
+    assert deployed["trace"]["root"]["name"] == "deploy_nua_apps"
@@ -0,0 +1,190 @@
+"""Asyncio client of the orchestrator, for the Sanic handlers.
+
+The synchronous Client blocks the event loop for the whole SSH round trip. This
+client runs `nua-orchestrator rpc` as a subprocess of the event loop:
+
+- through a shared SSH master connection (OpenSSH ControlMaster), so calls do not
+  pay the SSH handshake and several calls can be in flight at the same time,
+- or directly on the local host if NUA_HOST is "local".
+
+Each method has its own timeout. Responses of read-only methods are cached for
+a short time, and concurrent identical calls share a single backend call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shlex
+import tempfile
+from contextlib import suppress
+from time import monotonic
+from typing import Any
+
+from nua_server.client import NUA_CMD
+
+DEFAULT_TIMEOUT = 30.0
+METHOD_TIMEOUTS = {
+    "list": 10.0,
+    "settings": 10.0,
+    "status": 10.0,
+    # includes the sampling of the container stats:
+    "metrics": 20.0,
+}
+# Read-only methods, their response can be shared:
+CACHED_METHODS = {"list", "settings", "status"}
+CACHE_TTL = 2.0
+MAX_IN_FLIGHT = 8
+SSH_CONTROL_PERSIST = 300
+
+
+class ClientError(Exception):
+    pass
+
+
+class LocalTransport:
+    """Run the orchestrator command on the local host."""
+
+    def command(self, cmd: str) -> list[str]:
+        return shlex.split(cmd)
+
+    async def run(self, cmd: str, stdin: bytes, timeout: float) -> bytes:
+        proc = await asyncio.create_subprocess_exec(
+            *self.command(cmd),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        communicate = asyncio.create_task(proc.communicate(stdin))
+        # no wait_for(): its TimeoutError is not the builtin one before
+        # Python 3.11
+        try:
+            done, _pending = await asyncio.wait({communicate}, timeout=timeout)
+        except asyncio.CancelledError:
+            # the request was cancelled (client disconnected), stop the command:
+            await self._kill(proc, communicate)
+            raise
+        if not done:
+            await self._kill(proc, communicate)
+            raise ClientError(f"Timeout ({timeout}s) of command: {cmd}")
+        stdout, stderr = communicate.result()
+        if proc.returncode != 0:
+            raise ClientError(
+                f"Command failed ({proc.returncode}): {cmd}\n"
+                f"{stderr.decode('utf8', 'replace')}"
+            )
+        return stdout
+
+    @staticmethod
+    async def _kill(proc: asyncio.subprocess.Process, communicate: asyncio.Task):
+        with suppress(ProcessLookupError):
+            proc.kill()
+        # the pipes are closed by the end of the process:
+        await communicate
+
+
+class SSHTransport(LocalTransport):
+    """Run the orchestrator command through a shared SSH connection."""
+
+    def __init__(self, host: str, user: str):
+        self.host = host
+        self.user = user
+        # the socket gives access to the SSH session: private directory only
+        control_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.mkdtemp(
+            prefix="nua-ssh-"
+        )
+        self.control_path = os.path.join(control_dir, f"nua-ssh-{user}@{host}")
+
+    def command(self, cmd: str) -> list[str]:
+        return [
+            "ssh",
+            "-o",
+            "BatchMode=yes",
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={self.control_path}",
+            "-o",
+            f"ControlPersist={SSH_CONTROL_PERSIST}",
+            f"{self.user}@{self.host}",
+            cmd,
+        ]
+
+
+class AsyncClient:
+    def __init__(
+        self,
+        host: str = "",
+        user: str = "",
+        transport: LocalTransport | None = None,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        cache_ttl: float = CACHE_TTL,
+    ):
+        if not host:
+            host = os.environ.get("NUA_HOST", "localhost")
+        if not user:
+            user = os.environ.get("NUA_USER", "nua")
+        self.host = host
+        self.user = user
+        if transport is None:
+            if host == "local":
+                transport = LocalTransport()
+            else:
+                transport = SSHTransport(host, user)
+        self.transport = transport
+        self.cache_ttl = cache_ttl
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._cache: dict[tuple[str, str], tuple[float, Any]] = {}
+        self._in_flight: dict[tuple[str, str], asyncio.Future] = {}
+
+    async def call_raw(self, method: str, **kw) -> str:
+        stdout = await self._run(f"{NUA_CMD} rpc --raw {method}", method, kw)
+        return stdout.decode("utf8")
+
+    async def call(self, method: str, **kw) -> Any:
+        if method not in CACHED_METHODS:
+            return await self._call(method, kw)
+
+        key = (method, json.dumps(kw, sort_keys=True))
+        cached = self._cache.get(key)
+        if cached and monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+        if key in self._in_flight:
+            return await asyncio.shield(self._in_flight[key])
+
+        future = asyncio.ensure_future(self._call(method, kw))
+        self._in_flight[key] = future
+        try:
+            result = await asyncio.shield(future)
+            self._cache[key] = (monotonic(), result)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+    def invalidate(self) -> None:
+        """Forget the cached responses (after a modification)."""
+        self._cache.clear()
+
+    async def _call(self, method: str, kw: dict) -> Any:
+        stdout = await self._run(f"{NUA_CMD} rpc {method}", method, kw)
+        try:
+            return json.loads(stdout)
+        except json.JSONDecodeError as e:
+            raise ClientError(f"Invalid response from server:\n{stdout!r}") from e
+
+    async def _run(self, cmd: str, method: str, kw: dict) -> bytes:
+        timeout = METHOD_TIMEOUTS.get(method, DEFAULT_TIMEOUT)
+        async with self._semaphore:
+            return await self.transport.run(cmd, json.dumps(kw).encode("utf8"), timeout)
+
+
+_ASYNC_CLIENT: AsyncClient | None = None
+
+
+def get_async_client(host: str = "", user: str = "") -> AsyncClient:
+    global _ASYNC_CLIENT
+
+    if not _ASYNC_CLIENT:
+        _ASYNC_CLIENT = AsyncClient(host, user)
+    return _ASYNC_CLIENT
@@ -3,12 +3,13 @@
 import snoop
 
 # Imported for side-effects => don't remove the assert statements
-from nua_server.pages import admin, home
+from nua_server.pages import admin, home, metrics
 
 from .app import app
 
 assert admin
 assert home
+assert metrics
 assert app
 
 
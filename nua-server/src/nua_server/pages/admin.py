@@ -3,16 +3,16 @@ from prettyprinter import pformat
 from webbits.html import html
 
 from nua_server.app import app
-from nua_server.client import get_client
+from nua_server.async_client import get_async_client
 from nua_server.menus import ADMIN_MENU, MAIN_MENU
 
 
 @app.get("/admin/")
 @app.ext.template("admin/index.html")
 async def admin_view(request) -> dict:
-    client = get_client()
-    result = client.call("list")
-    result.sort(key=lambda app: app["app_id"].lower())
+    client = get_async_client()
+    # the response may be shared with other requests (cache), do not modify it:
+    result = sorted(await client.call("list"), key=lambda app: app["app_id"].lower())
 
     body = h = html()
     with h.div(class_="content ~neutral"):
@@ -39,8 +39,8 @@ async def admin_view(request) -> dict:
 @app.get("/admin/settings/")
 @app.ext.template("admin/default.html")
 async def settings_view(request) -> dict:
-    client = get_client()
-    result = client.call("settings")
+    client = get_async_client()
+    result = await client.call("settings")
 
     body = h = html()
     with h.div(class_="content ~neutral"):
@@ -59,7 +59,7 @@ async def settings_view(request) -> dict:
 @app.get("/admin/apps/<app_id:str>/")
 @app.ext.template("admin/index.html")
 async def app_view(request, app_id: str) -> dict:
-    app_info = get_app_info(app_id)
+    app_info = await get_app_info(app_id)
 
     body = h = html()
     with h.div(class_="content ~neutral"):
@@ -78,7 +78,7 @@ async def app_view(request, app_id: str) -> dict:
 @app.get("/admin/apps/<app_id:str>/logs/")
 @app.ext.template("admin/index.html")
 async def app_logs_view(request, app_id: str) -> dict:
-    app_info = get_app_info(app_id)
+    app_info = await get_app_info(app_id)
 
     body = h = html()
     with h.div(class_="content ~neutral"):
@@ -97,9 +97,9 @@ async def app_logs_view(request, app_id: str) -> dict:
 #
 # Utils
 #
-def get_app_info(app_id: str) -> dict:
-    client = get_client()
-    result = client.call("list")
+async def get_app_info(app_id: str) -> dict:
+    client = get_async_client()
+    result = await client.call("list", app_id=app_id, view="full")
 
     app = None
     for instance in result:
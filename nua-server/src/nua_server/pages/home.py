@@ -1,16 +1,16 @@
 # from pprint import pp
 
 from nua_server.app import app
-from nua_server.client import get_client
+from nua_server.async_client import get_async_client
 from nua_server.menus import MAIN_MENU
 
 
 @app.get("/")
 @app.ext.template("home/index.html")
 async def home_view(request) -> dict:
-    client = get_client()
+    client = get_async_client()
 
-    result = client.call("list")
+    result = await client.call("list")
     apps = []
     for instance in result:
         site_config = instance["site_config"]
@@ -0,0 +1,14 @@
+from sanic.response import text
+
+from nua_server.app import app
+from nua_server.async_client import get_async_client
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@app.get("/metrics")
+async def metrics_view(request):
+    """Metrics of the orchestrator, in the Prometheus text format."""
+    client = get_async_client()
+    body = await client.call_raw("metrics")
+    return text(body, content_type=CONTENT_TYPE)
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+import stat
+
+import pytest
+
+from nua_server.async_client import (
+    AsyncClient,
+    ClientError,
+    LocalTransport,
+    SSHTransport,
+)
+
+
+class FakeTransport:
+    def __init__(self, delay: float = 0.01):
+        self.calls = []
+        self.delay = delay
+
+    async def run(self, cmd: str, stdin: bytes, timeout: float) -> bytes:
+        self.calls.append((cmd, json.loads(stdin), timeout))
+        await asyncio.sleep(self.delay)
+        if "bad" in cmd:
+            return b"not json"
+        return json.dumps([{"app_id": "hedgedoc"}]).encode()
+
+
+def test_concurrent_read_calls_share_backend_call() -> None:
+    transport = FakeTransport()
+    client = AsyncClient("host", "nua", transport=transport)
+
+    async def main():
+        return await asyncio.gather(*(client.call("list") for _ in range(5)))
+
+    results = asyncio.run(main())
+
+    assert len(transport.calls) == 1
+    assert all(result == [{"app_id": "hedgedoc"}] for result in results)
+
+
+def test_cached_response_and_invalidate() -> None:
+    transport = FakeTransport(delay=0)
+    client = AsyncClient("host", "nua", transport=transport)
+
+    async def main():
+        await client.call("settings")
+        await client.call("settings")
+        client.invalidate()
+        await client.call("settings")
+
+    asyncio.run(main())
+
+    assert len(transport.calls) == 2
+
+
+def test_write_methods_not_cached() -> None:
+    transport = FakeTransport(delay=0)
+    client = AsyncClient("host", "nua", transport=transport)
+
+    async def main():
+        await client.call("deploy", app="hedgedoc")
+        await client.call("deploy", app="hedgedoc")
+
+    asyncio.run(main())
+
+    assert len(transport.calls) == 2
+    assert transport.calls[0][1] == {"app": "hedgedoc"}
+
+
+def test_invalid_response() -> None:
+    client = AsyncClient("host", "nua", transport=FakeTransport(delay=0))
+
+    with pytest.raises(ClientError):
+        asyncio.run(client.call("bad"))
+
+
+def test_local_transport_timeout() -> None:
+    with pytest.raises(ClientError, match="Timeout"):
+        asyncio.run(LocalTransport().run("sleep 5", b"", 0.2))
+
+
+def test_local_transport_cancelled(tmp_path) -> None:
+    marker = tmp_path / "done"
+
+    async def cancelled_run() -> None:
+        task = asyncio.create_task(
+            LocalTransport().run(f"sh -c 'sleep 0.3; touch {marker}'", b"", 5)
+        )
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.4)
+
+    asyncio.run(cancelled_run())
+
+    # the command was killed:
+    assert not marker.exists()
+
+
+def test_ssh_control_path_private(monkeypatch) -> None:
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+
+    transport = SSHTransport("host", "nua")
+
+    control_dir = os.path.dirname(transport.control_path)
+    assert stat.S_IMODE(os.stat(control_dir).st_mode) == 0o700
+    os.rmdir(control_dir)